@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import types
+
+import bcrypt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.password_hasher import PasswordHasher, PasswordHasherBusy
+
+
+# Event-loop latency during a login storm: bcrypt.checkpw inline vs the PasswordHasher pool
+# N concurrent "logins" verify a password while a probe task measures how late a 10 ms timer
+# fires (what a streaming chat response on the same worker would feel). inline, every checkpw
+# stalls the loop; with the pool the probe stays flat and the logins queue instead.
+#
+#   python scripts/benchmarks/bcrypt_event_loop.py --logins 50 --rounds 12 --workers 2
+
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """타이머가 예정보다 얼마나 늦게 깨어나는지 측정"""
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(name, login, args):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(args.logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    rejected = sum(isinstance(r, PasswordHasherBusy) for r in results)
+    lags.sort()
+    p99 = lags[max(0, int(len(lags) * 0.99) - 1)] if lags else 0.0
+    print(f"{name:<8} {args.logins} logins in {elapsed:6.2f} s ({rejected} rejected)   loop lag"
+          f" p50 {statistics.median(lags or [0]) * 1000:7.1f} ms   p99 {p99 * 1000:7.1f} ms"
+          f"   max {(lags[-1] if lags else 0) * 1000:7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="event-loop lag during a bcrypt login storm")
+    parser.add_argument("--logins", type=int, default=50, help="concurrent logins")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--max-queue", type=int, default=1000, help="PASSWORD_HASH_MAX_QUEUE")
+    args = parser.parse_args()
+
+    password = b"correct horse battery staple"
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=args.rounds))
+    hasher = PasswordHasher(types.SimpleNamespace(
+        BCRYPT_ROUNDS=args.rounds, PASSWORD_HASH_WORKERS=args.workers, PASSWORD_HASH_MAX_QUEUE=args.max_queue,
+    ))
+
+    async def inline_login():
+        # what the login route did before: checkpw inside the async handler
+        return bcrypt.checkpw(password, hashed)
+
+    async def pooled_login():
+        return await hasher.verify(password.decode(), hashed.decode())
+
+    try:
+        await run("inline", inline_login, args)
+        await run("pool", pooled_login, args)
+        print(f"pool stats: {hasher.stats()}")
+    finally:
+        hasher.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import datetime
+import math
+import os
+import random
+import re
+import statistics
+import sys
+import time
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.search_index import candidate_pipeline, normalize, query_grams, rank_candidates, search_grams
+
+
+# Diary search latency on a synthetic Korean corpus: bigram index (search_grams) vs $regex scan
+# seeds one user with N generated diaries in a scratch database, then runs a fixed query mix
+# through the same ranking pipeline as /api/diary-search and reports p50 / p95 / max
+#
+#   python scripts/benchmarks/diary_search.py --diaries 5000 --target-p95-ms 50
+# search() mirrors diary.search_diary_entries (candidate_pipeline + rank_candidates, without the
+# summaries) so the benchmark does not need the app's redis / mail configuration
+
+
+NOUNS = ["학교", "친구", "엄마", "아빠", "회사", "동생", "선생님", "점심", "저녁", "운동", "산책", "공원", "버스",
+         "시험", "숙제", "영화", "음악", "커피", "비", "눈", "바다", "여행", "병원", "강아지", "고양이", "게임"]
+PARTICLES = ["에서", "와", "과", "이", "가", "을", "를", "에", "도", "랑", "하고", "의"]
+VERBS = ["만났다", "걸었다", "이야기했다", "먹었다", "기다렸다", "울었다", "웃었다", "힘들었다", "좋았다", "피곤했다"]
+QUERIES = ["학교", "친구와", "엄마랑 저녁", "산책", "시험 공부", "강아지", "회사에서 힘들었다", "바다 여행", "커피", "병원"]
+
+
+def sentence(rng):
+    return " ".join(rng.choice(NOUNS) + rng.choice(PARTICLES) for _ in range(rng.randint(2, 4))) + " " + rng.choice(VERBS) + "."
+
+
+def diary(rng, i, start):
+    title = f"{rng.choice(NOUNS)} {rng.choice(VERBS)}"
+    content = " ".join(sentence(rng) for _ in range(rng.randint(5, 20)))
+    return {
+        "author_id": "bench",
+        "title": title,
+        "content": content,
+        "created_at": start + datetime.timedelta(hours=i),
+        "search_grams": search_grams(title, content),
+    }
+
+
+async def search(diaries, query, limit=20, min_coverage=0.6, max_candidates=500):
+    phrase = normalize(query)
+    grams = query_grams(phrase)
+    min_matched = max(1, math.ceil(len(grams) * min_coverage))
+    pipeline = candidate_pipeline({"author_id": "bench"}, grams, min_matched, max_candidates)
+    candidates = await (await diaries.aggregate(pipeline)).to_list()
+    return rank_candidates(candidates, phrase, grams, min_matched)[:limit + 1]
+
+
+def regex_query(query):
+    """비교 기준: 인덱스 없이 모든 단어를 제목/본문에서 regex로 찾기 (전체 스캔)"""
+    words = [re.escape(word) for word in query.split()]
+    return {"author_id": "bench", "$and": [
+        {"$or": [{"title": {"$regex": word}}, {"content": {"$regex": word}}]} for word in words
+    ]}
+
+
+def report(name, timings, target):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    verdict = "" if target is None else ("  OK" if p95 * 1000 <= target else "  OVER TARGET")
+    print(f"{name:<10} p50 {statistics.median(timings) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms"
+          f"   max {timings[-1] * 1000:7.1f} ms{verdict}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="diary search latency on a synthetic corpus")
+    parser.add_argument("--url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
+    parser.add_argument("--diaries", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=10, help="times the query mix is run")
+    parser.add_argument("--target-p95-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(args.url)
+    diaries = client.emotlink_bench.diaries
+    rng = random.Random(42)
+    start = datetime.datetime(2022, 1, 1)
+    try:
+        await diaries.create_index([("author_id", ASCENDING), ("search_grams", ASCENDING)])
+        await diaries.create_index([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        for offset in range(0, args.diaries, 1000):
+            await diaries.insert_many([diary(rng, i, start) for i in range(offset, min(offset + 1000, args.diaries))])
+        stats = await client.emotlink_bench.command("collStats", "diaries")
+        print(f"{args.diaries} diaries, index sizes (bytes): {stats.get('indexSizes')}")
+
+        bigram, regex = [], []
+        hits = {}
+        for _ in range(args.rounds):
+            for query in QUERIES:
+                started = time.perf_counter()
+                results = await search(diaries, query)
+                bigram.append(time.perf_counter() - started)
+                hits[query] = len(results)
+
+                started = time.perf_counter()
+                await diaries.find(regex_query(query), {"title": 1}).sort("created_at", -1).limit(21).to_list()
+                regex.append(time.perf_counter() - started)
+
+        print("results per query (first page, max 21):", hits)
+        report("bigram", bigram, args.target_p95_ms)
+        report("regex", regex, None)
+    finally:
+        await client.drop_database("emotlink_bench")
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.routers.emoter.analytics import INDICATORS, compute_analytics
+
+
+# Linker stats analytics: numpy engine vs the same statistics in a plain python loop
+# synthetic histories of increasing size (no database needed); with --url the projection
+# load of a seeded scratch collection is timed as well, since that is the other half of a page load
+#
+#   python scripts/benchmarks/emotion_analytics.py --sizes 1000 10000 100000
+#   python scripts/benchmarks/emotion_analytics.py --sizes 100000 --url mongodb://localhost:27017/
+
+
+def python_analytics(rows: list, window: int, z_threshold: float) -> dict:
+    """같은 통계를 dict 목록 위의 python 루프로 계산 (비교 기준)"""
+    result = {}
+    for name in INDICATORS:
+        values = [float(row.get(name, 0)) for row in rows]
+        ordered = sorted(values)
+        rolling, anomalies = [], 0
+        for i in range(len(values)):
+            recent = values[max(0, i - window + 1):i + 1]
+            rolling.append(sum(recent) / len(recent))
+            if i >= window:
+                baseline = values[i - window:i]
+                std = statistics.pstdev(baseline)
+                if std > 0 and abs(values[i] - statistics.fmean(baseline)) / std >= z_threshold:
+                    anomalies += 1
+        diffs = [b - a for a, b in zip(values, values[1:])]
+        result[name] = {
+            "mean": statistics.fmean(values),
+            "std": statistics.pstdev(values),
+            "volatility": statistics.pstdev(diffs) if diffs else 0.0,
+            "p50": ordered[len(ordered) // 2],
+            "rolling_mean": rolling[-1],
+            "anomaly_count": anomalies,
+        }
+    return result
+
+
+def synthetic_history(size: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    created_at = np.datetime64("2020-01-01T00:00:00", "ms") + np.arange(size) * np.timedelta64(6, "h")
+    scores = np.clip(rng.normal(40, 15, (size, len(INDICATORS))), 0, 100).round()
+    return created_at, scores
+
+
+def best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+async def mongo_load(url, sizes, repeat):
+    from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+
+    client = AsyncMongoClient(url)
+    diaries = client.emotlink_bench.diaries
+    projection = {"_id": 0, "created_at": 1, **{name: 1 for name in INDICATORS}}
+    try:
+        await diaries.create_index([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])
+        print(f"\n{'entries':>8} {'load (projection)':>18} {'load (full docs)':>17}")
+        for size in sizes:
+            created_at, scores = synthetic_history(size)
+            await diaries.delete_many({})
+            docs = [{
+                "author_id": "bench", "title": "bench", "content": "x" * 500,
+                "created_at": created_at[i].astype(datetime.datetime),
+                **{name: int(scores[i, c]) for c, name in enumerate(INDICATORS)},
+            } for i in range(size)]
+            for start in range(0, size, 10000):
+                await diaries.insert_many(docs[start:start + 10000])
+
+            timings = []
+            for proj in (projection, None):
+                best = None
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    await diaries.find({"author_id": "bench"}, proj).sort("created_at", -1).to_list()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append(best)
+            print(f"{size:>8} {timings[0] * 1000:>16.1f}ms {timings[1] * 1000:>15.1f}ms")
+    finally:
+        await client.drop_database("emotlink_bench")
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="numpy vs python-loop emotion analytics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--window", type=int, default=7)
+    parser.add_argument("--z", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--url", help="also time the mongo projection load (seeds a scratch database)")
+    args = parser.parse_args()
+
+    print(f"{'entries':>8} {'python loop':>12} {'numpy':>10} {'speedup':>8}")
+    for size in args.sizes:
+        created_at, scores = synthetic_history(size)
+        rows = [dict(zip(INDICATORS, row)) for row in scores.tolist()]
+
+        expected = python_analytics(rows, args.window, args.z)
+        actual = compute_analytics(created_at, scores, args.window, args.z)
+        for name in INDICATORS:
+            assert actual["indicators"][name]["anomaly_count"] == expected[name]["anomaly_count"], name
+            assert abs(actual["indicators"][name]["mean"] - expected[name]["mean"]) < 0.1, name
+
+        loop_time = best_of(lambda: python_analytics(rows, args.window, args.z), args.repeat)
+        numpy_time = best_of(lambda: compute_analytics(created_at, scores, args.window, args.z), args.repeat)
+        print(f"{size:>8} {loop_time * 1000:>10.1f}ms {numpy_time * 1000:>8.2f}ms {loop_time / numpy_time:>7.0f}x")
+
+    if args.url:
+        asyncio.run(mongo_load(args.url, args.sizes, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
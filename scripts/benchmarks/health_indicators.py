@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import sys
+import time
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.routers.emoter.health import health_from_entries, health_pipeline
+
+
+# Linker dashboard health indicators: one query per emoter vs one batched aggregation
+# seeds a scratch database with N emoters x M diaries, then times both strategies for
+# increasing emoter counts and checks that they return the same { color, delta } map
+#
+#   python scripts/benchmarks/health_indicators.py --emoters 10 50 200 500 --diaries 30
+
+
+async def per_emoter(diaries, user_ids):
+    """이전 방식: emoter마다 find().sort().limit(2)"""
+    result = {}
+    for uid in user_ids:
+        entries = await diaries.find({"author_id": uid}).sort("created_at", -1).limit(2).to_list()
+        result[uid] = health_from_entries(entries)
+    return result
+
+
+async def batched(diaries, user_ids):
+    result = {uid: health_from_entries([]) for uid in user_ids}
+    async for group in await diaries.aggregate(health_pipeline(user_ids)):
+        result[group["_id"]] = health_from_entries(group["last_two"])
+    return result
+
+
+async def seed(diaries, emoters, per_user):
+    await diaries.delete_many({})
+    await diaries.create_index(
+        [("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="author_id_created_at_id"
+    )
+    start = datetime.datetime(2025, 1, 1)
+    rng = random.Random(42)
+    batch = []
+    for i in range(emoters):
+        for day in range(per_user):
+            batch.append({
+                "author_id": f"emoter{i}",
+                "title": "bench",
+                "content": "",
+                "created_at": start + datetime.timedelta(days=day, minutes=i),
+                "depression": rng.randint(0, 100),
+                "isolation": rng.randint(0, 100),
+                "frustration": rng.randint(0, 100),
+            })
+        if len(batch) >= 10000:
+            await diaries.insert_many(batch)
+            batch = []
+    if batch:
+        await diaries.insert_many(batch)
+
+
+async def timed(fn, diaries, user_ids, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn(diaries, user_ids)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="per-emoter vs batched health indicators")
+    parser.add_argument("--url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
+    parser.add_argument("--emoters", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--diaries", type=int, default=30, help="diaries per emoter")
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs")
+    args = parser.parse_args()
+
+    client = AsyncMongoClient(args.url)
+    diaries = client.emotlink_bench.diaries
+    try:
+        await seed(diaries, max(args.emoters), args.diaries)
+        print(f"{'emoters':>8} {'per-emoter':>12} {'batched':>10} {'speedup':>8}")
+        for count in args.emoters:
+            user_ids = [f"emoter{i}" for i in range(count)]
+            loop_time, loop_result = await timed(per_emoter, diaries, user_ids, args.repeat)
+            batch_time, batch_result = await timed(batched, diaries, user_ids, args.repeat)
+            assert loop_result == batch_result, "batched result differs from per-emoter result"
+            print(f"{count:>8} {loop_time * 1000:>10.1f}ms {batch_time * 1000:>8.1f}ms {loop_time / batch_time:>7.1f}x")
+    finally:
+        await client.drop_database("emotlink_bench")
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
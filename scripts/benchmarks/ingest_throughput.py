@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.ingest import ingest, iter_records
+
+
+# Bulk ingest parse/map throughput and memory on a generated file (JSON array or NDJSON)
+# the file is written as a stream, then read back through webserver.ingest in --dry-run mode
+# (parse + schema mapping + search_grams, no database); peak RSS should not grow with --records
+#
+#   python scripts/benchmarks/ingest_throughput.py --records 1000000 --format ndjson
+#   python scripts/benchmarks/ingest_throughput.py --records 1000000 --format json
+# the write path is the same code with the database enabled: python -m webserver.ingest FILE
+
+
+WORDS = ["오늘", "학교에서", "친구와", "점심을", "먹었다", "회사", "피곤했다", "산책", "공원에서", "비가", "왔다", "기분이", "좋았다"]
+
+
+def write_records(path, count, fmt, seed=42):
+    rng = random.Random(seed)
+    start = datetime.datetime(2020, 1, 1)
+    with open(path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            f.write("[\n")
+        for i in range(count):
+            record = {
+                "title": " ".join(rng.choices(WORDS, k=3)),
+                "content": " ".join(rng.choices(WORDS, k=rng.randint(20, 80))),
+                "emotion": rng.choice(["😊", "😢", "😠", "😌"]),
+                "author_id": f"user{i % 1000}",
+                "created_at": (start + datetime.timedelta(minutes=i)).isoformat(),
+                "depression": rng.randint(0, 100),
+                "isolation": rng.randint(0, 100),
+                "frustration": rng.randint(0, 100),
+            }
+            line = json.dumps(record, ensure_ascii=False)
+            if fmt == "json":
+                f.write(line + (",\n" if i < count - 1 else "\n"))
+            else:
+                f.write(line + "\n")
+        if fmt == "json":
+            f.write("]\n")
+
+
+def peak_rss_mb():
+    # linux reports kilobytes, macos bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="bulk ingest throughput (dry run)")
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--format", choices=["ndjson", "json"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"diaries.{args.format}")
+        started = time.perf_counter()
+        write_records(path, args.records, args.format)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"generated {args.records} records, {size_mb:.0f} MB in {time.perf_counter() - started:.1f}s")
+
+        rss_before = peak_rss_mb()
+        with open(path, encoding="utf-8") as stream:
+            run = await ingest(iter_records(stream), batch_size=args.batch_size, dry_run=True)
+        print(run.progress())
+        print(f"peak rss {peak_rss_mb():.0f} MB (before ingest {rss_before:.0f} MB, file {size_mb:.0f} MB)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
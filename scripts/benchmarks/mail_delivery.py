@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.mailer import Mailer
+from smtp_sink import SMTPSink
+
+
+# Verification mail throughput against the local SMTP stand-in: one session per message (what the
+# request handler did with fastapi-mail) vs the Mailer's pooled sessions. --connect-delay stands in
+# for TCP + STARTTLS + AUTH to smtp.gmail.com, which the pooled sender pays once per session.
+#
+#   python scripts/benchmarks/mail_delivery.py --messages 200 --connect-delay 0.3 --pool-size 2
+
+
+def mail_config(port: int, pool_size: int, max_messages: int):
+    return types.SimpleNamespace(
+        MAIL_FROM="noreply@emotlink.com", MAIL_SERVER="127.0.0.1", MAIL_PORT=port,
+        MAIL_USERNAME="", MAIL_PASSWORD="", MAIL_STARTTLS=False, MAIL_VALIDATE_CERTS=False, MAIL_TIMEOUT=10.0,
+        MAIL_SMTP_POOL_SIZE=pool_size, MAIL_SMTP_IDLE_TIMEOUT=60.0, MAIL_SMTP_MAX_MESSAGES=max_messages,
+        MAIL_RATE_PER_MINUTE=0,
+    )
+
+
+async def run(name, mailer, sink, count):
+    before = dict(sink.counters)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        mailer.run_job({
+            "template": "verification",
+            "to": f"user{i}@example.com",
+            "context": {"verification_url": f"https://emotlink.com/verify-email?token=t{i}", "expire_minutes": 30},
+        })
+        for i in range(count)
+    ))
+    elapsed = time.perf_counter() - started
+    await mailer.aclose()
+    connections = sink.counters["connections"] - before["connections"]
+    print(f"{name:<12} {count} mails in {elapsed:6.2f} s ({count / elapsed:7.1f}/s)   smtp sessions {connections}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="pooled vs per-message smtp sessions")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--connect-delay", type=float, default=0.3)
+    parser.add_argument("--pool-size", type=int, default=2)
+    args = parser.parse_args()
+
+    sink = SMTPSink(connect_delay=args.connect_delay)
+    port = await sink.start(port=0)
+    templates = os.path.join(os.path.dirname(__file__), "..", "..", "templates")
+    try:
+        per_message = Mailer(mail_config(port, args.pool_size, max_messages=1), None, templates)
+        await run("per-message", per_message, sink, args.messages)
+        pooled = Mailer(mail_config(port, args.pool_size, max_messages=100), None, templates)
+        await run("pooled", pooled, sink, args.messages)
+        print(f"pooled stats: {pooled.stats()}")
+
+        started = time.perf_counter()
+        for i in range(1000):
+            pooled.render("verification", "a@example.com", {"verification_url": f"u{i}", "expire_minutes": 30})
+        print(f"render: {(time.perf_counter() - started) / 1000 * 1000:.3f} ms per message (compiled template)")
+    finally:
+        await sink.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
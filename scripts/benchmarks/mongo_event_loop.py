@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from pymongo import AsyncMongoClient, MongoClient
+
+
+# Event-loop latency while MongoDB is slow: blocking pymongo vs AsyncMongoClient
+# N "requests" each run one deliberately slow query ($where + sleep) while a probe task
+# measures how late a 10 ms timer fires. with the blocking client every query stalls the
+# whole loop; with the async client the probe stays flat.
+#
+#   python scripts/benchmarks/mongo_event_loop.py --requests 20 --query-ms 200
+# needs server-side javascript enabled on mongod (default) and uses a scratch collection
+
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe(stop: asyncio.Event, lags: list):
+    """타이머가 예정보다 얼마나 늦게 깨어나는지 측정"""
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(name, query, args):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(query() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+
+    lags.sort()
+    p99 = lags[max(0, int(len(lags) * 0.99) - 1)] if lags else 0.0
+    print(f"{name:<8} total {elapsed:6.2f} s   loop lag p50 {statistics.median(lags or [0]) * 1000:7.1f} ms"
+          f"   p99 {p99 * 1000:7.1f} ms   max {(lags[-1] if lags else 0) * 1000:7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="event-loop latency with slow mongo queries")
+    parser.add_argument("--url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017/"))
+    parser.add_argument("--requests", type=int, default=20, help="concurrent slow queries")
+    parser.add_argument("--query-ms", type=int, default=200, help="server-side delay per query")
+    parser.add_argument("--pool", type=int, default=100, help="async client maxPoolSize")
+    args = parser.parse_args()
+
+    sync_client = MongoClient(args.url)
+    async_client = AsyncMongoClient(args.url, maxPoolSize=args.pool)
+    sync_collection = sync_client.emotlink_bench.slow_queries
+    async_collection = async_client.emotlink_bench.slow_queries
+    slow_filter = {"$where": f"sleep({args.query_ms}) || true"}
+
+    sync_collection.delete_many({})
+    sync_collection.insert_one({"_id": 1})
+
+    async def blocking_query():
+        # what the routes did before: a blocking call inside an async handler
+        return sync_collection.find_one(slow_filter)
+
+    async def async_query():
+        return await async_collection.find_one(slow_filter)
+
+    try:
+        print(f"{args.requests} concurrent queries x {args.query_ms} ms server-side")
+        await run("blocking", blocking_query, args)
+        await run("async", async_query, args)
+    finally:
+        sync_client.drop_database("emotlink_bench")
+        sync_client.close()
+        await async_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import redis
+import redis.asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.chat_store import ChatRoomStore
+
+
+# Concurrent chat-turn throughput against a real redis: before / after the async pool
+#   before: sync redis.Redis called from async handlers (old chat.py flow, ~10 round-trips + KEYS *)
+#   after : ChatRoomStore on one redis.asyncio pool (2 scripted round-trips per turn)
+# each turn also awaits --llm-ms to stand in for the model call, so blocking the loop shows up as lost concurrency
+#
+#   python scripts/benchmarks/redis_chat.py --rooms 200 --turns 5 --llm-ms 50
+# uses db 15 by default and deletes the keys it created
+
+
+def old_turn(r, room_id, user_id, text, model):
+    """기존 chat.py의 /chat/message 한 턴 (동기 호출)"""
+    key = f"chat:messages:{room_id}"
+    if r.exists(key) == 0:
+        raise RuntimeError("no room")
+    if not r.sismember(f"chat:participants:{room_id}", user_id):
+        raise RuntimeError("denied")
+    data = json.dumps({"time": time.time(), "role": "user", "user_id": user_id, "message": text})
+    r.zadd(key, {data: time.time()})
+    r.expire(key, 7200)
+    r.keys("*")
+    raw = r.zrevrange(key, 0, 29)
+    r.set(f"chat:model:{room_id}", model)
+    r.expire(f"chat:model:{room_id}", 7200)
+    return [json.loads(m) for m in reversed(raw)]
+
+
+def old_reply(r, room_id, user_id, text):
+    key = f"chat:messages:{room_id}"
+    data = json.dumps({"time": time.time(), "role": "assistant", "user_id": user_id, "message": text})
+    r.zadd(key, {data: time.time()})
+    r.expire(key, 7200)
+    r.keys("*")
+
+
+async def run_old(args, r, rooms):
+    for room_id, user_id in rooms:
+        r.zadd(f"chat:messages:{room_id}", {json.dumps({"role": "assistant", "message": "hi"}): time.time()})
+        r.sadd(f"chat:participants:{room_id}", user_id)
+
+    latencies = []
+
+    async def session(room_id, user_id):
+        for i in range(args.turns):
+            started = time.perf_counter()
+            old_turn(r, room_id, user_id, f"message {i}", "solar-pro")
+            await asyncio.sleep(args.llm_ms / 1000)
+            old_reply(r, room_id, user_id, f"reply {i}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(room_id, user_id) for room_id, user_id in rooms))
+    return time.perf_counter() - started, latencies
+
+
+async def run_new(args, store, rooms):
+    for room_id, user_id in rooms:
+        await store.create(room_id, user_id, "solar-pro", "hi")
+
+    latencies = []
+
+    async def session(room_id, user_id):
+        for i in range(args.turns):
+            started = time.perf_counter()
+            await store.add_user_message(room_id, user_id, f"message {i}", model="solar-pro")
+            await asyncio.sleep(args.llm_ms / 1000)
+            await store.add_message(room_id, user_id, f"reply {i}", "assistant")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(room_id, user_id) for room_id, user_id in rooms))
+    return time.perf_counter() - started, latencies
+
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<7} {len(latencies) / elapsed:8.1f} turns/s   p50 {statistics.median(latencies) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="chat turn throughput: sync redis vs async pool")
+    parser.add_argument("--host", default=os.getenv("REDIS_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("REDIS_PORT", "21101")))
+    parser.add_argument("--db", type=int, default=15)
+    parser.add_argument("--rooms", type=int, default=200, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--llm-ms", type=float, default=50.0, help="simulated model latency per turn")
+    parser.add_argument("--pool", type=int, default=50, help="async pool max connections")
+    args = parser.parse_args()
+
+    tag = uuid.uuid4().hex[:8]
+    sync_client = redis.Redis(host=args.host, port=args.port, db=args.db)
+    pool = redis.asyncio.BlockingConnectionPool(host=args.host, port=args.port, db=args.db, max_connections=args.pool)
+    async_client = redis.asyncio.Redis.from_pool(pool)
+    store = ChatRoomStore(async_client)
+
+    old_rooms = [(f"bench-old-{tag}-{i}", f"user-{i}") for i in range(args.rooms)]
+    new_rooms = [(f"bench-new-{tag}-{i}", f"user-{tag}-{i}") for i in range(args.rooms)]
+    try:
+        print(f"{args.rooms} sessions x {args.turns} turns, simulated llm {args.llm_ms:.0f} ms")
+        report("before", *await run_old(args, sync_client, old_rooms))
+        report("after", *await run_new(args, store, new_rooms))
+    finally:
+        for room_id, _ in old_rooms:
+            sync_client.delete(f"chat:messages:{room_id}", f"chat:participants:{room_id}", f"chat:model:{room_id}")
+        for room_id, _ in new_rooms:
+            await store.close(room_id)
+        await async_client.aclose()
+        sync_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
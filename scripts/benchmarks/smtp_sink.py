@@ -0,0 +1,137 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+
+
+# Local SMTP stand-in for the mail worker (stdlib only, accepts everything, delivers nothing)
+# speaks just enough ESMTP for aiosmtplib: EHLO/HELO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT
+#
+#   python scripts/benchmarks/smtp_sink.py --port 2525 --save-dir /tmp/mails
+#   MAIL_SERVER=localhost MAIL_PORT=2525 MAIL_STARTTLS=false MAIL_USERNAME= python -m webserver.worker --queues mail
+#
+#   --connect-delay  seconds before the greeting (stands in for TCP + STARTTLS + AUTH to a real server)
+#   --fail-rate      share of messages answered 451 (transient => the job is retried with backoff)
+#   --idle-timeout   drop sessions idle this long (exercises the pool's stale-session retry)
+# recipients containing "reject" get 550 (permanent => the job is not retried)
+
+
+class SMTPSink:
+    """메일을 받기만 하는 로컬 SMTP 서버 (worker / benchmark 용)"""
+
+    def __init__(self, connect_delay: float = 0.0, fail_rate: float = 0.0, idle_timeout: float = 0.0,
+                 save_dir: str = ""):
+        self.connect_delay = connect_delay
+        self.fail_rate = fail_rate
+        self.idle_timeout = idle_timeout
+        self.save_dir = save_dir
+        self.counters = {"connections": 0, "messages": 0, "failed": 0, "rejected": 0}
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 2525) -> int:
+        self._server = await asyncio.start_server(self._session, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _readline(self, reader):
+        if self.idle_timeout > 0:
+            return await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        return await reader.readline()
+
+    async def _session(self, reader, writer):
+        self.counters["connections"] += 1
+
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await asyncio.sleep(self.connect_delay)
+            await reply("220 smtp-sink ESMTP ready")
+            recipients = []
+            while True:
+                line = await self._readline(reader)
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    await reply("250-smtp-sink\r\n250-8BITMIME\r\n250-SMTPUTF8\r\n250-AUTH PLAIN\r\n250 OK")
+                elif verb == "HELO":
+                    await reply("250 smtp-sink")
+                elif verb == "AUTH":
+                    await reply("235 2.7.0 Authentication successful")
+                elif verb == "MAIL":
+                    recipients = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    if "reject" in command.lower():
+                        self.counters["rejected"] += 1
+                        await reply("550 5.1.1 mailbox unavailable")
+                    else:
+                        recipients.append(command)
+                        await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        data.append(chunk)
+                    if random.random() < self.fail_rate:
+                        self.counters["failed"] += 1
+                        await reply("451 4.3.0 try again later")
+                        continue
+                    self.counters["messages"] += 1
+                    if self.save_dir:
+                        path = os.path.join(self.save_dir, f"{time.time():.6f}.eml")
+                        with open(path, "wb") as f:
+                            f.writelines(data)
+                    await reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 5.5.2 command not implemented")
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="local SMTP stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--connect-delay", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--idle-timeout", type=float, default=0.0)
+    parser.add_argument("--save-dir", default="", help="write every accepted message as .eml here")
+    args = parser.parse_args()
+
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+    sink = SMTPSink(args.connect_delay, args.fail_rate, args.idle_timeout, args.save_dir)
+    port = await sink.start(args.host, args.port)
+    print(f"smtp sink listening on {args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"smtp sink: {sink.counters}")
+    finally:
+        await sink.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,26 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.shared import client, redis_client
+from webserver.routers.emoter.diary import backfill_search_grams
+
+
+# Fill diaries.search_grams for diaries written before diary search existed (migration 6 only builds
+# the index). the server also does this in the background at startup; search matches those diaries
+# by exact phrase only until they are filled
+#   python scripts/maintenance/backfill_search_grams.py
+
+
+async def main():
+    try:
+        filled = await backfill_search_grams()
+        print(f"Filled search_grams of {filled} diaries.")
+    finally:
+        await redis_client.aclose()
+        await client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.shared import client, redis_client, user_filter
+from webserver.routers.lookups import rebuild_user_filter
+
+
+# Rebuild the id/email availability bloom filter (redis "bloom:users") from the users collection
+# the server does this by itself at startup when the filter is missing or stale; use this after
+# changing USER_BLOOM_CAPACITY / USER_BLOOM_ERROR_RATE or bulk-deleting users
+#   python scripts/maintenance/rebuild_user_filter.py
+
+
+async def main():
+    try:
+        count = await rebuild_user_filter()
+        if count is None:
+            print("Another worker is rebuilding the filter right now, try again later.")
+        else:
+            print(f"Rebuilt user filter with {count} items.")
+            print(f"[user_filter] {user_filter.stats()}")
+    finally:
+        await redis_client.aclose()
+        await client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+from webserver.shared import client, user_stats
+from webserver.routers.emoter.emotion_stats import rebuild_user_stats
+from webserver.routers.emoter.emotion_trend import rebuild_emotion_rollups
+
+
+# Recompute the materialized user_stats and emotion_rollups documents from the diaries collection
+#   python scripts/maintenance/rebuild_user_stats.py             every user
+#   python scripts/maintenance/rebuild_user_stats.py --user ID   one user
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="rebuild user_stats and emotion_rollups from diaries")
+    parser.add_argument("--user", help="only this user id")
+    args = parser.parse_args()
+
+    try:
+        before = await user_stats.count_documents({})
+        print(f"[user_stats] documents before: {before}")
+        rebuilt = await rebuild_user_stats(args.user)
+        print(f"Rebuilt {rebuilt} user_stats document(s).")
+        print(f"[user_stats] documents after: {await user_stats.count_documents({})}")
+        buckets = await rebuild_emotion_rollups(args.user)
+        print(f"Rebuilt {buckets} emotion_rollups bucket(s).")
+    finally:
+        await client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
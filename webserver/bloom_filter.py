@@ -0,0 +1,194 @@
+import datetime
+import hashlib
+import math
+import time
+import uuid
+from typing import AsyncIterable, Iterable, Optional
+
+import numpy as np
+
+
+# This file contains a Bloom filter kept in a plain redis string (no RedisBloom module needed)
+#
+#   bloom:{name}        bit string of m bits (SETBIT/BITFIELD offsets, bit 0 = msb of byte 0)
+#   bloom:{name}:meta   hash {bits, hashes, items, removed, built_at}
+#   bloom:{name}:lock   held by the worker that is rebuilding
+#
+# an item maps to k bit positions by double hashing one blake2b digest: (h1 + i * h2) mod m.
+# "no" from might_contain() is definite, "yes" may be a false positive (rate ~ error_rate at capacity)
+# so callers confirm it against mongodb. bits can't be removed: removals are only counted, and once
+# they make up stale_ratio of the items the filter is rebuilt from scratch (stale bits only cost
+# extra fallbacks, never a wrong "available").
+# a rebuild fills a local numpy bit array, writes it to a temp key with one SET and RENAMEs it over
+# the live key, so readers never see a half built filter.
+
+
+MASK64 = (1 << 64) - 1
+REBUILD_LOCK_SECONDS = 600
+
+
+def bloom_parameters(capacity: int, error_rate: float):
+    """capacity개에서 오탐률 error_rate가 되는 (bit 수 m, hash 수 k)"""
+    bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+    bits = (bits + 7) // 8 * 8 # whole bytes, the rebuild writes the string in one piece
+    hashes = max(1, int(round(bits / capacity * math.log(2))))
+    return bits, hashes
+
+
+def _digest(item: str):
+    digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class RedisBloomFilter:
+    """redis bit string 위의 Bloom filter (add / might_contain / rebuild)"""
+
+    def __init__(self, redis, name: str, capacity: int = 1000000, error_rate: float = 0.001,
+                 stale_ratio: float = 0.1):
+        self.redis = redis
+        self.key = f"bloom:{name}"
+        self.meta_key = f"bloom:{name}:meta"
+        self.lock_key = f"bloom:{name}:lock"
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.stale_ratio = stale_ratio
+        self.bits, self.hashes = bloom_parameters(capacity, error_rate)
+        self._counters = {"checks": 0, "absent": 0, "maybe": 0, "unavailable": 0, "false_positives": 0, "rebuilds": 0}
+
+    def positions(self, item: str) -> list:
+        h1, h2 = _digest(item)
+        return [((h1 + i * h2) & MASK64) % self.bits for i in range(self.hashes)]
+
+    def _positions_array(self, items: list) -> np.ndarray:
+        """positions()와 같은 결과를 여러 item에 대해 한 번에 (uint64 overflow = & MASK64)"""
+        digests = np.array([_digest(item) for item in items], dtype=np.uint64).reshape(-1, 2)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            combined = digests[:, :1] + steps * digests[:, 1:]
+        return (combined % np.uint64(self.bits)).ravel()
+
+    # ---------- queries ----------
+
+    async def might_contain(self, item: str) -> Optional[bool]:
+        """False = 확실히 없음, True = 있을 수도 있음, None = filter 사용 불가 (없거나 redis 오류)"""
+        self._counters["checks"] += 1
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.hget(self.meta_key, "bits")
+                field = pipe.bitfield(self.key)
+                for position in self.positions(item):
+                    field.get("u1", position)
+                field.execute() # queued on the pipeline
+                built_bits, bits = await pipe.execute()
+        except Exception as e:
+            print(f"bloom filter 조회 실패 ({self.key}): {e}")
+            built_bits, bits = None, None
+        # missing/flushed filter or one built with other parameters: unknown, caller asks mongodb
+        if built_bits is None or int(built_bits) != self.bits:
+            self._counters["unavailable"] += 1
+            return None
+        if all(bits):
+            self._counters["maybe"] += 1
+            return True
+        self._counters["absent"] += 1
+        return False
+
+    def note_false_positive(self):
+        """might_contain()이 True였지만 실제로는 없었을 때 호출 (metrics)"""
+        self._counters["false_positives"] += 1
+
+    # ---------- updates ----------
+
+    async def add(self, *items: str):
+        """item 추가 (filter가 아직 없으면 무시, 다음 rebuild가 mongodb에서 가져옴)"""
+        items = [item for item in items if item]
+        if not items:
+            return
+        try:
+            if await self.redis.hget(self.meta_key, "bits") is None:
+                return
+            async with self.redis.pipeline(transaction=False) as pipe:
+                field = pipe.bitfield(self.key)
+                for item in items:
+                    for position in self.positions(item):
+                        field.set("u1", position, 1)
+                field.execute()
+                pipe.hincrby(self.meta_key, "items", len(items))
+                await pipe.execute()
+        except Exception as e:
+            # the item is then missing from the filter => a wrong "available" until the next rebuild;
+            # signup still fails cleanly on the unique index
+            print(f"bloom filter 추가 실패 ({self.key}): {e}")
+
+    async def note_removed(self, count: int = 1) -> bool:
+        """삭제된 item 수 기록, rebuild가 필요해지면 True"""
+        try:
+            await self.redis.hincrby(self.meta_key, "removed", count)
+            return await self.needs_rebuild()
+        except Exception as e:
+            print(f"bloom filter 삭제 기록 실패 ({self.key}): {e}")
+            return False
+
+    async def needs_rebuild(self) -> bool:
+        """filter가 없거나, 다른 크기로 만들어졌거나, 삭제된 item 비율이 stale_ratio 이상이면 True"""
+        meta = await self.redis.hgetall(self.meta_key)
+        meta = {k.decode() if isinstance(k, bytes) else k: int(v) for k, v in meta.items()}
+        if meta.get("bits") != self.bits or meta.get("hashes") != self.hashes:
+            return True
+        return meta.get("removed", 0) > max(1, meta.get("items", 0)) * self.stale_ratio
+
+    async def rebuild(self, batches: AsyncIterable[Iterable[str]]) -> Optional[int]:
+        """batches의 모든 item으로 새 filter를 만들어 교체 => item 수 (다른 worker가 rebuild 중이면 None)
+        rebuild 도중 add()된 item은 교체 후 사라지므로 호출자가 시작 시각 이후 추가분을 다시 add()"""
+        token = uuid.uuid4().hex
+        if not await self.redis.set(self.lock_key, token, nx=True, ex=REBUILD_LOCK_SECONDS):
+            return None
+        temp_key = f"{self.key}:building:{token}"
+        try:
+            started = time.perf_counter()
+            array = np.zeros(self.bits // 8, dtype=np.uint8)
+            count = 0
+            async for batch in batches:
+                batch = [item for item in batch if item]
+                if not batch:
+                    continue
+                positions = self._positions_array(batch)
+                np.bitwise_or.at(array, positions >> np.uint64(3),
+                                 (np.uint8(0x80) >> (positions & np.uint64(7)).astype(np.uint8)))
+                count += len(batch)
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.set(temp_key, array.tobytes())
+                pipe.rename(temp_key, self.key)
+                pipe.delete(self.meta_key)
+                pipe.hset(self.meta_key, mapping={
+                    "bits": self.bits,
+                    "hashes": self.hashes,
+                    "items": count,
+                    "removed": 0,
+                    "built_at": int(datetime.datetime.now(datetime.timezone.utc).timestamp()),
+                })
+                await pipe.execute()
+            self._counters["rebuilds"] += 1
+            print(f"bloom filter 재구성 ({self.key}): {count} items, {self.bits // 8 // 1024} KB,"
+                  f" {time.perf_counter() - started:.1f}s")
+            return count
+        finally:
+            try:
+                await self.redis.delete(temp_key)
+                if await self.redis.get(self.lock_key) in (token, token.encode()):
+                    await self.redis.delete(self.lock_key)
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        counters = self._counters
+        answered = counters["absent"] + counters["maybe"]
+        return {
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "capacity": self.capacity,
+            **counters,
+            # share of checks answered "available" without touching mongodb
+            "skip_rate": round(counters["absent"] / counters["checks"], 3) if counters["checks"] else 0.0,
+            "false_positive_rate": round(counters["false_positives"] / answered, 4) if answered else 0.0,
+        }
@@ -0,0 +1,240 @@
+import json
+import time
+import uuid_utils
+from typing import List, NamedTuple, Optional, Tuple
+
+
+# This file contains the redis-side state of a chat room
+# every chat turn is one server-side lua script (check access + append + trim + ttl refresh + read window),
+# so a /chat/message costs two round-trips (user message, assistant reply) and nothing scans the keyspace
+'''
+chat:room:{room_id}          redis hash
+{
+    "model": "solar-pro",
+    "created_at": timestamp,
+    "participant:{user_id}": 1,
+}
+chat:messages:{room_id}      redis sorted set (score = time) => json
+{
+    "messsage_id": message_id,
+    "time": timestamp,
+    "role": role,
+    "user_id": user_id,
+    "message": text,
+}
+chat:summary:{room_id}       redis hash, rolling summary (conversation_summary.py)
+chat:user_rooms:{user_id}    redis set of room_ids, so account deletion doesn't have to scan
+                             (same ttl as the rooms, refreshed on every message of the user's rooms)
+'''
+
+
+PARTICIPANT_FIELD = "participant:"
+USER_ROOMS_PREFIX = "chat:user_rooms:"
+
+
+# KEYS: room, messages, user_rooms / ARGV: room_id, user_id, model, message, time, ttl
+_CREATE_SCRIPT = """
+redis.call('HSET', KEYS[1], 'model', ARGV[3], 'created_at', ARGV[5])
+if ARGV[2] ~= '' then
+    redis.call('HSET', KEYS[1], 'participant:' .. ARGV[2], 1)
+    redis.call('SADD', KEYS[3], ARGV[1])
+    redis.call('EXPIRE', KEYS[3], ARGV[6])
+end
+redis.call('ZADD', KEYS[2], ARGV[5], ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return 1
+"""
+
+# KEYS: room, messages, summary, user_rooms / ARGV: user_id, message, time, ttl, max_messages, window, model
+# returns {-1} (no room) / {-2} (not a participant) / {1, model, newest messages first, {summary, covered_until}}
+_TURN_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1}
+end
+if ARGV[1] ~= '' and redis.call('HEXISTS', KEYS[1], 'participant:' .. ARGV[1]) == 0 then
+    return {-2}
+end
+if ARGV[7] ~= '' then
+    redis.call('HSET', KEYS[1], 'model', ARGV[7])
+end
+local model = redis.call('HGET', KEYS[1], 'model') or ''
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[2])
+local max_messages = tonumber(ARGV[5])
+if max_messages > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -max_messages - 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+if ARGV[1] ~= '' then
+    redis.call('EXPIRE', KEYS[4], ARGV[4])
+end
+local recent = redis.call('ZREVRANGE', KEYS[2], 0, tonumber(ARGV[6]) - 1)
+return {1, model, recent, redis.call('HMGET', KEYS[3], 'summary', 'covered_until')}
+"""
+
+# KEYS: room, messages, summary, user_rooms / ARGV: message, time, ttl, max_messages, user_id
+# the room may have been closed/expired meanwhile; don't leave an orphan message set behind
+_APPEND_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+local max_messages = tonumber(ARGV[4])
+if max_messages > 0 then
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -max_messages - 1)
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+if ARGV[5] ~= '' then
+    redis.call('EXPIRE', KEYS[4], ARGV[3])
+end
+return 1
+"""
+
+# KEYS: room, messages, summary / ARGV: room_id, user_rooms prefix
+# (touches the participants' chat:user_rooms:* sets too; fine on a single redis instance)
+_CLOSE_SCRIPT = """
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    if string.sub(field, 1, 12) == 'participant:' then
+        redis.call('SREM', ARGV[2] .. string.sub(field, 13), ARGV[1])
+    end
+end
+return redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+"""
+
+
+class RoomNotFound(Exception):
+    """채팅 세션이 시작되지 않았거나 만료됨"""
+
+
+class RoomAccessDenied(Exception):
+    """채팅방 참여자가 아님"""
+
+
+class ChatTurn(NamedTuple):
+    message: str # stored json (for remove_message)
+    model: str
+    conversation: List[dict] # recent window, oldest first
+    summary: Optional[dict] # {"summary", "covered_until"} or None
+
+
+class ChatRoomStore:
+    """채팅방 상태(메타데이터 hash + 메시지 sorted set) 저장소, 변경은 모두 lua script 한 번으로 처리"""
+
+    def __init__(self, redis_client, ttl: int = 7200, max_messages: int = 200):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.max_messages = max_messages # 0 = no trimming
+        self._create = redis_client.register_script(_CREATE_SCRIPT)
+        self._turn = redis_client.register_script(_TURN_SCRIPT)
+        self._append = redis_client.register_script(_APPEND_SCRIPT)
+        self._close = redis_client.register_script(_CLOSE_SCRIPT)
+
+    @staticmethod
+    def room_key(room_id: str) -> str:
+        return f"chat:room:{room_id}"
+
+    @staticmethod
+    def messages_key(room_id: str) -> str:
+        return f"chat:messages:{room_id}"
+
+    @staticmethod
+    def summary_key(room_id: str) -> str:
+        return f"chat:summary:{room_id}"
+
+    def _room_keys(self, room_id: str) -> List[str]:
+        return [self.room_key(room_id), self.messages_key(room_id), self.summary_key(room_id)]
+
+    @staticmethod
+    def new_message(user_id: Optional[str], text, role: str) -> Tuple[str, float]:
+        """저장할 메시지 json과 score(시간)"""
+        timestamp = time.time() # sort with time(=score) (redis sorted set)
+        data = json.dumps({
+            "messsage_id": str(uuid_utils.uuid7()),
+            "time": timestamp,
+            "role": role,
+            "user_id": user_id,
+            "message": text,
+        })
+        return data, timestamp
+
+    async def create(self, room_id: str, user_id: Optional[str], model: str, first_message: str) -> str:
+        """방 생성 + 참여자 등록 + 첫 assistant 메시지 저장. 저장된 메시지 json 반환"""
+        data, timestamp = self.new_message(user_id, first_message, "assistant")
+        await self._create(
+            keys=[self.room_key(room_id), self.messages_key(room_id), f"{USER_ROOMS_PREFIX}{user_id or ''}"],
+            args=[room_id, user_id or "", model, data, timestamp, self.ttl],
+        )
+        return data
+
+    async def check_access(self, room_id: str, user_id: Optional[str]):
+        """방이 없으면 RoomNotFound, 참여자가 아니면 RoomAccessDenied"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(self.room_key(room_id))
+            pipe.hexists(self.room_key(room_id), f"{PARTICIPANT_FIELD}{user_id or ''}")
+            exists, is_participant = await pipe.execute()
+        if not exists:
+            raise RoomNotFound(room_id)
+        if user_id and not is_participant:
+            raise RoomAccessDenied(room_id)
+
+    async def add_user_message(self, room_id: str, user_id: Optional[str], text: str, model: str = "",
+                         window: int = 30) -> ChatTurn:
+        """접근 확인 + 사용자 메시지 저장 + (model 변경) + 최근 window개 / 요약 조회를 한 번에"""
+        data, timestamp = self.new_message(user_id, text, "user")
+        result = await self._turn(
+            keys=[*self._room_keys(room_id), f"{USER_ROOMS_PREFIX}{user_id or ''}"],
+            args=[user_id or "", data, timestamp, self.ttl, self.max_messages, window, model or ""],
+        )
+        if result[0] == -1:
+            raise RoomNotFound(room_id)
+        if result[0] == -2:
+            raise RoomAccessDenied(room_id)
+        stored_model = result[1].decode("utf-8") if isinstance(result[1], bytes) else result[1]
+        summary, covered_until = result[3]
+        return ChatTurn(
+            message=data,
+            model=stored_model or "solar-pro",
+            conversation=[json.loads(raw) for raw in reversed(result[2])],
+            summary=None if summary is None else {
+                "summary": summary.decode("utf-8") if isinstance(summary, bytes) else summary,
+                "covered_until": float(covered_until or 0),
+            },
+        )
+
+    async def add_message(self, room_id: str, user_id: Optional[str], text, role: str) -> Optional[str]:
+        """메시지 추가 (방이 이미 닫혔으면 저장하지 않고 None)"""
+        data, timestamp = self.new_message(user_id, text, role)
+        stored = await self._append(
+            keys=[*self._room_keys(room_id), f"{USER_ROOMS_PREFIX}{user_id or ''}"],
+            args=[data, timestamp, self.ttl, self.max_messages, user_id or ""],
+        )
+        return data if stored else None
+
+    async def remove_message(self, room_id: str, data: str):
+        """add_* 가 반환한 메시지를 대화 기록에서 제거"""
+        await self.redis.zrem(self.messages_key(room_id), data)
+
+    async def recent_messages(self, room_id: str, count: int = 12) -> List[dict]:
+        """최근 count개 메시지 (오래된 순)"""
+        raw = await self.redis.zrevrange(self.messages_key(room_id), 0, count - 1)
+        return [json.loads(msg) for msg in reversed(raw)]
+
+    async def all_messages(self, room_id: str) -> List[dict]:
+        return [json.loads(msg) for msg in await self.redis.zrange(self.messages_key(room_id), 0, -1)]
+
+    async def close(self, room_id: str):
+        """대화 기록, 참여자, 요약 등 채팅방 상태 삭제"""
+        await self._close(keys=self._room_keys(room_id), args=[room_id, USER_ROOMS_PREFIX])
+
+    async def close_user_rooms(self, user_id: str) -> int:
+        """사용자가 참여한 모든 채팅방 삭제 (계정 삭제 시)"""
+        key = f"{USER_ROOMS_PREFIX}{user_id}"
+        rooms = await self.redis.smembers(key)
+        for room_id in rooms:
+            await self.close(room_id.decode("utf-8") if isinstance(room_id, bytes) else room_id)
+        await self.redis.delete(key)
+        return len(rooms)
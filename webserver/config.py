@@ -26,10 +26,121 @@ class ServerConfig(BaseSettings):
     MAIL_FROM: str = ""
     MAIL_SERVER: str = "smtp.gmail.com"
     MAIL_PORT: int = 587
+    MAIL_STARTTLS: bool = True # false for a local stand-in (scripts/benchmarks/smtp_sink.py)
+    MAIL_VALIDATE_CERTS: bool = True
+    MAIL_TIMEOUT: float = 30.0
+    
+    # outbound mail (webserver/mailer.py, "mail" job queue consumed by `python -m webserver.worker`)
+    MAIL_QUEUE_ENABLED: bool = True # false = send inside the request
+    MAIL_JOB_MAX_ATTEMPTS: int = 5
+    MAIL_SMTP_POOL_SIZE: int = 2 # authenticated smtp sessions kept open per process
+    MAIL_SMTP_IDLE_TIMEOUT: float = 60.0 # sessions idle longer than this are reconnected
+    MAIL_SMTP_MAX_MESSAGES: int = 100 # messages per session before it is replaced
+    MAIL_RATE_PER_MINUTE: int = 60 # across all processes (0 = unlimited)
     
     # public base url for links in emails and external callbacks
     PUBLIC_BASE_URL: str = "https://emotlink.com"
     
+    # outbound http pools (one keep-alive pool per upstream)
+    HTTP_POOL_MAX_CONNECTIONS: int = 50
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0 # seconds
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP2_ENABLED: bool = False # requires the optional h2 package
+    SOLAR_TIMEOUT: float = 30.0
+    SOLAR_DIARY_TIMEOUT: float = 60.0 # diary generation is a longer completion
+    SELF_HOSTED_TIMEOUT: float = 60.0
+    GOOGLE_STT_TIMEOUT: float = 60.0
+    
+    # llm provider routing (self-hosted model -> solar)
+    LLM_HEALTH_WINDOW: int = 100 # recent calls kept per provider
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 3 # consecutive failures that open the circuit
+    LLM_CIRCUIT_ERROR_RATE: float = 0.5 # ...or this error rate over the window
+    LLM_CIRCUIT_MIN_SAMPLES: int = 10
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0 # then one probe request is let through
+    LLM_HEDGE_ENABLED: bool = False # send a hedged request to solar when the primary is slow
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY: float = 1.0
+    LLM_HEDGE_MAX_DELAY: float = 10.0
+    
+    # deadline budgets (seconds, counted from request arrival / job start)
+    CHAT_REQUEST_BUDGET: float = 40.0
+    CHAT_FALLBACK_RESERVE: float = 12.0 # kept back from the self-hosted call for the solar fallback
+    DIARY_JOB_BUDGET: float = 90.0
+    
+    # mongodb (async client, one connection pool per process)
+    MONGO_URL: str = "mongodb://localhost:27017/"
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: int = 60000 # close pooled connections idle longer than this
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = 5000 # wait this long for a free pooled connection
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MIGRATIONS_ON_STARTUP: bool = True # apply pending index/schema migrations (webserver/migrations.py)
+    
+    # redis (one async connection pool shared by chat rooms, email verification and job queues)
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 21101
+    REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0 # wait this long for a free connection before failing
+    REDIS_SOCKET_TIMEOUT: float = 5.0 # must stay above the worker's 2s blocking stream read
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30 # seconds idle before a connection is pinged on checkout
+    
+    # chat room state in redis (webserver/chat_store.py)
+    CHAT_ROOM_TTL: int = 7200 # seconds, refreshed on every message
+    CHAT_ROOM_MAX_MESSAGES: int = 200 # older messages are trimmed (0 = keep all)
+    
+    # prompt layout: "flat" = whole history flattened into one user message,
+    # "multiturn" = stable system prompt + real assistant/user turns + instruction last (prefix-cache friendly)
+    CHAT_PROMPT_LAYOUT: str = "flat"
+    
+    # start diary generation together with the closing message (kept only if the reply has END_CHAT);
+    # only used when the diary is generated inside the request (DIARY_JOB_QUEUE_ENABLED=false)
+    CHAT_SPECULATIVE_DIARY: bool = False
+    
+    # rolling conversation summary (prompt = summary + recent raw messages)
+    CHAT_SUMMARY_ENABLED: bool = False
+    CHAT_SUMMARY_RAW_MESSAGES: int = 6 # newest messages always sent verbatim
+    CHAT_PROMPT_TOKEN_BUDGET: int = 1500 # estimated tokens for summary + raw history
+    
+    # background jobs (redis streams, consumed by `python -m webserver.worker`)
+    DIARY_JOB_QUEUE_ENABLED: bool = True # false = generate the diary inside the request
+    DIARY_JOB_MAX_ATTEMPTS: int = 4
+    JOB_BACKOFF_BASE: float = 2.0 # retry n waits base**n seconds
+    WORKER_CONCURRENCY: int = 4
+    WORKER_RECLAIM_IDLE_MS: int = 300000 # take over jobs stuck on a dead worker
+    
+    # emotion trend rollups: calendar buckets (day/week/month) are cut in this timezone
+    STATS_TIMEZONE: str = "Asia/Seoul"
+    
+    # linker stats analytics (routers/emoter/analytics.py)
+    ANALYTICS_ROLLING_WINDOW: int = 7 # diaries per moving average / anomaly baseline
+    ANALYTICS_ANOMALY_Z: float = 2.0 # |z-score| at or above this is flagged
+    ANALYTICS_MAX_ENTRIES: int = 100000 # newest diaries loaded per user
+    
+    # password hashing (bcrypt in a dedicated thread pool, webserver/password_hasher.py)
+    BCRYPT_ROUNDS: int = 12 # stored hashes with another cost are re-hashed on the next login
+    PASSWORD_HASH_WORKERS: int = 2 # concurrent bcrypt calls
+    PASSWORD_HASH_MAX_QUEUE: int = 64 # waiting calls beyond this are rejected (login shows "try again")
+    
+    # verified login tokens kept in memory per process (webserver/token_cache.py, 0 = off)
+    TOKEN_CACHE_SIZE: int = 1024
+    
+    # user profile / link read cache (webserver/read_cache.py): per-process LRU in front of redis
+    CACHE_LOCAL_SIZE: int = 2048 # entries per namespace per process (0 = redis tier only)
+    CACHE_LOCAL_TTL: float = 30.0 # seconds, bounds staleness if a pub/sub invalidation is missed
+    CACHE_REDIS_TTL: int = 300 # seconds (0 = local tier only)
+    
+    # id / email availability pre-check (bloom filter in redis, webserver/bloom_filter.py)
+    USER_BLOOM_CAPACITY: int = 1000000 # items (ids + emails = 2 per user), sets the filter size
+    USER_BLOOM_ERROR_RATE: float = 0.001 # false "maybe taken" rate at capacity (then mongodb decides)
+    USER_BLOOM_STALE_RATIO: float = 0.1 # rebuild once deleted items reach this share
+    
+    # /internal/metrics access token (blank = endpoint disabled)
+    METRICS_TOKEN: str = ""
+    
     model_config = SettingsConfigDict(
         env_file=[".env", "../.env"],  # 여러 경로 시도
         env_file_encoding="utf-8",
@@ -0,0 +1,39 @@
+import time
+from typing import Optional
+
+
+# This file contains the per-request deadline budget
+# a Deadline starts when the request arrives (see RequestStartMiddleware) and every
+# outbound hop (self-hosted model -> solar fallback -> diary generation) only gets the time that is left
+
+
+class DeadlineExceeded(Exception):
+    """남은 시간이 부족해 다음 호출을 시작하지 않음"""
+
+
+class Deadline:
+    def __init__(self, budget: float, started_at: Optional[float] = None):
+        self.budget = budget
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.expires_at = self.started_at + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float, reserve: float = 0.0, minimum: float = 0.5) -> float:
+        """다음 호출에 줄 timeout: min(cap, 남은 시간 - reserve)
+        reserve는 뒤따를 fallback 호출 몫으로 남겨 둘 시간. minimum보다 적게 남으면 DeadlineExceeded"""
+        available = self.remaining() - reserve
+        if available < minimum:
+            raise DeadlineExceeded(f"deadline budget exhausted ({self.remaining():.1f}s left, {reserve:.1f}s reserved)")
+        return min(cap, available)
+
+
+def request_deadline(request, budget: float) -> Deadline:
+    """요청 도착 시각(미들웨어가 기록)부터 budget 초짜리 deadline"""
+    started_at = getattr(request.state, "started_at", None)
+    return Deadline(budget, started_at=started_at)
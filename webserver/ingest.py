@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from collections import Counter, defaultdict
+from typing import IO, Iterator, Optional
+from zoneinfo import ZoneInfo
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .config import server_config
+from .search_index import search_grams
+from .shared import client, diaries, user_stats, emotion_rollups
+from .routers.emoter.emotion_stats import (
+    DEFAULT_EMOTION, begin_diary_writes, end_diary_writes, rebuild_user_aggregates, stats_increment,
+)
+from .routers.emoter.emotion_trend import GRANULARITIES, bucket_start
+
+
+# Bulk diary ingest (JSON array or NDJSON, read as a stream)
+#   python -m webserver.ingest public_diary_board.json --author-id USER
+#   python -m webserver.ingest diaries.ndjson --batch-size 2000
+#   python -m webserver.ingest diaries.ndjson --dry-run        parse and map only
+# records are mapped to the diary schema and written with unordered insert_many per batch;
+# user_stats, emotion_rollups and search_grams are updated for every inserted batch.
+# only one batch is held in memory, so the file size does not matter
+
+
+READ_CHUNK = 1 << 20 # characters read from the file at a time
+DEFAULT_BATCH_SIZE = 1000
+PROGRESS_EVERY = 50 # batches
+
+
+def iter_json_array(stream: IO[str], chunk_size: int = READ_CHUNK) -> Iterator[dict]:
+    """'[ {...}, {...} ]' 형식 파일에서 원소를 하나씩 (파일 전체를 읽지 않음)"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        more = stream.read(chunk_size)
+        eof = not more
+        buffer, pos = buffer[pos:] + more, 0
+        return not eof
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    expect_value = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError("unterminated JSON array")
+        if buffer[pos] == "]":
+            return
+        if not expect_value:
+            if buffer[pos] != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+            pos += 1
+            expect_value = True
+            continue
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if fill():
+                continue
+            raise
+        if isinstance(value, (int, float)) and not (end < len(buffer) and buffer[end] in " \t\r\n,]"):
+            # a number cut at the end of the chunk (e.g. "1." + "5e3"), decode it again with more data
+            if not eof and fill():
+                continue
+        pos = end
+        expect_value = False
+        yield value
+
+
+def iter_ndjson(stream: IO[str]) -> Iterator[dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(stream: IO[str]) -> Iterator[dict]:
+    """첫 글자가 '['이면 JSON array, 아니면 NDJSON"""
+    while True:
+        ch = stream.read(1)
+        if not ch or not ch.isspace():
+            break
+    if not ch:
+        return
+    rest = _Prefixed(ch, stream)
+    yield from (iter_json_array(rest) if ch == "[" else iter_ndjson(rest))
+
+
+class _Prefixed:
+    """이미 읽은 첫 글자를 다시 앞에 붙여 읽는 stream"""
+
+    def __init__(self, prefix: str, stream: IO[str]):
+        self.prefix, self.stream = prefix, stream
+
+    def read(self, size: int = -1) -> str:
+        prefix, self.prefix = self.prefix, ""
+        if size is not None and size >= 0:
+            size = max(0, size - len(prefix))
+        return prefix + self.stream.read(size)
+
+    def __iter__(self):
+        first = self.prefix + self.stream.readline()
+        self.prefix = ""
+        if first:
+            yield first
+        yield from self.stream
+
+
+def _parse_created_at(record: dict, tz: ZoneInfo) -> datetime.datetime:
+    value = record.get("created_at")
+    if isinstance(value, dict):
+        value = value.get("$date") # mongoexport extended json
+    if isinstance(value, str) and value:
+        parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    elif record.get("date"):
+        parsed = datetime.datetime.strptime(str(record["date"]).replace("-", "."), "%Y.%m.%d")
+    else:
+        raise ValueError("created_at / date missing")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=tz) # naive timestamps are local time
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def to_diary(record: dict, author_id: Optional[str] = None, tz: Optional[ZoneInfo] = None) -> dict:
+    """입력 레코드를 diaries 문서로 변환, 변환할 수 없으면 ValueError"""
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    author = author_id or record.get("author_id") or record.get("author")
+    if not author:
+        raise ValueError("author missing")
+    title = str(record.get("title") or "")
+    content = str(record.get("content") or "")
+    return {
+        "title": title,
+        "content": content,
+        "emotion": record.get("emotion") or DEFAULT_EMOTION,
+        "author_id": str(author),
+        "created_at": _parse_created_at(record, tz or ZoneInfo(server_config.STATS_TIMEZONE)),
+        "last_modified": datetime.datetime.now(datetime.timezone.utc),
+        "depression": int(record.get("depression") or 0),
+        "isolation": int(record.get("isolation") or 0),
+        "frustration": int(record.get("frustration") or 0),
+        "search_grams": search_grams(title, content),
+    }
+
+
+def _add(target: dict, increment: dict):
+    for key, value in increment.items():
+        target[key] = target.get(key, 0) + value
+
+
+class Ingest:
+    """batch 단위 저장 + 파생 통계 갱신, 진행 상황 집계"""
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, dry_run: bool = False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.read = self.inserted = self.invalid = self.failed = self.batches = 0
+        self.started = time.perf_counter()
+        self.stats_rebuild = set() # authors without user_stats: stats + rollups rebuilt from all their diaries at the end
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    async def write_batch(self, batch: list):
+        self.batches += 1
+        if self.dry_run:
+            return
+        # pending writes per author, so a concurrent rebuild waits instead of counting them twice
+        pending = Counter(doc["author_id"] for doc in batch)
+        self.stats_rebuild |= await begin_diary_writes(pending)
+        failed = set()
+        try:
+            await diaries.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            for error in e.details.get("writeErrors", [])[:3]:
+                print(f"insert 실패: {error.get('errmsg')}")
+        except BaseException:
+            await end_diary_writes(pending)
+            raise
+        written = [doc for i, doc in enumerate(batch) if i not in failed]
+        self.failed += len(failed)
+        self.inserted += len(written)
+        await self.update_derived(written, pending)
+
+    async def update_derived(self, written: list, pending: Counter):
+        """저장된 일기만큼 user_stats / emotion_rollups에 $inc (batch 안에서 먼저 합산)
+        pending(begin_diary_writes에 넘긴 작성자별 일기 수)은 저장 여부와 관계없이 모두 해제"""
+        stats, rollups = defaultdict(dict), defaultdict(dict)
+        for author, count in pending.items():
+            stats[author] = {"pending": -count, "version": 1}
+        for doc in written:
+            if doc["author_id"] in self.stats_rebuild:
+                continue # counted by the rebuild at the end
+            increment = {**stats_increment(doc), "version": 1}
+            _add(stats[doc["author_id"]], {k: v for k, v in increment.items() if k != "version"})
+            for granularity in GRANULARITIES:
+                _add(rollups[(doc["author_id"], granularity, bucket_start(doc["created_at"], granularity))], increment)
+
+        if not stats:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        # rollups first: the user_stats $inc releases pending, and a rebuild may start right after
+        if rollups:
+            await emotion_rollups.bulk_write([
+                UpdateOne(
+                    {"user_id": author, "granularity": granularity, "bucket": bucket},
+                    {"$inc": increment, "$set": {"updated_at": now}},
+                    upsert=True,
+                )
+                for (author, granularity, bucket), increment in rollups.items()
+            ], ordered=False)
+        await user_stats.bulk_write([
+            UpdateOne({"_id": author}, {"$inc": increment, "$set": {"updated_at": now}}, upsert=True)
+            for author, increment in stats.items()
+        ], ordered=False)
+
+    async def finish(self):
+        for author in sorted(self.stats_rebuild):
+            await rebuild_user_aggregates(author)
+
+    def progress(self) -> str:
+        rate = self.read / self.elapsed if self.elapsed else 0.0
+        return (f"read {self.read}  inserted {self.inserted}  invalid {self.invalid}  failed {self.failed}"
+                f"  {self.elapsed:.1f}s  {rate:,.0f} records/s")
+
+
+async def ingest(records: Iterator[dict], batch_size: int = DEFAULT_BATCH_SIZE, author_id: Optional[str] = None,
+                 dry_run: bool = False, tz: Optional[ZoneInfo] = None) -> Ingest:
+    """레코드 stream을 batch_size씩 변환/저장, 잘못된 레코드는 건너뛰고 개수만 센다"""
+    run = Ingest(batch_size, dry_run)
+    tz = tz or ZoneInfo(server_config.STATS_TIMEZONE)
+    batch = []
+    for record in records:
+        run.read += 1
+        try:
+            batch.append(to_diary(record, author_id, tz))
+        except (ValueError, TypeError) as e:
+            run.invalid += 1
+            if run.invalid <= 3:
+                print(f"레코드 {run.read} 건너뜀: {e}")
+            continue
+        if len(batch) >= batch_size:
+            await run.write_batch(batch)
+            batch = []
+            if run.batches % PROGRESS_EVERY == 0:
+                print(run.progress())
+    if batch:
+        await run.write_batch(batch)
+    if not dry_run:
+        await run.finish()
+    return run
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="bulk diary ingest (JSON array or NDJSON)")
+    parser.add_argument("path", help="JSON array or NDJSON file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--author-id", help="store every record under this user id (otherwise author_id / author)")
+    parser.add_argument("--timezone", default=server_config.STATS_TIMEZONE, help="timezone of naive timestamps")
+    parser.add_argument("--dry-run", action="store_true", help="parse and map only, write nothing")
+    args = parser.parse_args()
+
+    try:
+        with open(args.path, encoding="utf-8-sig") as stream:
+            run = await ingest(iter_records(stream), args.batch_size, args.author_id, args.dry_run, ZoneInfo(args.timezone))
+        print(f"ingest {'(dry run) ' if args.dry_run else ''}완료: {run.progress()}")
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
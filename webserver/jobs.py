@@ -0,0 +1,151 @@
+import json
+import time
+import uuid_utils
+from typing import List, Optional, Tuple
+
+
+# This file contains a small durable job queue on top of redis streams
+# producers (route handlers) enqueue, the worker process (webserver/worker.py) consumes
+'''
+jobs:{name}            redis stream, one field "job" => json payload
+jobs:{name}:delayed    redis sorted set, retry backoff (score = run at)
+jobs:{name}:dead       redis list, jobs that used up every attempt
+jobs:status:{job_id}   redis hash, {"status": queued|running|done|retrying|failed, ...}
+'''
+
+
+JOB_STATUS_TTL = 86400 # 1 day
+
+
+class JobQueue:
+    """Redis Streams 기반 작업 큐 (consumer group, 재시도 backoff, dead-letter)"""
+
+    def __init__(self, redis_client, name: str, max_attempts: int = 3, backoff_base: float = 2.0):
+        self.redis = redis_client
+        self.name = name
+        self.stream = f"jobs:{name}"
+        self.group = f"{name}-workers"
+        self.delayed = f"jobs:{name}:delayed"
+        self.dead_letter = f"jobs:{name}:dead"
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+
+    # ---------- producer side ----------
+
+    async def enqueue(self, payload: dict, job_id: Optional[str] = None, **status_fields) -> str:
+        """작업 등록 후 job_id 반환 (status_fields는 상태 hash에 함께 기록, ex) 소유자 user_id)"""
+        job_id = job_id or str(uuid_utils.uuid7())
+        job = {"job_id": job_id, "attempt": 0, "payload": payload, "enqueued_at": time.time()}
+        await self.set_status(job_id, "queued", queue=self.name, **status_fields)
+        await self.redis.xadd(self.stream, {"job": json.dumps(job, ensure_ascii=False)})
+        return job_id
+
+    async def set_status(self, job_id: str, status: str, **fields):
+        key = f"jobs:status:{job_id}"
+        mapping = {"status": status, "updated_at": time.time()}
+        mapping.update({k: v if isinstance(v, (str, int, float)) else json.dumps(v, ensure_ascii=False) for k, v in fields.items()})
+        await self.redis.hset(key, mapping=mapping)
+        await self.redis.expire(key, JOB_STATUS_TTL)
+
+    async def get_status(self, job_id: str) -> Optional[dict]:
+        raw = await self.redis.hgetall(f"jobs:status:{job_id}")
+        if not raw:
+            return None
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in raw.items()
+        }
+
+    # ---------- consumer side ----------
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            # BUSYGROUP: group already exists
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, count: int = 1, block_ms: int = 5000) -> List[Tuple[str, dict]]:
+        """새 작업 읽기 (없으면 block_ms 동안 대기)"""
+        response = await self.redis.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block_ms)
+        return self._decode_entries(response[0][1] if response else [])
+
+    async def reclaim_stale(self, consumer: str, min_idle_ms: int, count: int = 10) -> List[Tuple[str, dict]]:
+        """죽은 worker가 잡고 있던 작업 회수"""
+        response = await self.redis.xautoclaim(self.stream, self.group, consumer, min_idle_ms, start_id="0-0", count=count)
+        return self._decode_entries(response[1] if response else [])
+
+    def _decode_entries(self, entries) -> List[Tuple[str, dict]]:
+        result = []
+        for entry_id, fields in entries:
+            if not fields:
+                continue
+            raw = fields.get(b"job") or fields.get("job")
+            entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+            result.append((entry_id, json.loads(raw)))
+        return result
+
+    async def ack(self, entry_id: str):
+        await self.redis.xack(self.stream, self.group, entry_id)
+        await self.redis.xdel(self.stream, entry_id)
+
+    async def retry_or_dead_letter(self, entry_id: str, job: dict, error: str) -> bool:
+        """실패한 작업을 backoff 후 재시도 예약, 시도 횟수를 다 쓰면 dead-letter로 이동
+        재시도 예약이면 True"""
+        job = dict(job)
+        job["attempt"] = job.get("attempt", 0) + 1
+        job["last_error"] = error
+        if job["attempt"] < self.max_attempts:
+            run_at = time.time() + self.backoff_base ** job["attempt"]
+            await self.redis.zadd(self.delayed, {json.dumps(job, ensure_ascii=False): run_at})
+            await self.set_status(job["job_id"], "retrying", attempt=job["attempt"], error=error)
+            retried = True
+        else:
+            job["failed_at"] = time.time()
+            await self.redis.lpush(self.dead_letter, json.dumps(job, ensure_ascii=False))
+            await self.set_status(job["job_id"], "failed", attempt=job["attempt"], error=error)
+            retried = False
+        await self.ack(entry_id)
+        return retried
+
+    async def promote_delayed(self, limit: int = 50) -> int:
+        """backoff가 끝난 재시도 작업을 stream으로 되돌림"""
+        due = await self.redis.zrangebyscore(self.delayed, 0, time.time(), start=0, num=limit)
+        moved = 0
+        for raw in due:
+            # only the worker that wins the ZREM re-publishes the job
+            if await self.redis.zrem(self.delayed, raw):
+                await self.redis.xadd(self.stream, {"job": raw})
+                moved += 1
+        return moved
+
+    async def requeue_dead(self, limit: int = 100) -> int:
+        """dead-letter 작업을 시도 횟수 초기화 후 다시 등록"""
+        moved = 0
+        for _ in range(limit):
+            raw = await self.redis.rpop(self.dead_letter)
+            if raw is None:
+                break
+            job = json.loads(raw)
+            job["attempt"] = 0
+            job.pop("failed_at", None)
+            await self.set_status(job["job_id"], "queued", queue=self.name)
+            await self.redis.xadd(self.stream, {"job": json.dumps(job, ensure_ascii=False)})
+            moved += 1
+        return moved
+
+    async def stats(self) -> dict:
+        """큐 길이 / 처리 중 / 재시도 대기 / dead-letter 개수"""
+        pending = 0
+        try:
+            info = await self.redis.xpending(self.stream, self.group)
+            pending = info.get("pending", 0) if isinstance(info, dict) else 0
+        except Exception:
+            pass
+        return {
+            "stream": await self.redis.xlen(self.stream),
+            "pending": pending,
+            "delayed": await self.redis.zcard(self.delayed),
+            "dead": await self.redis.llen(self.dead_letter),
+        }
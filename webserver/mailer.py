@@ -0,0 +1,240 @@
+import asyncio
+import time
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+from typing import Optional
+
+import aiosmtplib
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+
+# This file contains the outbound mailer used by the "mail" job queue (webserver/worker.py)
+#
+#   render : templates/email/*.html|txt, each compiled once per process on first use
+#   limit  : MAIL_RATE_PER_MINUTE across every process (redis counter "mail:rate:{minute}")
+#   send   : SMTPPool keeps up to MAIL_SMTP_POOL_SIZE connected + authenticated sessions and reuses
+#            them, so only the first message pays connect / STARTTLS / AUTH. sessions idle longer than
+#            MAIL_SMTP_IDLE_TIMEOUT or used for MAIL_SMTP_MAX_MESSAGES messages are replaced; a pooled
+#            session the server already dropped is retried once on a fresh one
+#
+# run_job() raises on transient failures (4xx, network) so JobQueue retries with backoff, and returns
+# {"rejected": code} on permanent 5xx answers that another attempt would not fix
+
+
+# template name => (subject, html template, text template)
+MAIL_TEMPLATES = {
+    "verification": ("EmotLink 이메일 인증", "email/verification.html", "email/verification.txt"),
+}
+
+RATE_WINDOW = 60 # seconds
+
+
+class MailRateLimiter:
+    """여러 worker가 공유하는 분당 발송 제한 (redis fixed window), limit 0 = 제한 없음"""
+
+    def __init__(self, redis, per_minute: int):
+        self.redis = redis
+        self.per_minute = per_minute
+        self.waits = 0
+
+    async def acquire(self):
+        if self.per_minute <= 0:
+            return
+        while True:
+            now = time.time()
+            window = int(now // RATE_WINDOW)
+            key = f"mail:rate:{window}"
+            count = await self.redis.incr(key)
+            if count == 1:
+                await self.redis.expire(key, RATE_WINDOW * 2)
+            if count <= self.per_minute:
+                return
+            # window full: wait for the next one (the job stays claimed by this consumer meanwhile)
+            self.waits += 1
+            await asyncio.sleep((window + 1) * RATE_WINDOW - now)
+
+
+class _Session:
+    __slots__ = ("smtp", "last_used", "sent")
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
+    """인증까지 끝난 SMTP 연결을 재사용하는 pool (동시 발송 = pool 크기)"""
+
+    def __init__(self, config):
+        self.hostname = config.MAIL_SERVER
+        self.port = config.MAIL_PORT
+        self.username = config.MAIL_USERNAME
+        self.password = config.MAIL_PASSWORD
+        self.start_tls = config.MAIL_STARTTLS
+        self.validate_certs = config.MAIL_VALIDATE_CERTS
+        self.timeout = config.MAIL_TIMEOUT
+        self.size = config.MAIL_SMTP_POOL_SIZE
+        self.idle_timeout = config.MAIL_SMTP_IDLE_TIMEOUT
+        self.max_messages = config.MAIL_SMTP_MAX_MESSAGES
+        self._idle = []
+        self._slots = None # asyncio.Semaphore, created on first use inside the running loop
+        self._counters = {"connects": 0, "reused": 0, "stale_retries": 0}
+
+    async def _connect(self) -> _Session:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            start_tls=self.start_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.username:
+            await smtp.login(self.username, self.password)
+        self._counters["connects"] += 1
+        return _Session(smtp)
+
+    @staticmethod
+    async def _close(session: Optional[_Session]):
+        if session is None:
+            return
+        try:
+            await session.smtp.quit()
+        except Exception:
+            session.smtp.close()
+
+    async def _checkout(self) -> Optional[_Session]:
+        now = time.monotonic()
+        while self._idle:
+            session = self._idle.pop()
+            if session.smtp.is_connected and now - session.last_used < self.idle_timeout:
+                return session
+            await self._close(session)
+        return None
+
+    async def send(self, message: EmailMessage):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            session = await self._checkout()
+            if session is not None:
+                self._counters["reused"] += 1
+                try:
+                    await session.smtp.send_message(message)
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError):
+                    # the server closed the pooled session (idle timeout on its side): one fresh attempt
+                    self._counters["stale_retries"] += 1
+                    session.smtp.close()
+                    session = None
+                except Exception:
+                    await self._close(session)
+                    raise
+                else:
+                    await self._release(session)
+                    return
+            session = await self._connect()
+            try:
+                await session.smtp.send_message(message)
+            except Exception:
+                await self._close(session)
+                raise
+            await self._release(session)
+
+    async def _release(self, session: _Session):
+        session.sent += 1
+        session.last_used = time.monotonic()
+        if session.sent >= self.max_messages:
+            await self._close(session)
+        else:
+            self._idle.append(session)
+
+    async def aclose(self):
+        idle, self._idle = self._idle, []
+        for session in idle:
+            await self._close(session)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "idle": len(self._idle), **self._counters}
+
+
+class Mailer:
+    """템플릿 렌더링 + 발송 제한 + pooled SMTP 발송"""
+
+    def __init__(self, config, redis, template_dir: str = "templates"):
+        self.sender = formataddr(("EmotLink", config.MAIL_FROM))
+        self.from_address = config.MAIL_FROM
+        self.pool = SMTPPool(config)
+        self.limiter = MailRateLimiter(redis, config.MAIL_RATE_PER_MINUTE)
+        self._env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=select_autoescape(["html"]),
+            undefined=StrictUndefined,
+            auto_reload=False, # compiled once per process, no mtime check per render
+        )
+        self._templates = {}
+        self._counters = {"sent": 0, "failed": 0, "rejected": 0}
+        self._send_total = 0.0
+
+    def _compiled(self, template: str):
+        """template 이름 => (subject, html, text), 처음 사용할 때 한 번만 compile"""
+        compiled = self._templates.get(template)
+        if compiled is None:
+            subject, html, text = MAIL_TEMPLATES[template]
+            compiled = (subject, self._env.get_template(html), self._env.get_template(text))
+            self._templates[template] = compiled
+        return compiled
+
+    def render(self, template: str, to: str, context: dict) -> EmailMessage:
+        """template 이름과 context로 html + text 메일 생성"""
+        subject, html, text = self._compiled(template)
+        message = EmailMessage()
+        message["Subject"] = subject
+        message["From"] = self.sender
+        message["To"] = to
+        message["Message-ID"] = make_msgid(domain=self.from_address.rpartition("@")[2] or None)
+        message.set_content(text.render(**context))
+        message.add_alternative(html.render(**context), subtype="html")
+        return message
+
+    async def send(self, template: str, to: str, **context):
+        message = self.render(template, to, context)
+        await self.limiter.acquire()
+        started = time.perf_counter()
+        try:
+            await self.pool.send(message)
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+        self._counters["sent"] += 1
+        self._send_total += time.perf_counter() - started
+
+    async def run_job(self, payload: dict) -> dict:
+        """"mail" 큐 작업 처리 (payload = {"template", "to", "context"})"""
+        try:
+            await self.send(payload["template"], payload["to"], **payload.get("context", {}))
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            return self._rejected(payload, 550, str(e))
+        except aiosmtplib.SMTPResponseException as e:
+            if 500 <= e.code < 600:
+                return self._rejected(payload, e.code, e.message)
+            raise
+        return {"template": payload["template"]}
+
+    def _rejected(self, payload: dict, code: int, message: str) -> dict:
+        # permanent: retrying would only repeat the same answer
+        self._counters["rejected"] += 1
+        print(f"메일 발송 거부 ({payload['template']}): {code} {message}")
+        return {"template": payload["template"], "rejected": code}
+
+    def stats(self) -> dict:
+        sent = self._counters["sent"]
+        return {
+            **self._counters,
+            "avg_send_ms": round(self._send_total / sent * 1000, 1) if sent else 0.0,
+            "rate_limit_waits": self.limiter.waits,
+            "smtp": self.pool.stats(),
+        }
+
+    async def aclose(self):
+        await self.pool.aclose()
@@ -2,8 +2,11 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from contextlib import asynccontextmanager
+import asyncio
 import logging
 import datetime
+import secrets
 
 # 서버 로직 분리 모듈
 from .web_middleware import *
@@ -11,12 +14,15 @@ from .routers.auth import *
 from .routers.emoter import *
 
 # Global variables & instances
-# this includes api keys, redis, mongodb, fastmail, jinja2 templates, etc
+# this includes api keys, redis, mongodb, mailer, jinja2 templates, etc
 from .shared import *
 from .config import *
+from .metrics import collect_metrics
+from .migrations import apply_migrations
+from .routers.lookups import ensure_user_filter
 
 
-from .routers.emoter.diary import get_emotion_stats
+from .routers.emoter.diary import get_emotion_stats, ensure_search_grams
 
 
 
@@ -32,13 +38,46 @@ GOOGLE_STT_URL = server_config.GOOGLE_STT_URL
 
 # ==================== 전역 변수 및 설정 ====================
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup: open shared upstream connection pools and the redis pool
+    await upstream_clients.start()
+    try:
+        await redis_client.ping()
+    except Exception as e:
+        # connections are retried per request; don't keep the server from starting
+        print(f"redis 연결 실패: {e}")
+    await cache_bus.start() # reconnects by itself if redis is not up yet
+    if server_config.MIGRATIONS_ON_STARTUP:
+        try:
+            await apply_migrations(db)
+        except Exception as e:
+            # e.g. duplicate data blocking a unique index; serve anyway and retry on next start
+            print(f"migration 실패: {e}")
+    # id/email bloom filter: rebuilt in the background if missing/stale, lookups fall back to mongodb meanwhile
+    user_filter_task = asyncio.create_task(ensure_user_filter())
+    # search_grams of diaries written before search existed: batched in the background, search falls back meanwhile
+    search_grams_task = asyncio.create_task(ensure_search_grams())
+    yield
+    # shutdown: close pools cleanly
+    user_filter_task.cancel()
+    search_grams_task.cancel()
+    await upstream_clients.aclose()
+    await cache_bus.aclose()
+    await mailer.aclose()
+    password_hasher.close()
+    await redis_client.aclose()
+    await client.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # add middleware
 app.add_middleware(SizeLimitMiddleware, max_size=7*1024*1024) # 7MB limit to request
+app.add_middleware(RequestStartMiddleware) # outermost: stamps arrival time for deadline budgets
 
     
 
@@ -65,15 +104,10 @@ async def home(request: Request):
         return RedirectResponse(url="/login", status_code=303)
     
     # 로그인 됐을 때: 계정 유형에 따라 다른 홈 화면
-    try:
-        acct_type = current_user.get("account_type", 0)
-    except Exception:
-        acct_type = 0
-
-    if acct_type == 1:  # EmoterLinker
+    if is_linker(current_user):  # EmoterLinker
         return RedirectResponse(url="/emoters", status_code=303)
     else:  # Emoter(default)
-        stats = get_emotion_stats(request)
+        stats = await get_emotion_stats(request)
         return templates.TemplateResponse("home.html", {
             "request": request,
             "stats": stats,
@@ -93,6 +127,15 @@ async def settings_page(request: Request):
         "current_user": current_user, # 사용자 정보 전달
     })
     
+@app.get("/internal/metrics")
+async def internal_metrics(request: Request):
+    """내부 운영 지표 (http pool 등), METRICS_TOKEN이 없으면 비활성 (404)"""
+    if not server_config.METRICS_TOKEN:
+        raise HTTPException(status_code=404)
+    if not secrets.compare_digest(request.headers.get("X-Metrics-Token", ""), server_config.METRICS_TOKEN):
+        return JSONResponse(status_code=403, content={"error": "forbidden"})
+    return JSONResponse(content=await collect_metrics())
+    
 # ================== 예외 핸들러 =======================
     
 @app.exception_handler(404)
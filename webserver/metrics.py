@@ -0,0 +1,29 @@
+import inspect
+from typing import Callable, Dict
+
+
+# This file contains a tiny metrics registry
+# each component registers a provider that returns a json-able dict (sync or async)
+# collected by the /internal/metrics endpoint in main.py
+
+
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics(name: str, provider: Callable[[], dict]):
+    """metrics provider 등록 (같은 이름이면 덮어씀)"""
+    _providers[name] = provider
+
+
+async def collect_metrics() -> dict:
+    """등록된 모든 provider의 현재 값 수집"""
+    result = {}
+    for name, provider in _providers.items():
+        try:
+            value = provider()
+            if inspect.isawaitable(value):
+                value = await value
+            result[name] = value
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import datetime
+import json
+from typing import Awaitable, Callable, List, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+
+# This file contains versioned schema migrations (mostly index bootstrap) for mongodb
+# every migration is idempotent; applied versions are recorded in the schema_migrations collection
+#   python -m webserver.migrations              apply pending migrations
+#   python -m webserver.migrations --status     list applied / pending versions
+#   python -m webserver.migrations --explain    show query plans of the hot queries
+# the app also applies pending migrations at startup (MIGRATIONS_ON_STARTUP)
+''' schema_migrations
+{
+    "_id": version,
+    "name": "diaries: author_id + created_at",
+    "applied_at": datetime,
+}
+'''
+
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+
+async def _diaries_by_author(db):
+    """내 일기 목록 / 최근 일기 / 통계: find({author_id}).sort(created_at, -1)"""
+    await db.diaries.create_index([("author_id", ASCENDING), ("created_at", DESCENDING)], name="author_id_created_at")
+
+
+async def _users_unique_id_email(db):
+    """로그인/가입 중복 확인: find_one({$or: [{id}, {email}]}), 두 필드 모두 unique"""
+    await db.users.create_index([("id", ASCENDING)], name="id_unique", unique=True)
+    await db.users.create_index([("email", ASCENDING)], name="email_unique", unique=True)
+
+
+async def _links_by_linker_and_emoter(db):
+    """linker의 emoter 목록 (linker_id), 연결 upsert (linker_id, emoter_id unique),
+    emoter가 받은 요청 (emoter_id, status)"""
+    await db.links.create_index(
+        [("linker_id", ASCENDING), ("emoter_id", ASCENDING)], name="linker_id_emoter_id_unique", unique=True
+    )
+    await db.links.create_index([("emoter_id", ASCENDING), ("status", ASCENDING)], name="emoter_id_status")
+
+
+async def _diaries_keyset_pagination(db):
+    """일기 feed keyset pagination: find({author_id, (created_at, _id) < cursor}).sort(created_at -1, _id -1)
+    기존 (author_id, created_at) index는 이 index의 prefix라 삭제"""
+    await db.diaries.create_index(
+        [("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="author_id_created_at_id"
+    )
+    if "author_id_created_at" in await db.diaries.index_information():
+        await db.diaries.drop_index("author_id_created_at")
+
+
+async def _emotion_rollups_by_bucket(db):
+    """trend 조회 / rollup upsert: find({user_id, granularity}).sort(bucket, -1), bucket당 문서 하나"""
+    await db.emotion_rollups.create_index(
+        [("user_id", ASCENDING), ("granularity", ASCENDING), ("bucket", DESCENDING)],
+        name="user_id_granularity_bucket_unique", unique=True,
+    )
+
+
+async def _diaries_search_grams(db):
+    """일기 검색: find({author_id, search_grams: {$in: terms}})
+    기존 일기의 search_grams는 여기서 채우지 않음 (startup을 막지 않도록 background backfill, diary.py)"""
+    await db.diaries.create_index([("author_id", ASCENDING), ("search_grams", ASCENDING)], name="author_id_search_grams")
+
+
+# (version, name, migration), append only - never renumber or edit an applied migration
+MIGRATIONS: List[Tuple[int, str, Callable[[object], Awaitable[None]]]] = [
+    (1, "diaries: author_id + created_at", _diaries_by_author),
+    (2, "users: unique id, unique email", _users_unique_id_email),
+    (3, "links: unique (linker_id, emoter_id), (emoter_id, status)", _links_by_linker_and_emoter),
+    (4, "diaries: author_id + created_at + _id (keyset pagination)", _diaries_keyset_pagination),
+    (5, "emotion_rollups: unique (user_id, granularity, bucket)", _emotion_rollups_by_bucket),
+    (6, "diaries: author_id + search_grams (search)", _diaries_search_grams),
+]
+
+
+# hot queries to explain: (name, collection, filter, sort)
+HOT_QUERIES = [
+    ("diaries by author (newest first)", "diaries", {"author_id": "__explain__"}, {"created_at": -1}),
+    ("diary feed page", "diaries",
+     {"author_id": "__explain__", "$or": [{"created_at": {"$lt": datetime.datetime(2100, 1, 1)}},
+                                          {"created_at": datetime.datetime(2100, 1, 1), "_id": {"$lt": ObjectId("f" * 24)}}]},
+     {"created_at": -1, "_id": -1}),
+    ("diary search", "diaries", {"author_id": "__explain__", "search_grams": {"$in": ["학교", "친구"]}}, None),
+    ("emotion trend", "emotion_rollups", {"user_id": "__explain__", "granularity": "day"}, {"bucket": -1}),
+    ("login lookup (id or email)", "users", {"$or": [{"id": "__explain__"}, {"email": "__explain__"}]}, None),
+    ("linker's links", "links", {"linker_id": "__explain__"}, None),
+    ("emoter's requests by status", "links", {"emoter_id": "__explain__", "status": "pending"}, None),
+    ("link between linker and emoter", "links", {"linker_id": "__explain__", "emoter_id": "__explain__"}, None),
+]
+
+
+async def applied_versions(db) -> List[int]:
+    return sorted([doc["_id"] async for doc in db[MIGRATIONS_COLLECTION].find({}, {"_id": 1})])
+
+
+async def apply_migrations(db) -> List[int]:
+    """적용되지 않은 migration을 버전 순서대로 실행하고 새로 적용한 버전 목록을 반환
+    실패하면 그 버전에서 멈추고 예외를 올린다 (이후 버전은 다음 실행 때 다시 시도)"""
+    done = set(await applied_versions(db))
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"migration {version} 적용 중: {name}")
+        await migrate(db)
+        try:
+            await db[MIGRATIONS_COLLECTION].insert_one({
+                "_id": version,
+                "name": name,
+                "applied_at": datetime.datetime.now(datetime.timezone.utc),
+            })
+        except DuplicateKeyError:
+            pass # another instance applied it at the same time (migrations are idempotent)
+        applied.append(version)
+    return applied
+
+
+def _plan_summary(plan: dict) -> dict:
+    """winningPlan에서 stage 목록과 사용한 index 이름 추출"""
+    stages, indexes = [], []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        stages.append(node.get("stage"))
+        if node.get("indexName"):
+            indexes.append(node["indexName"])
+        if "inputStage" in node:
+            stack.append(node["inputStage"])
+        stack.extend(node.get("inputStages", []))
+    return {"stages": stages, "indexes": indexes, "collection_scan": "COLLSCAN" in stages}
+
+
+async def explain_hot_queries(db) -> dict:
+    """HOT_QUERIES의 query plan 요약 (COLLSCAN이면 index가 없거나 쓰이지 않는 것)"""
+    report = {}
+    for name, collection, query_filter, sort in HOT_QUERIES:
+        command = {"find": collection, "filter": query_filter}
+        if sort:
+            command["sort"] = sort
+        result = await db.command("explain", command, verbosity="queryPlanner")
+        winning = result["queryPlanner"]["winningPlan"]
+        # newer servers wrap the classic plan in queryPlan (slot based engine)
+        report[name] = _plan_summary(winning.get("queryPlan", winning))
+    return report
+
+
+async def main():
+    from .shared import client, db
+
+    parser = argparse.ArgumentParser(description="EmotLink mongodb migrations")
+    parser.add_argument("--status", action="store_true", help="list applied / pending migrations")
+    parser.add_argument("--explain", action="store_true", help="show query plans of the hot queries")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            done = set(await applied_versions(db))
+            for version, name, _ in MIGRATIONS:
+                print(f"{'applied' if version in done else 'pending'}  {version:>3}  {name}")
+        elif args.explain:
+            print(json.dumps(await explain_hot_queries(db), ensure_ascii=False, indent=2))
+        else:
+            applied = await apply_migrations(db)
+            print(f"migration 완료: {applied or '적용할 migration 없음'}")
+    finally:
+        await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+# This file contains the bcrypt password hasher
+# hashing/verification runs in a small dedicated thread pool (bcrypt releases the GIL), so a burst
+# of logins no longer blocks the event loop for 100-250 ms per call; at most PASSWORD_HASH_WORKERS
+# run at once and at most PASSWORD_HASH_MAX_QUEUE wait, beyond that callers get PasswordHasherBusy
+# the pool is shut down by the FastAPI lifespan hook in main.py
+
+
+class PasswordHasherBusy(Exception):
+    """대기열이 가득 찬 경우 (잠시 후 다시 시도)"""
+
+
+def hash_rounds(hashed: str) -> int:
+    """bcrypt hash의 cost factor ("$2b$12$..." => 12), 형식이 다르면 0"""
+    try:
+        return int(hashed.split("$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+
+class PasswordHasher:
+    """bounded thread pool 위의 bcrypt hash / verify"""
+
+    def __init__(self, config):
+        self.rounds = config.BCRYPT_ROUNDS
+        self.workers = config.PASSWORD_HASH_WORKERS
+        self.max_queue = config.PASSWORD_HASH_MAX_QUEUE
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._slots = None # asyncio.Semaphore, created on first use inside the running loop
+        self._counters = {"running": 0, "waiting": 0, "completed": 0, "rejected": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    async def _run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        counters = self._counters
+        if counters["waiting"] >= self.max_queue:
+            counters["rejected"] += 1
+            raise PasswordHasherBusy()
+        queued = time.perf_counter()
+        counters["waiting"] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            counters["waiting"] -= 1
+        started = time.perf_counter()
+        counters["running"] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            counters["running"] -= 1
+            counters["completed"] += 1
+            self._wait_total += started - queued
+            self._run_total += time.perf_counter() - started
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        hashed = await self._run(bcrypt.hashpw, password.encode("utf-8"), salt)
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """비밀번호 확인 (hash 형식이 잘못되었으면 False)"""
+        try:
+            return await self._run(bcrypt.checkpw, password.encode("utf-8"), hashed.encode("utf-8"))
+        except ValueError:
+            return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """저장된 hash의 cost가 현재 BCRYPT_ROUNDS와 다르면 True (로그인 성공 시 다시 hash)"""
+        return hash_rounds(hashed) != self.rounds
+
+    def stats(self) -> dict:
+        completed = self._counters["completed"]
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "max_queue": self.max_queue,
+            **self._counters,
+            "avg_wait_ms": round(self._wait_total / completed * 1000, 1) if completed else 0.0,
+            "avg_run_ms": round(self._run_total / completed * 1000, 1) if completed else 0.0,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
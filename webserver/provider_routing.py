@@ -0,0 +1,248 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from .deadline import Deadline, DeadlineExceeded
+
+
+# This file contains the routing layer over the LLM backends (self-hosted model, solar)
+# - rolling latency / error-rate tracking per provider
+# - circuit breaker so a dead primary is skipped instead of waiting for its timeout
+# - optional hedged request to the fallback when the primary is slower than its usual p-th percentile
+
+
+class ProviderHealth:
+    """최근 N개 호출의 지연시간/성공 여부 기록"""
+
+    def __init__(self, window: int):
+        self._samples = deque(maxlen=window) # (latency, ok)
+
+    def record(self, latency: float, ok: bool):
+        self._samples.append((latency, ok))
+
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """성공한 호출의 지연시간 백분위수 (표본이 없으면 None)"""
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(percentile / 100 * len(latencies))) - 1))
+        return latencies[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """closed -> (연속 실패 / 높은 에러율) -> open -> (cooldown) -> half_open -> 1회 시험 호출"""
+
+    def __init__(self, failure_threshold: int, error_rate_threshold: float, min_samples: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_samples = min_samples
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = "half_open"
+            self._probe_in_flight = False
+        if self.state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        """allow_request()가 방금 True였다면 그 요청이 half-open probe인지"""
+        return self.state == "half_open" and self._probe_in_flight
+
+    def release_probe(self):
+        # the probe was cancelled (e.g. lost a hedge race) before producing a result
+        self._probe_in_flight = False
+
+    def record_success(self, probe: bool = False):
+        # calls that bypassed allow_request() (fallbacks) never own the probe
+        self.consecutive_failures = 0
+        if probe:
+            self._probe_in_flight = False
+        self.state = "closed"
+
+    def record_failure(self, health: ProviderHealth, probe: bool = False):
+        self.consecutive_failures += 1
+        if probe:
+            self._probe_in_flight = False
+        too_many_failures = self.consecutive_failures >= self.failure_threshold
+        error_rate_high = len(health) >= self.min_samples and health.error_rate() >= self.error_rate_threshold
+        if self.state == "half_open" or too_many_failures or error_rate_high:
+            if self.state != "open":
+                print(f"circuit open (연속 실패 {self.consecutive_failures}, 에러율 {health.error_rate():.2f})")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class ProviderRouter:
+    """primary -> fallback 라우팅 (circuit breaker + hedged request) 및 결정 지표"""
+
+    def __init__(self, config):
+        self.config = config
+        self.health: Dict[str, ProviderHealth] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.decisions: Dict[str, int] = {}
+
+    def _provider(self, name: str) -> Tuple[ProviderHealth, CircuitBreaker]:
+        if name not in self.health:
+            self.health[name] = ProviderHealth(self.config.LLM_HEALTH_WINDOW)
+            self.breakers[name] = CircuitBreaker(
+                failure_threshold=self.config.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                error_rate_threshold=self.config.LLM_CIRCUIT_ERROR_RATE,
+                min_samples=self.config.LLM_CIRCUIT_MIN_SAMPLES,
+                open_seconds=self.config.LLM_CIRCUIT_OPEN_SECONDS,
+            )
+        return self.health[name], self.breakers[name]
+
+    def _decide(self, decision: str):
+        self.decisions[decision] = self.decisions.get(decision, 0) + 1
+
+    def admit(self, name: str) -> Tuple[bool, bool]:
+        """circuit이 요청을 허용하는지 => (허용, half-open probe 여부)
+        probe면 결과를 record(..., probe=True) 하거나 release()로 반납해야 함"""
+        breaker = self._provider(name)[1]
+        if not breaker.allow_request():
+            return False, False
+        return True, breaker.probing
+
+    def release(self, name: str, probe: bool):
+        """admit()로 받은 요청이 결과 없이 끝났을 때 (취소/deadline) half-open probe 반납
+        probe가 아니었으면 아무것도 하지 않음 (다른 요청의 probe를 풀지 않도록)"""
+        if probe:
+            self._provider(name)[1].release_probe()
+
+    def record(self, name: str, latency: float, ok: bool, probe: bool = False):
+        health, breaker = self._provider(name)
+        health.record(latency, ok)
+        if ok:
+            breaker.record_success(probe)
+        else:
+            breaker.record_failure(health, probe)
+
+    def _note_fallback_circuit(self, fallback: str):
+        # fallbacks are the last resort and bypass their own breaker; count it so the metrics show it
+        if self._provider(fallback)[1].state != "closed":
+            self._decide("fallback_circuit_open")
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """primary의 최근 지연시간 백분위수 기반 hedge 시작 시점 (비활성/표본 부족이면 None)"""
+        if not self.config.LLM_HEDGE_ENABLED:
+            return None
+        health, _ = self._provider(name)
+        if len(health) < self.config.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        latency = health.latency_percentile(self.config.LLM_HEDGE_PERCENTILE)
+        if latency is None:
+            return None
+        return min(max(latency, self.config.LLM_HEDGE_MIN_DELAY), self.config.LLM_HEDGE_MAX_DELAY)
+
+    async def call(self, name: str, fn: Callable[[], Awaitable[str]], probe: bool = False) -> str:
+        """단일 provider 호출 + 결과 기록 (circuit 검사 없음, probe = admit()가 준 half-open probe)"""
+        started = time.monotonic()
+        try:
+            result = await fn()
+        except (asyncio.CancelledError, DeadlineExceeded):
+            # not the provider's fault: the call was cancelled or never started
+            self.release(name, probe)
+            raise
+        except Exception:
+            self.record(name, time.monotonic() - started, ok=False, probe=probe)
+            raise
+        self.record(name, time.monotonic() - started, ok=True, probe=probe)
+        return result
+
+    async def _call_fallback(self, fallback: str, call, deadline: Optional[Deadline]) -> str:
+        if deadline is not None and deadline.expired:
+            self._decide("deadline_exceeded")
+            raise DeadlineExceeded(f"no time left for {fallback}")
+        self._note_fallback_circuit(fallback)
+        return await self.call(fallback, lambda: call(fallback))
+
+    async def complete(self, primary: str, fallback: str, call: Callable[[str], Awaitable[str]],
+                       deadline: Optional[Deadline] = None) -> Tuple[str, str]:
+        """primary로 요청하고, circuit open / 실패 / hedge 시 fallback 사용
+        반환: (응답한 provider 이름, 응답 텍스트). fallback까지 실패하면 fallback의 예외를 올린다.
+        deadline이 다 되면 fallback을 시작하지 않고 DeadlineExceeded."""
+        allowed, probe = self.admit(primary)
+        if not allowed:
+            self._decide("circuit_open_skip")
+            return fallback, await self._call_fallback(fallback, call, deadline)
+
+        primary_task = asyncio.create_task(self.call(primary, lambda: call(primary), probe=probe))
+        delay = self.hedge_delay(primary)
+        if delay is not None and deadline is not None:
+            delay = min(delay, deadline.remaining())
+
+        hedged = None
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary_task}, timeout=delay)
+                if not done:
+                    self._decide("hedge_started")
+                    self._note_fallback_circuit(fallback)
+                    fallback_task = asyncio.create_task(self.call(fallback, lambda: call(fallback)))
+                    hedged = {primary: primary_task, fallback: fallback_task}
+            if hedged is None:
+                result = await primary_task
+        except asyncio.CancelledError:
+            # the request itself went away; don't leave the upstream call running
+            primary_task.cancel()
+            raise
+        except Exception as e:
+            print(f"{primary} 호출 실패, {fallback}로 전환: {e}")
+            self._decide("fallback_after_error")
+            return fallback, await self._call_fallback(fallback, call, deadline)
+        if hedged is not None:
+            # both providers are already running: a failure of both is final (no second fallback call)
+            return await self._first_success(hedged)
+        self._decide("primary")
+        return primary, result
+
+    async def _first_success(self, tasks: Dict[str, asyncio.Task]) -> Tuple[str, str]:
+        """먼저 성공한 응답을 사용하고 나머지는 취소"""
+        pending = set(tasks.values())
+        last_error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = next(n for n, t in tasks.items() if t is task)
+                    if task.exception() is None:
+                        self._decide(f"hedge_won_{name}")
+                        return name, task.result()
+                    last_error = task.exception()
+            self._decide("hedge_all_failed")
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        providers = {}
+        for name, health in self.health.items():
+            breaker = self.breakers[name]
+            providers[name] = {
+                "circuit": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "samples": len(health),
+                "error_rate": round(health.error_rate(), 3),
+                "p50_latency": health.latency_percentile(50),
+                "p95_latency": health.latency_percentile(95),
+            }
+        return {"decisions": dict(self.decisions), "providers": providers}
@@ -0,0 +1,273 @@
+import asyncio
+import copy
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from bson import json_util
+
+
+# This file contains the two-tier read-through cache (per-process TTL LRU + shared redis tier)
+# used for user profiles and link relationships (routers/lookups.py)
+#
+#   get  : local LRU -> redis "cache:{namespace}:{key}" -> loader (mongodb), result stored in both
+#   write: the caller invalidates the keys it touched; invalidate() drops the local entries, replaces
+#          the redis keys with a short tombstone and publishes the keys on CACHE_INVALIDATION_CHANNEL
+#          so every other worker drops its local copies too
+#
+# a loader that started before an invalidation never stores its (possibly stale) result: locally an
+# epoch counter catches it, in redis the tombstone makes the SET NX fail. values are stored with
+# bson.json_util so datetimes / ObjectIds survive the round trip, None ("not found") is cached too.
+
+
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+TOMBSTONE = "__invalidated__"
+TOMBSTONE_TTL_MS = 5000 # longer than any loader query (MONGO_WAIT_QUEUE_TIMEOUT_MS)
+LISTEN_RETRY_SECONDS = 1.0 # doubled after every failed reconnect, up to LISTEN_RETRY_MAX
+LISTEN_RETRY_MAX = 30.0
+
+_MISSING = object()
+
+
+def _dumps(value) -> str:
+    return json_util.dumps(value)
+
+
+def _loads(raw):
+    return json_util.loads(raw)
+
+
+class TwoTierCache:
+    """namespace 하나의 read-through cache (local TTL LRU 앞단 + redis 공유 tier)"""
+
+    def __init__(self, redis, namespace: str, bus: "CacheInvalidationBus",
+                 local_size: int = 2048, local_ttl: float = 30.0, redis_ttl: int = 300):
+        self.redis = redis
+        self.namespace = namespace
+        self.bus = bus
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.redis_ttl = redis_ttl
+        self._local: "OrderedDict[str, tuple]" = OrderedDict()
+        self._epoch = 0 # bumped on every invalidation, loads started before it are not stored locally
+        self._counters = {
+            "local_hits": 0, "redis_hits": 0, "misses": 0,
+            "invalidations": 0, "evicted": 0, "redis_errors": 0,
+        }
+        bus.register(self)
+
+    def redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    # ---------- local tier ----------
+
+    def _local_get(self, key: str, now: float):
+        entry = self._local.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires = entry
+        if expires <= now:
+            del self._local[key]
+            return _MISSING
+        self._local.move_to_end(key)
+        return value
+
+    def _local_put(self, key: str, value, now: float):
+        if self.local_size <= 0 or self.local_ttl <= 0:
+            return
+        self._local[key] = (value, now + self.local_ttl)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+            self._counters["evicted"] += 1
+
+    def drop_local(self, keys: Iterable[str]):
+        """local tier에서만 삭제 (다른 worker의 invalidation 수신 시)"""
+        self._epoch += 1
+        for key in keys:
+            self._local.pop(key, None)
+
+    def clear_local(self):
+        self._epoch += 1
+        self._local.clear()
+
+    # ---------- redis tier ----------
+
+    async def _redis_mget(self, keys: list) -> list:
+        try:
+            return await self.redis.mget([self.redis_key(k) for k in keys])
+        except Exception as e:
+            self._counters["redis_errors"] += 1
+            print(f"cache redis 조회 실패 ({self.namespace}): {e}")
+            return [None] * len(keys)
+
+    async def _redis_store(self, values: dict):
+        if self.redis_ttl <= 0 or not values:
+            return
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in values.items():
+                # NX: a tombstone left by a concurrent invalidation wins over this (maybe stale) load
+                pipe.set(self.redis_key(key), _dumps(value), ex=self.redis_ttl, nx=True)
+            await pipe.execute()
+        except Exception as e:
+            self._counters["redis_errors"] += 1
+            print(f"cache redis 저장 실패 ({self.namespace}): {e}")
+
+    # ---------- public ----------
+
+    async def get(self, key: str, loader: Callable[[], Awaitable]):
+        """key의 값 (없으면 loader()로 읽어서 두 tier에 저장), 반환값은 호출자가 수정해도 되는 copy"""
+        values = await self.get_many([key], lambda missing: self._load_one(key, loader))
+        return values[key]
+
+    @staticmethod
+    async def _load_one(key, loader):
+        return {key: await loader()}
+
+    async def get_many(self, keys: Iterable[str], loader: Callable[[list], Awaitable[Dict[str, object]]]) -> dict:
+        """여러 key를 한 번에 조회, local에 없는 key는 redis MGET 한 번, 그래도 없는 key는 loader(missing) 한 번
+        loader는 {key: value} dict를 반환 (빠진 key는 None으로 캐시)"""
+        now = time.monotonic()
+        result = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self._local_get(key, now)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                self._counters["local_hits"] += 1
+                result[key] = value
+        if missing:
+            epoch = self._epoch
+            raw_values = await self._redis_mget(missing)
+            to_load = []
+            for key, raw in zip(missing, raw_values):
+                if raw is None or raw == TOMBSTONE or raw == TOMBSTONE.encode():
+                    to_load.append(key)
+                    continue
+                value = _loads(raw)
+                self._counters["redis_hits"] += 1
+                result[key] = value
+                if epoch == self._epoch:
+                    self._local_put(key, value, now)
+            if to_load:
+                self._counters["misses"] += len(to_load)
+                loaded = await loader(to_load)
+                loaded = {key: loaded.get(key) for key in to_load}
+                result.update(loaded)
+                if epoch == self._epoch:
+                    for key, value in loaded.items():
+                        self._local_put(key, value, now)
+                    await self._redis_store(loaded)
+        return {key: copy.deepcopy(value) for key, value in result.items()}
+
+    async def invalidate(self, *keys: str):
+        """key 삭제 (local + redis tombstone) 후 다른 worker에 publish"""
+        keys = [k for k in dict.fromkeys(keys) if k]
+        if not keys:
+            return
+        self._counters["invalidations"] += len(keys)
+        self.drop_local(keys)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.set(self.redis_key(key), TOMBSTONE, px=TOMBSTONE_TTL_MS)
+            pipe.publish(self.bus.channel, self.bus.message(self.namespace, keys))
+            await pipe.execute()
+        except Exception as e:
+            # other workers' local copies still expire after local_ttl
+            self._counters["redis_errors"] += 1
+            print(f"cache invalidation 실패 ({self.namespace}): {e}")
+
+    def stats(self) -> dict:
+        counters = self._counters
+        lookups = counters["local_hits"] + counters["redis_hits"] + counters["misses"]
+        return {
+            "local_size": len(self._local),
+            "local_max_size": self.local_size,
+            **counters,
+            "local_hit_rate": round(counters["local_hits"] / lookups, 3) if lookups else 0.0,
+            "hit_rate": round((counters["local_hits"] + counters["redis_hits"]) / lookups, 3) if lookups else 0.0,
+        }
+
+
+class CacheInvalidationBus:
+    """redis pub/sub로 다른 worker의 invalidation을 받아 local tier에서 삭제
+    start()/aclose()는 FastAPI lifespan(main.py)에서 호출"""
+
+    def __init__(self, redis, channel: str = CACHE_INVALIDATION_CHANNEL):
+        self.redis = redis
+        self.channel = channel
+        self.origin = uuid.uuid4().hex # own messages are skipped, invalidate() already dropped them
+        self._caches: Dict[str, TwoTierCache] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._counters = {"received": 0, "reconnects": 0}
+
+    def register(self, cache: TwoTierCache):
+        self._caches[cache.namespace] = cache
+
+    def message(self, namespace: str, keys: list) -> str:
+        return json.dumps({"origin": self.origin, "namespace": namespace, "keys": keys})
+
+    def handle(self, data):
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.origin:
+            return
+        cache = self._caches.get(message.get("namespace"))
+        if cache is not None:
+            self._counters["received"] += 1
+            cache.drop_local(message.get("keys") or [])
+
+    async def _listen(self):
+        retry = LISTEN_RETRY_SECONDS
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                # anything published while we were not subscribed is lost: start from an empty local tier
+                for cache in self._caches.values():
+                    cache.clear_local()
+                retry = LISTEN_RETRY_SECONDS
+                while True:
+                    # short polling timeout instead of listen(): an idle channel must not hit socket_timeout
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message is not None and message.get("type") == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._counters["reconnects"] += 1
+                print(f"cache invalidation 구독 끊김, {retry:.0f}초 후 재시도: {e}")
+                await asyncio.sleep(retry)
+                retry = min(retry * 2, LISTEN_RETRY_MAX)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._task is not None and not self._task.done(),
+            **self._counters,
+            **{name: cache.stats() for name, cache in self._caches.items()},
+        }
@@ -1,8 +1,9 @@
 from fastapi import Request, APIRouter, Form
 from fastapi.responses import RedirectResponse, JSONResponse
-from ...shared import diaries, links, users, chat_sessions, chat_users
+from ...shared import diaries, links, users, user_stats, emotion_rollups, chat_rooms
 from .auth import get_current_user
 from .login import create_login_token
+from ..lookups import forget_user, get_user, invalidate_links_of_user, invalidate_user
 
 router = APIRouter()
 
@@ -21,19 +22,23 @@ async def delete_account(request: Request):
 
     try:
         #delete all data related to the user
-        diaries.delete_many({"author_id": user_id})
-        links.delete_many({"emoter_id": user_id})
-        links.delete_many({"linker_id": user_id})
-        users.delete_one({"id": user_id})
-
-        # delete all redis chat sessions that the user participates in
-        # scan participants sets and remove related message sorted sets
-        for key in chat_users.scan_iter(match="chat:participants:*"):
-            k = key.decode() if isinstance(key, (bytes, bytearray)) else str(key)
-            if chat_users.sismember(key, user_id):
-                room_id = k.split(":")[-1]
-                chat_sessions.delete(f"chat:messages:{room_id}")
-                chat_users.delete(key)
+        await diaries.delete_many({"author_id": user_id})
+        await user_stats.delete_one({"_id": user_id})
+        await emotion_rollups.delete_many({"user_id": user_id})
+        user_links = await links.find(
+            {"$or": [{"emoter_id": user_id}, {"linker_id": user_id}]}, {"linker_id": 1, "emoter_id": 1}
+        ).to_list()
+        await links.delete_many({"emoter_id": user_id})
+        await links.delete_many({"linker_id": user_id})
+        await users.delete_one({"id": user_id})
+
+        # drop cached profile / links (also on the other workers)
+        await invalidate_user(user_id, current_user.get("email"))
+        await invalidate_links_of_user(user_id, user_links)
+        await forget_user()
+
+        # delete all redis chat rooms that the user participates in (per-user room set, no keyspace scan)
+        await chat_rooms.close_user_rooms(user_id)
 
     except Exception:
         response = RedirectResponse(url="/login", status_code=303)
@@ -63,9 +68,10 @@ async def update_account_name(request: Request, name: str = Form(...)):
     if len(new_name) < 1 or len(new_name) > 16:
         return JSONResponse(content={"ok": False, "message": "닉네임은 1~16자여야 합니다."})
 
-    users.update_one({"id": user_id}, {"$set": {"name": new_name}})
+    await users.update_one({"id": user_id}, {"$set": {"name": new_name}})
+    await invalidate_user(user_id, current_user.get("email"))
 
-    updated_user = users.find_one({"id": user_id}) or {}
+    updated_user = await get_user(user_id) or {}
     acct_type = updated_user.get("account_type", current_user.get("account_type", 0))
 
     # update login token with new name
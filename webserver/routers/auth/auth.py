@@ -1,22 +1,49 @@
 from fastapi import Request
 from typing import Optional
 from jose import jwt
+import time
 from ...config import *
 from ...shared import *
 
 SECRET_KEY = server_config.SECRET_KEY
 
+# tokens without an "expire" claim are cached for at most this long
+TOKEN_CACHE_FALLBACK_TTL = 300
 
+_MISSING = object()
 
-def get_current_user(request: Request) -> Optional[dict]:
-    """JWT 토큰에서 현재 사용자 정보(dict)를 반환합니다."""
+
+def decode_login_token(token: str) -> Optional[dict]:
+    """login_token 검증 후 payload 반환 (검증된 token은 login_token_cache에서 바로 반환)
+    "expire" claim이 지난 token은 None"""
+    now = time.time()
+    key = login_token_cache.key(token)
+    payload = login_token_cache.get(key, now)
+    if payload is not None:
+        return payload
     try:
-        token = request.cookies.get("login_token")
-        if token:
-            return jwt.decode(token, SECRET_KEY, "HS256")
+        payload = jwt.decode(token, SECRET_KEY, "HS256")
     except Exception:
         return None
-    return None
+    expire = payload.get("expire")
+    if expire is not None and expire <= now:
+        return None
+    login_token_cache.put(key, payload, expire if expire is not None else now + TOKEN_CACHE_FALLBACK_TTL)
+    return payload
+
+
+def get_current_user(request: Request) -> Optional[dict]:
+    """JWT 토큰에서 현재 사용자 정보(dict)를 반환합니다.
+    요청당 한 번만 검증하고 request.state.current_user에 저장 (Depends(get_current_user)로도 사용)"""
+    current_user = getattr(request.state, "current_user", _MISSING)
+    if current_user is not _MISSING:
+        return current_user
+    token = request.cookies.get("login_token")
+    payload = decode_login_token(token) if token else None
+    # copy: handlers must not be able to change the cached payload
+    current_user = dict(payload) if payload is not None else None
+    request.state.current_user = current_user
+    return current_user
 
 def get_current_user_role(request: Request) -> Optional[str]:
     """현재 사용자의 역할 반환 (JWT 토큰 기반)"""
@@ -25,3 +52,12 @@ def get_current_user_role(request: Request) -> Optional[str]:
         return user.get("role")
     return None
 
+
+def is_linker(user: Optional[dict]) -> bool:
+    """Linker 계정 여부 (token의 role 또는 account_type == 1)"""
+    return bool(user) and (user.get("role") == "linker" or user.get("account_type") == 1)
+
+
+def is_emoter(user: Optional[dict]) -> bool:
+    """Emoter 계정 여부 (account_type == 0)"""
+    return bool(user) and not is_linker(user)
@@ -2,16 +2,17 @@ import datetime
 from jose import jwt, JWTError
 from ...config import *
 from ...shared import *
-from fastapi_mail import MessageSchema, MessageType
 from fastapi import Request, APIRouter
 from fastapi.responses import JSONResponse
+from ..lookups import email_taken
 from fastapi import Request, Form
 import json
 
 SECRET_KEY = server_config.SECRET_KEY
+EMAIL_VERIFICATION_MINUTES = 30
 
 
-def create_email_verification_token(email: str, user_data: dict, expire_minutes: int = 30):
+def create_email_verification_token(email: str, user_data: dict, expire_minutes: int = EMAIL_VERIFICATION_MINUTES):
     expire_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=expire_minutes)
     temp_user = {
         "email": email,
@@ -32,90 +33,16 @@ def verify_email_verification_token(token: str) -> dict | None:
         return None
 
 async def send_verification_email(email: str, verification_token: str):
+    """인증 메일 발송 (MAIL_QUEUE_ENABLED면 "mail" 큐에 등록만 하고 바로 반환, worker가 발송)
+    본문은 templates/email/verification.html / .txt"""
     base_url = server_config.PUBLIC_BASE_URL.rstrip("/") if hasattr(server_config, "PUBLIC_BASE_URL") else "https://emotlink.com"
     verification_url = f"{base_url}/verify-email?token={verification_token}"
-    
-    html_body = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>EmotLink 이메일 인증</title>
-    </head>
-    <body style="margin: 0; padding: 20px; font-family: Arial, sans-serif; background-color: #f5f5f5;">
-        <table align="center" border="0" cellpadding="0" cellspacing="0" width="100%" style="max-width: 600px;">
-            <tr>
-                <td style="background-color: white; padding: 30px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-                    
-                    <!-- Header with Logo -->
-                    <table align="center" border="0" cellpadding="0" cellspacing="0" width="100%">
-                        <tr>
-                            <td align="center" style="padding-bottom: 30px;">
-                                <!-- Logo Circle -->
-                                <table align="center" border="0" cellpadding="0" cellspacing="0">
-                                    <tr>
-                                        <td align="center" style="width: 60px; height: 60px; background-color: #4f46e5; border-radius: 50%; text-align: center; vertical-align: middle; color: white; font-size: 24px; line-height: 60px; margin-bottom: 15px;">
-                                            🔗
-                                        </td>
-                                    </tr>
-                                </table>
-                                <h1 style="color: #333; margin: 15px 0 10px 0; font-size: 24px; font-weight: bold;">EmotLink 이메일 인증</h1>
-                            </td>
-                        </tr>
-                    </table>
-                    
-                    <!-- Content -->
-                    <table align="center" border="0" cellpadding="0" cellspacing="0" width="100%">
-                        <tr>
-                            <td style="color: #666; line-height: 1.6; margin-bottom: 30px; padding-bottom: 30px;">
-                                <p style="margin: 0 0 15px 0;">안녕하세요!</p>
-                                <p style="margin: 0 0 15px 0;">EmotLink 회원가입을 위해 이메일 인증이 필요합니다.</p>
-                                <p style="margin: 0;">아래 버튼을 클릭하여 이메일 인증을 완료해 주세요.</p>
-                            </td>
-                        </tr>
-                    </table>
-                    
-                    <!-- Button -->
-                    <table align="center" border="0" cellpadding="0" cellspacing="0" width="100%">
-                        <tr>
-                            <td align="center" style="padding: 30px 0;">
-                                <table border="0" cellpadding="0" cellspacing="0">
-                                    <tr>
-                                        <td align="center" style="background-color: #4f46e5; border-radius: 5px;">
-                                            <a href="{verification_url}" style="display: inline-block; padding: 15px 30px; font-family: Arial, sans-serif; font-size: 16px; font-weight: bold; color: #ffffff !important; text-decoration: none; border-radius: 5px;">이메일 인증하기</a>
-                                        </td>
-                                    </tr>
-                                </table>
-                            </td>
-                        </tr>
-                    </table>
-                    
-                    <!-- Footer -->
-                    <table align="center" border="0" cellpadding="0" cellspacing="0" width="100%">
-                        <tr>
-                            <td style="border-top: 1px solid #eee; padding-top: 20px; margin-top: 30px; text-align: center;">
-                                <p style="color: #999; font-size: 12px; margin: 0 0 10px 0;">이 링크는 30분 후 만료됩니다.</p>
-                                <p style="color: #999; font-size: 12px; margin: 0;">만약 본인이 회원가입을 신청하지 않으셨다면, 이 메일을 무시해 주세요.</p>
-                            </td>
-                        </tr>
-                    </table>
-                    
-                </td>
-            </tr>
-        </table>
-    </body>
-    </html>
-    """
-    
-    message = MessageSchema(
-        subject="EmotLink 이메일 인증",
-        recipients=[email],
-        body=html_body,
-        subtype=MessageType.html
-    )
-    
-    await fastmail.send_message(message)
+    context = {"verification_url": verification_url, "expire_minutes": EMAIL_VERIFICATION_MINUTES}
+
+    if server_config.MAIL_QUEUE_ENABLED:
+        await mail_jobs.enqueue({"template": "verification", "to": email, "context": context})
+    else:
+        await mailer.send("verification", email, **context)
     
     
     
@@ -127,7 +54,7 @@ router = APIRouter()
 async def send_verification(request: Request, email: str = Form(...)):
     try:
         # check email dup
-        if users.find_one({"email": email}):
+        if await email_taken(email):
             return JSONResponse(
                 status_code=400, 
                 content={"success": False, "message": "이미 가입된 이메일입니다."}
@@ -162,7 +89,7 @@ async def verify_email(request: Request, token: str):
     email = token_data.get("email")
     
     # if already exists
-    if users.find_one({"email": email}):
+    if await email_taken(email):
         return templates.TemplateResponse("signup.html", {
             "request": request,
             "error": "이미 가입된 이메일입니다."
@@ -175,7 +102,7 @@ async def verify_email(request: Request, token: str):
         "email": email,
         "verified_at": datetime.datetime.now(datetime.timezone.utc).isoformat()
     }
-    email_verification_cache.setex(verification_key, 1800, json.dumps(verification_data))  # 30분 TTL
+    await redis_client.setex(verification_key, 1800, json.dumps(verification_data))  # 30분 TTL
     
     # show success page
     return templates.TemplateResponse("email_verified.html", {
@@ -190,13 +117,14 @@ async def verify_email(request: Request, token: str):
 async def check_verification_status(request: Request, email: str):
     try:
         # check email duplication
-        if users.find_one({"email": email}):
+        if await email_taken(email):
             return JSONResponse(content={"verified": False, "message": "이미 가입된 이메일입니다."})
         
         # check verification status from redis
         verification_key = f"email_verified:{email}"
-        if email_verification_cache.exists(verification_key):
-            verification_data = json.loads(email_verification_cache.get(verification_key))
+        raw = await redis_client.get(verification_key)
+        if raw:
+            verification_data = json.loads(raw)
             return JSONResponse(content={
                 "verified": True, 
                 "email": email,
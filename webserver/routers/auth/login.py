@@ -6,7 +6,8 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi import Request, Form
 from typing import Optional
 from ...shared import *
-import bcrypt
+from ...password_hasher import PasswordHasherBusy
+from ..lookups import find_user_for_login
 
 SECRET_KEY = server_config.SECRET_KEY
 
@@ -32,14 +33,23 @@ async def login(request: Request, id: str = Form(...), password: str = Form(...)
     """사용자 로그인을 처리합니다."""
     print("로그인 시도 감지")
     
-    # 아이디 또는 이메일로 사용자 찾기
-    current_user = users.find_one({"$or": [{"id": id}, {"email": id}]})
+    # 아이디 또는 이메일로 사용자 찾기 (password hash 포함이라 cache 없이 조회)
+    current_user = await find_user_for_login(id)
+
+    # 비밀번호 확인 (bcrypt는 password_hasher의 thread pool에서 실행)
+    try:
+        password_ok = (id != None) and \
+            (password != None) and \
+            (current_user != None) and \
+            await password_hasher.verify(password, current_user["password"])
+    except PasswordHasherBusy:
+        return templates.TemplateResponse("login.html", {
+            "request": request,
+            "error": "로그인 요청이 많습니다. 잠시 후 다시 시도해 주세요.",
+        }, status_code=503)
 
     # 일반 로그인
-    if (id != None) and \
-    (password != None) and \
-    (current_user != None) and \
-    (bcrypt.checkpw(password.encode("utf-8"), current_user["password"].encode("utf-8"))):
+    if password_ok:
         
         # check email verified
         if not current_user.get("email_verified", False):
@@ -48,6 +58,16 @@ async def login(request: Request, id: str = Form(...), password: str = Form(...)
                 "error": "이메일 인증이 완료되지 않았습니다. 이메일을 확인해 주세요."
             })
         
+        # BCRYPT_ROUNDS가 바뀌었으면 알고 있는 평문으로 다시 hash (로그인은 실패시키지 않음)
+        if password_hasher.needs_rehash(current_user["password"]):
+            try:
+                await users.update_one(
+                    {"id": current_user["id"], "password": current_user["password"]},
+                    {"$set": {"password": await password_hasher.hash(password)}},
+                )
+            except Exception as e:
+                print(f"비밀번호 rehash 실패: {e}")
+        
         # 토큰에 포함할 사용자 정보 생성 (계정 유형 기반 역할 설정)
         acct_type = current_user.get("account_type", 0)
         user_info_for_token = {
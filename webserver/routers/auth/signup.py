@@ -2,9 +2,10 @@ from fastapi import Request, APIRouter
 from fastapi.responses import HTMLResponse, JSONResponse
 from ...shared import *
 from fastapi import Request, Form
-import bcrypt
+from ...password_hasher import PasswordHasherBusy
 import datetime
 from .email_verification import verify_email_verification_token
+from ..lookups import email_taken, id_taken, invalidate_user, remember_user
 
 
 # ============= router =============
@@ -42,12 +43,21 @@ async def signup(request: Request,
         return templates.TemplateResponse("signup.html", {"request": request, "error": "비밀번호는 8자 이상이어야 합니다."})
     
     # 3. 중복 확인
-    if users.find_one({"id": id}):
+    if await id_taken(id):
         return templates.TemplateResponse("signup.html", {"request": request, "error": "이미 사용 중인 아이디입니다."})
-    if users.find_one({"email": email}):
+    if await email_taken(email):
         return templates.TemplateResponse("signup.html", {"request": request, "error": "이미 가입된 이메일입니다."})
 
-    # 4. 스키마에 맞게 데이터 가공
+    # 4. 비밀번호 hash (bcrypt는 password_hasher의 thread pool에서 실행)
+    try:
+        password_hash = await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return templates.TemplateResponse("signup.html", {
+            "request": request,
+            "error": "요청이 많습니다. 잠시 후 다시 시도해 주세요.",
+        }, status_code=503)
+
+    # 5. 스키마에 맞게 데이터 가공
     try:
         # account_type validation (0: Emoter, 1: EmoterLinker)
         if account_type not in [0, 1]:
@@ -56,7 +66,7 @@ async def signup(request: Request,
             "id": id,
             "name": name,
             "email": email,
-            "password": bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode("utf-8"),
+            "password": password_hash,
             "birthday": datetime.datetime.strptime(birthday, "%Y-%m-%d"),
             "account_type": int(account_type),
             "email_verified": True,
@@ -66,14 +76,17 @@ async def signup(request: Request,
         print(f"Data processing error during signup: {e}")
         return templates.TemplateResponse("signup.html", {"request": request, "error": "입력된 정보가 올바르지 않습니다."})
 
-    # 5. 데이터베이스에 저장
+    # 6. 데이터베이스에 저장
     try:
-        users.insert_one(new_user)
+        await users.insert_one(new_user)
+        # drop cached "not found" results for this id / email
+        await invalidate_user(id, email)
+        await remember_user(id, email)
     except Exception as e:
         print(f"DB insertion error during signup: {e}")
         return templates.TemplateResponse("signup.html", {"request": request, "error": "회원가입 중 서버 오류가 발생했습니다."})
 
-    # 6. 성공 응답
+    # 7. 성공 응답
     return templates.TemplateResponse("login.html", {
         "request": request, 
         "success": "회원가입이 완료되었습니다!",
@@ -86,7 +99,7 @@ async def check_id_duplicate(request: Request, id: str = Form(...)):
     """아이디 중복 확인 API"""
     try:
         # check ID duplication
-        if users.find_one({"id": id}):
+        if await id_taken(id):
             return JSONResponse(content={"available": False, "message": "이미 사용 중인 아이디입니다."})
         
         # check if ID is valid (basic validation)
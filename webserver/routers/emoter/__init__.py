@@ -1,9 +1,10 @@
 from .chat import *
-from . import chat, diary, stats, linker
+from . import chat, diary, export, stats, linker
 from fastapi import APIRouter
 
 emoter_router = APIRouter()
 emoter_router.include_router(chat.router)
 emoter_router.include_router(diary.router)
+emoter_router.include_router(export.router)
 emoter_router.include_router(stats.router)
 emoter_router.include_router(linker.router)
\ No newline at end of file
@@ -1,28 +1,65 @@
 from ...shared import *
 from ...config import *
+import asyncio
 import datetime
 import httpx
-from typing import List
+import json
+import time
+from typing import List, Optional
 from urllib.parse import urlparse
 
 from .diary import save_diary_entry
+from .conversation_summary import message_text, select_prompt_history
+from ...deadline import Deadline, DeadlineExceeded
 
 
 SOLAR_API_KEY = server_config.SOLAR_API_KEY
 SOLAR_API_URL = "https://api.upstage.ai/v1/solar/chat/completions"
 
 
-async def get_ai_question(conversation_history: List[dict], model: str = "solar-pro") -> dict:
-    """Solar API 또는 Self-Hosted API를 호출하여 다음 질문 또는 최종 메시지를 생성합니다."""
-    
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {SOLAR_API_KEY}"
-    }
+def _history_string(conversation_history: List[dict]) -> str:
+    return "\n".join([f"{'상담가' if msg['role'] == 'assistant' else '사용자'}: {message_text(msg)}" for msg in conversation_history])
+
+
+# multiturn layout: persona (never changes) + turn-dependent instruction (sent last)
+COUNSELOR_PERSONA_PROMPT = (
+    "당신은 사용자가 하루를 되돌아보며 일기를 쓸 수 있도록 돕는 친절하고 공감 능력 높은 AI 상담가입니다. "
+    "모든 답변은 부드럽고 따뜻하고 자연스러운 한국어 대화체(높임말)로 해주세요. "
+    "당신의 생각의 근거를 절대 얘기하지마세요. 이건 채팅이라고 생각해주세요."
+    "괄호()를 사용한 설명이나 지문(예: (미소를 지으며), (공감하며))을 절대 포함하지 마세요. 오직 대화 내용만 출력하세요."
+)
+FOLLOW_UP_INSTRUCTION = (
+    "사용자의 마지막 말에 먼저 자연스럽게 공감하며 짧은 맞장구를 쳐주세요. "
+    "그 다음에, 대화의 흐름에 맞춰 감정과 경험을 더 깊이 탐색할 수 있는 후속 질문을 하나만 던져주세요. "
+    "질문만 툭 던지는 느낌을 주면 안 됩니다. "
+    "하나의 답변에 딱 하나의 이모티콘만을 포함해주세요.<특히 사람 표정의 이모티콘을 우선으로 넣으세요 : 우는표정, 웃는표증 등등, 상황에 맞지 않는거같으면 아무거나 넣어도 상관없습니다.>"
+)
+CLOSING_INSTRUCTION = (
+    "지금까지의 대화 내용을 종합해서 따뜻하고 격려하는 어조로 마무리 인사를 해주세요. "
+    "그리고 대화가 모두 끝났음을 명확히 알려주세요. "
+    "반드시 메시지 끝에 'END_CHAT'이라는 키워드를 포함해야 합니다."
+)
+
 
-    user_message_count = len([msg for msg in conversation_history if msg["role"] == "user"])
+def is_closing_turn(conversation_history: List[dict]) -> bool:
+    """이번 응답이 마무리 인사(END_CHAT) 차례인지 (사용자 메시지 5개 이상)"""
+    return len([msg for msg in conversation_history if msg["role"] == "user"]) >= 5
 
-    if user_message_count < 5:
+
+def build_question_messages(conversation_history: List[dict], summary_state: Optional[dict] = None) -> List[dict]:
+    """대화 기록으로 질문 생성용 messages 구성 (CHAT_PROMPT_LAYOUT: flat | multiturn)
+    summary_state가 있으면 요약된 앞부분은 요약문으로, 나머지만 원문으로 넣는다 (턴 수는 전체 기록 기준)"""
+    closing = is_closing_turn(conversation_history)
+
+    summary = ""
+    prompt_history = conversation_history
+    if summary_state is not None:
+        summary, prompt_history = select_prompt_history(conversation_history, summary_state)
+
+    if server_config.CHAT_PROMPT_LAYOUT == "multiturn":
+        return _build_multiturn_messages(prompt_history, summary, closing=closing)
+
+    if not closing:
         system_prompt = (
             "당신은 사용자가 하루를 되돌아보며 일기를 쓸 수 있도록 돕는 친절하고 공감 능력 높은 AI 상담가입니다. "
             "주어진 이전 대화 내용을 바탕으로, 사용자의 말에 먼저 자연스럽게 공감하며 짧은 맞장구를 쳐주세요. "
@@ -35,14 +72,12 @@ async def get_ai_question(conversation_history: List[dict], model: str = "solar-
             
         )
     else:
-        system_prompt = (
-            "지금까지의 대화 내용을 종합해서 따뜻하고 격려하는 어조로 마무리 인사를 해주세요. "
-            "그리고 대화가 모두 끝났음을 명확히 알려주세요. "
-            "반드시 메시지 끝에 'END_CHAT'이라는 키워드를 포함해야 합니다."
-        )
+        system_prompt = CLOSING_INSTRUCTION
 
     # 대화 기록을 단일 문자열로 변환
-    history_string = "\n".join([f"{'상담가' if msg['role'] == 'assistant' else '사용자'}: {msg['message']}" for msg in conversation_history])
+    history_string = _history_string(prompt_history)
+    if summary:
+        history_string = f"(앞부분 대화 요약: {summary})\n{history_string}"
     
     # API에 전달할 사용자 메시지 구성
     user_prompt = f"""
@@ -54,124 +89,306 @@ async def get_ai_question(conversation_history: List[dict], model: str = "solar-
 """
 
     # API에 보낼 메시지 형식 수정
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
+
+def _build_multiturn_messages(prompt_history: List[dict], summary: str, closing: bool) -> List[dict]:
+    """prefix cache 친화적인 구성: 고정 system -> (요약) -> 실제 assistant/user 턴 -> 이번 턴 지시문
+    앞쪽 턴이 요청마다 byte 단위로 동일하게 유지되어 서버의 KV/prefix cache를 재사용할 수 있다.
+    (요약 모드에서 요약이 갱신되거나 토큰 예산으로 원문이 잘리면 그 지점부터는 cache가 깨진다)"""
+    messages = [{"role": "system", "content": COUNSELOR_PERSONA_PROMPT}]
+    if summary:
+        messages.append({"role": "system", "content": f"앞부분 대화 요약: {summary}"})
+    for msg in prompt_history:
+        role = "assistant" if msg["role"] == "assistant" else "user"
+        messages.append({"role": role, "content": message_text(msg)})
+    messages.append({"role": "system", "content": CLOSING_INSTRUCTION if closing else FOLLOW_UP_INSTRUCTION})
+    return messages
+
+
+def _self_hosted_api_url() -> str:
+    # Construct URL: extract base (scheme + netloc) and append /v1/chat/completions
+    parsed_url = urlparse(server_config.SELF_HOSTED_MODEL_URL)
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+    return f"{base_url}/v1/chat/completions"
+
+
+def _self_hosted_request(messages: List[dict], stream: bool = False):
+    """self-hosted 모델 요청 (url, headers, payload)"""
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream" if stream else "application/json",
+        "X-API-Key": server_config.SELF_HOSTED_API_KEY,
+    }
+    # guardrails disabled for the self-hosted model
+    payload = {
+        "model": "/model",
+        "messages": messages,
+        "stream": stream,
+        "max_tokens": 1024,
+        "disable_guardrails": True,
+        "disable_reasoning_filter": False,
+    }
+    return _self_hosted_api_url(), headers, payload
+
+
+def _solar_request(messages: List[dict], stream: bool = False):
+    """Solar 질문 생성 요청 (headers, payload)"""
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {SOLAR_API_KEY}"
+    }
     payload = {
         "model": "solar-pro",
         "messages": messages,
         "temperature": 0.5,
         "top_p": 0.9,
         "n": 1,
-        "stream": False
+        "stream": stream
     }
+    return headers, payload
+
+
+def _hop_timeout(deadline: Optional[Deadline], cap: float, reserve: float = 0.0) -> float:
+    """deadline이 있으면 남은 시간만큼만, 없으면 upstream 기본 timeout"""
+    if deadline is None:
+        return cap
+    return deadline.timeout(cap, reserve=reserve)
+
+
+async def _post_within(client: httpx.AsyncClient, url: str, timeout: float, **kwargs) -> httpx.Response:
+    """httpx timeout은 connect/read 단계별 값이라, 전체 소요 시간 상한은 wait_for로 보장"""
+    return await asyncio.wait_for(client.post(url, timeout=timeout, **kwargs), timeout)
+
+
+async def _call_self_hosted(messages: List[dict], deadline: Optional[Deadline] = None) -> str:
+    """self-hosted 모델 호출. 200이 아니거나 응답을 해석할 수 없으면 예외 (fallback 대상)
+    Solar fallback 몫(CHAT_FALLBACK_RESERVE)은 남겨 두고 나머지 시간만 사용"""
+    timeout = _hop_timeout(deadline, server_config.SELF_HOSTED_TIMEOUT, reserve=server_config.CHAT_FALLBACK_RESERVE)
+    api_url, headers, payload = _self_hosted_request(messages)
+    print(f"Sending request to Self-Hosted Model: {api_url}")
+    client = upstream_clients.get("self_hosted")
+    response = await _post_within(client, api_url, timeout, headers=headers, json=payload)
+    
+    if response.status_code != 200:
+        raise httpx.HTTPStatusError(
+            f"Self-Hosted API Error: {response.status_code} - {response.text}",
+            request=response.request, response=response
+        )
+    response_data = response.json()
+    if "choices" in response_data:
+        return response_data["choices"][0]["message"]["content"]
+    return str(response_data)
+
+
+async def _call_solar_payload(headers: dict, payload: dict, timeout: float) -> str:
+    client = upstream_clients.get("solar")
+    response = await _post_within(client, SOLAR_API_URL, timeout, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+
+async def _call_solar(messages: List[dict], deadline: Optional[Deadline] = None) -> str:
+    timeout = _hop_timeout(deadline, server_config.SOLAR_TIMEOUT)
+    headers, payload = _solar_request(messages)
+    return await _call_solar_payload(headers, payload, timeout)
 
-    # Flag to determine if we should use solar (initially true if model != emotlink-model)
-    use_solar = (model != "emotlink-model")
+
+_PROVIDER_CALLS = {
+    "self_hosted": _call_self_hosted,
+    "solar": _call_solar,
+}
+
+
+DEGRADED_RESPONSE = {
+    "response": "지금은 답변이 평소보다 오래 걸리고 있어요. 잠시 후 같은 메시지를 다시 보내주세요. 🙏",
+    "finished": False,
+    "degraded": True,
+}
+
+
+async def get_ai_question(conversation_history: List[dict], model: str = "solar-pro", deadline: Optional[Deadline] = None,
+                          summary_state: Optional[dict] = None) -> dict:
+    """Solar API 또는 Self-Hosted API를 호출하여 다음 질문 또는 최종 메시지를 생성합니다.
+    emotlink-model은 provider router를 거쳐 circuit/hedge 상태에 따라 Solar로 우회할 수 있습니다.
+    deadline을 넘기면 각 호출은 남은 시간만 쓰고, 다 쓰면 DEGRADED_RESPONSE를 반환합니다."""
     
-    if model == "emotlink-model":
+    messages = build_question_messages(conversation_history, summary_state)
+
+    try:
+        if model == "emotlink-model":
+            _, ai_response = await provider_router.complete(
+                "self_hosted", "solar", lambda name: _PROVIDER_CALLS[name](messages, deadline), deadline=deadline
+            )
+        else:
+            ai_response = await provider_router.call("solar", lambda: _call_solar(messages, deadline))
+    except DeadlineExceeded as e:
+        print(f"deadline 초과로 응답 생략: {e}")
+        return dict(DEGRADED_RESPONSE)
+    except (httpx.TimeoutException, asyncio.TimeoutError) as e:
+        if deadline is not None and deadline.expired:
+            print(f"deadline 초과로 응답 생략: {e}")
+            return dict(DEGRADED_RESPONSE)
+        print(f"API 호출 오류 (Solar): {e}")
+        return {"response": "죄송합니다, AI 모델과 통신하는 중 오류가 발생했어요. 잠시 후 다시 시도해주세요.", "finished": True}
+    except httpx.RequestError as e:
+        print(f"API 호출 오류 (Solar): {e}")
+        return {"response": "죄송합니다, AI 모델과 통신하는 중 오류가 발생했어요. 잠시 후 다시 시도해주세요.", "finished": True}
+
+    if "END_CHAT" in ai_response:
+        return {"response": ai_response.replace("END_CHAT", "").strip(), "finished": True}
+    else:
+        return {"response": ai_response, "finished": False}
+
+
+async def summarize_turns(previous_summary: str, messages: List[dict]) -> str:
+    """기존 요약에 오래된 대화 턴을 합쳐 새 요약문 생성 (Solar)"""
+    system_prompt = (
+        "당신은 상담 대화를 요약하는 도우미입니다. "
+        "기존 요약과 새로 추가된 대화를 합쳐, 사용자가 겪은 사건과 감정, 상담가가 물어본 내용을 빠짐없이 담은 "
+        "5문장 이내의 한국어 요약문 하나만 출력하세요."
+    )
+    user_prompt = f"""
+기존 요약:
+{previous_summary or "(없음)"}
+---
+새로 추가된 대화:
+{_history_string(messages)}
+"""
+    headers, payload = _solar_request([
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ])
+    payload["temperature"] = 0.3
+    summary = await provider_router.call("solar", lambda: _call_solar_payload(headers, payload, server_config.SOLAR_TIMEOUT))
+    return summary.strip()
+
+
+class EndChatStreamFilter:
+    """스트리밍 토큰에서 END_CHAT 키워드를 걸러내고 종료 여부를 기록
+    키워드가 청크 경계에 걸칠 수 있으므로 키워드의 접두사가 될 수 있는 꼬리는 잠시 보류한다."""
+
+    KEYWORD = "END_CHAT"
+
+    def __init__(self):
+        self.finished = False
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self._pending + chunk
+        if self.KEYWORD in text:
+            self.finished = True
+            text = text.replace(self.KEYWORD, "")
+        # hold back the longest suffix that could still become END_CHAT
+        hold = 0
+        for size in range(min(len(text), len(self.KEYWORD) - 1), 0, -1):
+            if self.KEYWORD.startswith(text[-size:]):
+                hold = size
+                break
+        self._pending = text[len(text) - hold:] if hold else ""
+        return text[:len(text) - hold]
+
+    def flush(self) -> str:
+        text, self._pending = self._pending, ""
+        return text
+
+
+async def _iter_sse_deltas(response: httpx.Response, first_token_by: Optional[float] = None):
+    """OpenAI 호환 SSE 응답에서 content delta만 추출
+    first_token_by(monotonic)까지 첫 delta가 없으면 DeadlineExceeded (httpx timeout은 read 한 번마다라
+    keep-alive 줄이나 빈 delta가 이어지면 전체 대기 시간을 막지 못함)"""
+    async for line in response.aiter_lines():
+        if first_token_by is not None and time.monotonic() >= first_token_by:
+            raise DeadlineExceeded("no tokens before the deadline")
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
         try:
-            # Self-Hosted Model Logic (OpenAI Compatible)
-            # Construct URL: extract base (scheme + netloc) and append /v1/chat/completions
-            parsed_url = urlparse(server_config.SELF_HOSTED_MODEL_URL)
-            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-            api_url = f"{base_url}/v1/chat/completions"
-            
-            api_key = server_config.SELF_HOSTED_API_KEY
-            
-            # Override headers for self-hosted model
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-                "X-API-Key": api_key,
-            }
-            
-            # Reformat messages for the self-hosted model
-            messages_payload = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ]
-            
-            # Adjust payload for self-hosted model with guardrails disabled
-            payload = {
-                "model": "/model",
-                "messages": messages_payload,
-                "stream": False, 
-                "max_tokens": 1024,
-                "disable_guardrails": True,
-                "disable_reasoning_filter": False,
-            }
-            
-            print(f"Sending request to Self-Hosted Model: {api_url}")
-            async with httpx.AsyncClient() as client:
-                response = await client.post(api_url, headers=headers, json=payload, timeout=60.0)
-                
-                if response.status_code != 200:
-                    print(f"Self-Hosted API Error: {response.status_code} - {response.text}")
-                    print("Falling back to Solar API...")
-                    use_solar = True
-                else:
-                    try:
-                        response_data = response.json()
-                        if "choices" in response_data:
-                            ai_response = response_data["choices"][0]["message"]["content"]
-                        else:
-                            ai_response = str(response_data)
-                            
-                        if "END_CHAT" in ai_response:
-                            return {"response": ai_response.replace("END_CHAT", "").strip(), "finished": True}
-                        else:
-                            return {"response": ai_response, "finished": False}
-                    except:
-                        ai_response = response.text
-                        print("Failed to parse self-hosted response, falling back to Solar")
-                        use_solar = True
-                        use_solar = True
+            chunk = json.loads(data)
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+        except (ValueError, KeyError, IndexError):
+            continue
+        if delta:
+            first_token_by = None
+            yield delta
+
+
+async def _stream_completion(upstream: str, url: str, headers: dict, payload: dict, timeout: float = None,
+                             first_token_by: Optional[float] = None):
+    client = upstream_clients.get(upstream)
+    kwargs = {"timeout": timeout} if timeout is not None else {}
+    async with client.stream("POST", url, headers=headers, json=payload, **kwargs) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise httpx.HTTPStatusError(
+                f"{upstream} stream error: {response.status_code} - {body[:200]!r}",
+                request=response.request, response=response
+            )
+        async for delta in _iter_sse_deltas(response, first_token_by):
+            yield delta
+
 
+async def stream_ai_question(conversation_history: List[dict], model: str = "solar-pro", deadline: Optional[Deadline] = None,
+                             summary_state: Optional[dict] = None):
+    """get_ai_question의 스트리밍 버전. 생성되는 텍스트 조각(delta)을 순서대로 yield 합니다.
+    self-hosted 모델이 첫 토큰 전에 실패하면 Solar 스트림으로 전환합니다.
+    첫 토큰 전에 deadline을 다 쓰면 DeadlineExceeded."""
+    messages = build_question_messages(conversation_history, summary_state)
+
+    allowed, probe = provider_router.admit("self_hosted") if model == "emotlink-model" else (False, False)
+    if allowed:
+        started = False
+        recorded = False # admit() may have handed out the half-open probe: record or release it exactly once
+        request_started = time.monotonic()
+        try:
+            timeout = _hop_timeout(deadline, server_config.SELF_HOSTED_TIMEOUT, reserve=server_config.CHAT_FALLBACK_RESERVE)
+            first_token_by = deadline.expires_at - server_config.CHAT_FALLBACK_RESERVE if deadline is not None else None
+            api_url, headers, payload = _self_hosted_request(messages, stream=True)
+            print(f"Streaming request to Self-Hosted Model: {api_url}")
+            async for delta in _stream_completion("self_hosted", api_url, headers, payload, timeout=timeout,
+                                                  first_token_by=first_token_by):
+                if not started:
+                    # time to first token is the latency that matters for streaming
+                    started = recorded = True
+                    provider_router.record("self_hosted", time.monotonic() - request_started, ok=True, probe=probe)
+                yield delta
+            if started:
+                return
+            print("Self-Hosted stream returned no tokens, falling back to Solar API...")
+            recorded = True
+            provider_router.record("self_hosted", time.monotonic() - request_started, ok=False, probe=probe)
         except Exception as e:
-            print(f"Self-Hosted Model Exception: {e}")
+            # once tokens reached the client we can't switch models mid-sentence
+            if started:
+                raise
+            if not isinstance(e, DeadlineExceeded):
+                recorded = True
+                provider_router.record("self_hosted", time.monotonic() - request_started, ok=False, probe=probe)
+            print(f"Self-Hosted Model Stream Exception: {e}")
             print("Falling back to Solar API...")
-            use_solar = True
+        finally:
+            # deadline, or the client went away before the first token (GeneratorExit / CancelledError)
+            if not recorded:
+                provider_router.release("self_hosted", probe)
 
-    if use_solar:
-        try:
-            # Default: Solar Pro Logic
-            # Reset headers for Solar
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {SOLAR_API_KEY}"
-            }
-            
-            # Reset payload for Solar
-            payload = {
-                "model": "solar-pro",
-                "messages": messages,
-                "temperature": 0.5,
-                "top_p": 0.9,
-                "n": 1,
-                "stream": False
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(SOLAR_API_URL, headers=headers, json=payload, timeout=30.0)
-                response.raise_for_status()
-                ai_response = response.json()["choices"][0]["message"]["content"]
-        
-            if "END_CHAT" in ai_response:
-                return {"response": ai_response.replace("END_CHAT", "").strip(), "finished": True}
-            else:
-                return {"response": ai_response, "finished": False}
-        except httpx.RequestError as e:
-            print(f"API 호출 오류 (Solar): {e}")
-            return {"response": "죄송합니다, AI 모델과 통신하는 중 오류가 발생했어요. 잠시 후 다시 시도해주세요.", "finished": True}
-    
-    return {"response": "오류가 발생했습니다.", "finished": False}
+    timeout = _hop_timeout(deadline, server_config.SOLAR_TIMEOUT)
+    first_token_by = deadline.expires_at if deadline is not None else None
+    headers, payload = _solar_request(messages, stream=True)
+    async for delta in _stream_completion("solar", SOLAR_API_URL, headers, payload, timeout=timeout,
+                                          first_token_by=first_token_by):
+        yield delta
 
 
-async def generate_and_save_diary(user_id: str, conversation_history: List[dict], model: str = "solar-pro"):
-    """Solar API 또는 Self-Hosted API를 호출하여 대화 내용 기반으로 일기를 생성하고 저장합니다."""
+async def generate_diary(conversation_history: List[dict], deadline: Optional[Deadline] = None) -> dict:
+    """Solar API로 대화 내용 기반 일기와 감정 점수를 생성합니다.
+    호출 실패 시 예외를 그대로 올립니다 (재시도/대체 저장은 호출자 몫)."""
+    timeout = _hop_timeout(deadline, server_config.SOLAR_DIARY_TIMEOUT)
 
     headers = {
         "Content-Type": "application/json",
@@ -192,7 +409,7 @@ async def generate_and_save_diary(user_id: str, conversation_history: List[dict]
         "좌절감: [0부터 100 사이의 정수 점수]"
     )
     
-    history_string = "\n".join([f"{'상담가' if msg['role'] == 'assistant' else '사용자'}: {msg['message']}" for msg in conversation_history])
+    history_string = _history_string(conversation_history)
 
     user_prompt = f"""
     다음은 사용자와 상담가 간의 대화 내용입니다.
@@ -207,71 +424,138 @@ async def generate_and_save_diary(user_id: str, conversation_history: List[dict]
         {"role": "user", "content": user_prompt}
     ]
 
+    # Always use Solar Pro Logic for Diary Generation
+    payload = {
+        "model": "solar-pro",
+        "messages": messages,
+        "temperature": 0.7,
+        "stream": False
+    }
+    
+    client = upstream_clients.get("solar")
+    response = await _post_within(client, SOLAR_API_URL, timeout, headers=headers, json=payload)
+    response.raise_for_status()
+    
+    diary_text = response.json()["choices"][0]["message"]["content"]
+    
+    # 생성된 텍스트에서 제목, 내용, 감정 및 점수 파싱 (Existing Logic)
+    lines = diary_text.strip().split('\n')
+    
+    parsed_data = {'content': []}
+    is_content_section = False
+
+    for line in lines:
+        line_stripped = line.strip()
+        if line_stripped.startswith("제목:"):
+            parsed_data['title'] = line_stripped.replace("제목:", "").strip()
+            is_content_section = False
+        elif line_stripped.startswith("내용:"):
+            is_content_section = True
+        elif line_stripped.startswith("감정:"):
+            parsed_data['emotion'] = line_stripped.replace("감정:", "").strip()
+            is_content_section = False
+        elif line_stripped.startswith("우울감:"):
+            parsed_data['depression'] = int(line_stripped.replace("우울감:", "").strip())
+        elif line_stripped.startswith("소외감:"):
+            parsed_data['isolation'] = int(line_stripped.replace("소외감:", "").strip())
+        elif line_stripped.startswith("좌절감:"):
+            parsed_data['frustration'] = int(line_stripped.replace("좌절감:", "").strip())
+        elif is_content_section and "--- 감정 점수 분석 ---" not in line_stripped:
+            parsed_data['content'].append(line)
+
+    emotion_text = parsed_data.get('emotion', "기쁨")
+    emotion_map = {'기쁨': '😊', '평온': '😌', '걱정': '😟', '슬픔': '😢', '화남': '😠'}
+
+    return {
+        "title": parsed_data.get('title', "자동 생성된 일기"),
+        "content": "\n".join(parsed_data.get('content', ["내용을 생성하지 못했습니다."])).strip(),
+        "emotion": emotion_map.get(emotion_text, "😊"),
+        "depression": parsed_data.get('depression', 0),
+        "isolation": parsed_data.get('isolation', 0),
+        "frustration": parsed_data.get('frustration', 0),
+    }
+
+
+async def save_generated_diary(user_id: str, diary: dict):
+    """generate_diary 결과 저장"""
+    await save_diary_entry(
+        diary["title"], diary["content"], diary["emotion"], user_id, datetime.datetime.now(datetime.timezone.utc),
+        depression=diary["depression"],
+        isolation=diary["isolation"],
+        frustration=diary["frustration"]
+    )
+    print(f"✅ Diary with emotion scores automatically saved for user {user_id}")
+
+
+async def generate_and_save_diary(user_id: str, conversation_history: List[dict], model: str = "solar-pro", deadline: Optional[Deadline] = None):
+    """대화 내용 기반으로 일기를 생성하고 바로 저장합니다. (작업 큐를 쓰지 않는 경우)
+    생성에 실패하면 대화 원문을 담은 '일기 생성 실패' 항목을 저장합니다."""
     try:
-        # Always use Solar Pro Logic for Diary Generation
-        payload = {
-            "model": "solar-pro",
-            "messages": messages,
-            "temperature": 0.7,
-            "stream": False
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(SOLAR_API_URL, headers=headers, json=payload, timeout=60.0)
-            response.raise_for_status()
-        
-        diary_text = response.json()["choices"][0]["message"]["content"]
-        
-        # 생성된 텍스트에서 제목, 내용, 감정 및 점수 파싱 (Existing Logic)
-        lines = diary_text.strip().split('\n')
-        
-        parsed_data = {'content': []}
-        is_content_section = False
-
-        for line in lines:
-            line_stripped = line.strip()
-            if line_stripped.startswith("제목:"):
-                parsed_data['title'] = line_stripped.replace("제목:", "").strip()
-                is_content_section = False
-            elif line_stripped.startswith("내용:"):
-                is_content_section = True
-            elif line_stripped.startswith("감정:"):
-                parsed_data['emotion'] = line_stripped.replace("감정:", "").strip()
-                is_content_section = False
-            elif line_stripped.startswith("우울감:"):
-                parsed_data['depression'] = int(line_stripped.replace("우울감:", "").strip())
-            elif line_stripped.startswith("소외감:"):
-                parsed_data['isolation'] = int(line_stripped.replace("소외감:", "").strip())
-            elif line_stripped.startswith("좌절감:"):
-                parsed_data['frustration'] = int(line_stripped.replace("좌절감:", "").strip())
-            elif is_content_section and "--- 감정 점수 분석 ---" not in line_stripped:
-                parsed_data['content'].append(line)
-
-        title = parsed_data.get('title', "자동 생성된 일기")
-        content = "\n".join(parsed_data.get('content', ["내용을 생성하지 못했습니다."])).strip()
-        emotion_text = parsed_data.get('emotion', "기쁨")
-        
-        depression_score = parsed_data.get('depression', 0)
-        isolation_score = parsed_data.get('isolation', 0)
-        frustration_score = parsed_data.get('frustration', 0)
-
-        # Common Save Logic
-        emotion_map = {'기쁨': '😊', '평온': '😌', '걱정': '😟', '슬픔': '😢', '화남': '😠'}
-        emotion = emotion_map.get(emotion_text, "😊")
-        
-        save_diary_entry(
-            title, content, emotion, user_id, datetime.datetime.now(datetime.timezone.utc),
-            depression=depression_score,
-            isolation=isolation_score,
-            frustration=frustration_score
-        )
-        print(f"✅ Diary with emotion scores automatically saved for user {user_id}")
+        diary = await generate_diary(conversation_history, deadline=deadline)
+        await save_generated_diary(user_id, diary)
 
     except Exception as e:
 
         print(f"❌ 일기 생성 또는 저장 중 오류 발생: {e}")
-        fallback_content = "대화를 바탕으로 일기를 생성하는 데 실패했습니다.\n\n" + history_string
-        save_diary_entry(
+        fallback_content = "대화를 바탕으로 일기를 생성하는 데 실패했습니다.\n\n" + _history_string(conversation_history)
+        await save_diary_entry(
             "일기 생성 실패", fallback_content, "😟", user_id, 
             datetime.datetime.now(datetime.timezone.utc)
-        )
\ No newline at end of file
+        )
+
+
+def start_speculative_diary(conversation_history: List[dict], deadline: Optional[Deadline] = None) -> Optional[asyncio.Task]:
+    """마무리 턴이면 마무리 인사 생성과 동시에 일기 생성을 미리 시작 (CHAT_SPECULATIVE_DIARY)
+    이 시점의 대화 내용은 종료 후 일기 생성에 쓰일 내용과 같으므로 결과를 그대로 쓸 수 있다.
+    작업 큐를 쓰면 응답은 등록만 기다리므로 (생성 완료보다 빠름) 미리 시작하지 않는다."""
+    if not server_config.CHAT_SPECULATIVE_DIARY or server_config.DIARY_JOB_QUEUE_ENABLED:
+        return None
+    if not is_closing_turn(conversation_history):
+        return None
+    return asyncio.create_task(generate_diary(conversation_history, deadline=deadline))
+
+
+async def commit_speculative_diary(task: Optional[asyncio.Task], user_id: str) -> bool:
+    """응답에 END_CHAT이 있을 때 미리 생성한 일기를 저장. 저장했으면 True
+    (생성/저장 실패, 시간 초과면 False -> 호출자가 기존 경로로 일기 생성)"""
+    if task is None:
+        return False
+    try:
+        diary = await task
+    except Exception as e:
+        print(f"선행 일기 생성 실패, 기존 경로로 생성합니다: {e}")
+        return False
+    try:
+        await save_generated_diary(user_id, diary)
+    except Exception as e:
+        print(f"선행 일기 저장 실패, 기존 경로로 생성합니다: {e}")
+        return False
+    return True
+
+
+def discard_speculative_diary(task: Optional[asyncio.Task]):
+    """END_CHAT이 없거나 요청이 실패하면 미리 시작한 일기 생성을 버림"""
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception() # retrieve so a failed speculation isn't logged as "never retrieved"
+
+
+async def enqueue_diary_job(user_id: str, conversation_history: List[dict], model: str = "solar-pro") -> str:
+    """일기 생성을 작업 큐에 등록하고 job_id 반환 (worker가 재시도하며 처리)"""
+    return await diary_jobs.enqueue({
+        "user_id": user_id,
+        "conversation": conversation_history,
+        "model": model,
+    }, user_id=user_id)
+
+
+async def run_diary_job(payload: dict):
+    """worker에서 실행되는 일기 생성 작업. 실패하면 예외를 올려 재시도되도록 한다.
+    시도마다 DIARY_JOB_BUDGET 만큼의 deadline을 가진다."""
+    deadline = Deadline(server_config.DIARY_JOB_BUDGET)
+    diary = await generate_diary(payload["conversation"], deadline=deadline)
+    await save_generated_diary(payload["user_id"], diary)
+    return {"title": diary["title"]}
\ No newline at end of file
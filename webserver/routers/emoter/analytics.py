@@ -0,0 +1,114 @@
+from ...shared import *
+from ...config import *
+import datetime
+from typing import Optional
+
+import numpy as np
+
+
+# Emotion analytics for the linker stats page (numpy)
+# only the score columns of a user's diaries are loaded (projection) into arrays; rolling means,
+# percentiles, volatility and z-score anomalies are computed vectorized, so a history of
+# 100k entries costs milliseconds of cpu on top of the query itself.
+
+
+INDICATORS = ("depression", "isolation", "frustration")
+PERCENTILES = (10, 25, 50, 75, 90)
+SERIES_POINTS = 120 # newest points of the rolling-mean series sent to the chart
+RECENT_ANOMALIES = 10
+
+
+def rolling_mean_std(values: np.ndarray, window: int):
+    """각 위치에서 끝나는 최근 window개(앞쪽은 가능한 만큼)의 평균과 표준편차, 누적합으로 O(n)"""
+    n = len(values)
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    squares = np.concatenate(([0.0], np.cumsum(values * values)))
+    end = np.arange(1, n + 1)
+    start = np.maximum(end - window, 0)
+    count = end - start
+    mean = (sums[end] - sums[start]) / count
+    variance = np.maximum((squares[end] - squares[start]) / count - mean * mean, 0.0)
+    return mean, np.sqrt(variance)
+
+
+def anomaly_scores(values: np.ndarray, window: int, rolling=None) -> np.ndarray:
+    """각 일기의 z-score (직전 window개 일기 기준), 기준이 부족하거나 변동이 없으면 0
+    rolling: 이미 계산한 rolling_mean_std(values, window) 결과"""
+    z = np.zeros(len(values))
+    if len(values) <= window:
+        return z
+    mean, std = rolling if rolling is not None else rolling_mean_std(values, window)
+    baseline_mean, baseline_std = mean[window - 1:-1], std[window - 1:-1]
+    diff = values[window:] - baseline_mean
+    z[window:] = np.divide(diff, baseline_std, out=np.zeros_like(diff), where=baseline_std > 0)
+    return z
+
+
+def _iso_dates(values: np.ndarray) -> list:
+    # only the dates that are sent to the page are formatted
+    return np.datetime_as_string(values.astype("datetime64[s]"), unit="s", timezone="UTC").tolist()
+
+
+def compute_analytics(created_at: np.ndarray, scores: np.ndarray, window: int = 7, z_threshold: float = 2.0) -> dict:
+    """created_at: 작성 시각 (오래된 것부터, datetime64), scores: (n, 3) depression/isolation/frustration
+    반환: 지표별 요약, 이동평균 series, 최근 이상치"""
+    n = len(scores)
+    result = {"entries": n, "window": window, "indicators": {}, "series": {"dates": []}, "anomalies": []}
+    if n == 0:
+        return result
+
+    series_from = max(0, n - SERIES_POINTS)
+    result["series"]["dates"] = _iso_dates(created_at[series_from:])
+    flagged = []
+    for column, name in enumerate(INDICATORS):
+        values = scores[:, column]
+        rolling = rolling_mean_std(values, window)
+        z = anomaly_scores(values, window, rolling)
+        is_anomaly = np.abs(z) >= z_threshold
+        result["indicators"][name] = {
+            "mean": round(float(values.mean()), 1),
+            "std": round(float(values.std()), 1),
+            "volatility": round(float(np.diff(values).std()), 1) if n > 1 else 0.0,
+            "percentiles": dict(zip((f"p{p}" for p in PERCENTILES), np.round(np.percentile(values, PERCENTILES), 1).tolist())),
+            "latest": round(float(values[-1]), 1),
+            "rolling_mean": round(float(rolling[0][-1]), 1),
+            "anomaly_count": int(is_anomaly.sum()),
+        }
+        result["series"][name] = np.round(rolling[0][series_from:], 1).tolist()
+        for i in np.flatnonzero(is_anomaly)[-RECENT_ANOMALIES:]:
+            flagged.append((int(i), name, float(values[i]), float(z[i])))
+
+    flagged = sorted(flagged, key=lambda item: item[0])[-RECENT_ANOMALIES:]
+    dates = _iso_dates(created_at[[i for i, *_ in flagged]])
+    result["anomalies"] = [
+        {"date": date, "indicator": name, "value": round(value, 1), "z": round(score, 2)}
+        for date, (_, name, value, score) in zip(dates, flagged)
+    ]
+    return result
+
+
+async def load_score_history(user_id: str, max_entries: Optional[int] = None):
+    """사용자 일기의 (작성 시각, 세 지표) 배열, 오래된 것부터 (점수 필드만 projection)"""
+    max_entries = max_entries or server_config.ANALYTICS_MAX_ENTRIES
+    projection = {"_id": 0, "created_at": 1, **{name: 1 for name in INDICATORS}}
+    docs = await diaries.find({"author_id": user_id}, projection) \
+        .sort("created_at", -1).limit(max_entries).to_list()
+    docs.reverse()
+    epoch = datetime.datetime(1970, 1, 1)
+    created_at = np.array(
+        [(doc.get("created_at") or epoch).replace(tzinfo=None) for doc in docs], dtype="datetime64[ms]"
+    )
+    scores = np.array(
+        [[doc.get(name) or 0 for name in INDICATORS] for doc in docs], dtype=np.float64
+    ).reshape(-1, len(INDICATORS))
+    return created_at, scores
+
+
+async def get_emotion_analytics(user_id: str) -> dict:
+    """linker 통계 페이지용 분석 결과"""
+    created_at, scores = await load_score_history(user_id)
+    return compute_analytics(
+        created_at, scores,
+        window=server_config.ANALYTICS_ROLLING_WINDOW,
+        z_threshold=server_config.ANALYTICS_ANOMALY_Z,
+    )
@@ -1,16 +1,20 @@
 from fastapi import Request, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi import Request, UploadFile
 from ...shared import *
 from ...config import *
 import base64
 import httpx
-from ..auth.auth import get_current_user
-import time
+from ..auth.auth import get_current_user, is_linker
 import uuid_utils
 import json
+from typing import Optional
 from pydantic import BaseModel
 from .ai_processing import *
+from ...deadline import request_deadline, DeadlineExceeded
+from .conversation_summary import room_summary_state, summarize_room
+from ...chat_store import RoomNotFound, RoomAccessDenied
+from starlette.background import BackgroundTask
 
 class ChatMessage(BaseModel):
     room_id: str
@@ -27,39 +31,38 @@ GOOGLE_STT_URL = "https://speech.googleapis.com/v1/speech:recognize"
 
 
 
-def send_message(room_id, user_id, text, role):
-    key = f"chat:messages:{room_id}"
-    timestamp = time.time() # sort with time(=score) (redis sorted set)
-    message_id = str(uuid_utils.uuid7())
-    
-    data = json.dumps({
-        "messsage_id": message_id,
-        "time": timestamp,
-        "role": role,
-        "user_id": user_id,
-        "message": text,
-    })
-    print("전송할 메시지 :\n" + data)
-    
-    chat_sessions.zadd(key, {data: timestamp})
-    chat_sessions.expire(key, 7200) # 2H TTL
-    
-    print("send_message 호출 및 chat_sessions.zadd 완료")
-    keys = chat_sessions.keys('*')
-    for key in keys:
-        print(key)
-    
-    return True
-    
-def get_messages(room_id, cnt=12):
-    print("서버에서 채팅 가져오는중...")
-    key = f"chat:messages:{room_id}"
-    
-    raw = chat_sessions.zrevrange(key, 0, cnt - 1)
-    messages = [json.loads(msg) for msg in raw]
-    messages.reverse()
-    print(messages)
-    return messages
+async def send_message(room_id, user_id, text, role):
+    """채팅방에 메시지 추가 (방이 이미 닫혔으면 저장하지 않고 None)"""
+    data = await chat_rooms.add_message(room_id, user_id, text, role)
+    print("전송할 메시지 :\n" + str(data))
+    return data
+
+async def close_room(room_id):
+    """대화 기록, 참여자, 요약 등 채팅방 상태 삭제"""
+    await chat_rooms.close(room_id)
+
+async def remove_message(room_id, data):
+    """send_message / chat_rooms.add_user_message가 저장한 메시지를 대화 기록에서 제거"""
+    await chat_rooms.remove_message(room_id, data)
+
+def room_error_response(e: Exception):
+    """RoomNotFound / RoomAccessDenied -> 400 응답"""
+    if isinstance(e, RoomNotFound):
+        return JSONResponse(status_code=400, content={"error": "채팅 세션이 시작되지 않았습니다."})
+    return JSONResponse(status_code=400, content={"error": "채팅에 접근할 권한이 부족합니다."})
+
+
+
+async def start_diary_generation(user_id, conversation, model, deadline=None) -> Optional[str]:
+    """일기 생성을 작업 큐에 등록하고 job_id 반환
+    큐를 쓰지 않도록 설정했거나 등록에 실패하면 요청 안에서 남은 deadline 안에 바로 생성 (None 반환)"""
+    if server_config.DIARY_JOB_QUEUE_ENABLED:
+        try:
+            return await enqueue_diary_job(user_id, conversation, model)
+        except Exception as e:
+            print(f"일기 생성 작업 등록 실패, 직접 생성합니다: {e}")
+    await generate_and_save_diary(user_id, conversation, model=model, deadline=deadline)
+    return None
 
 
 
@@ -74,31 +77,20 @@ async def start_chat(request: Request, start_request: StartChatRequest = None):
     if not current_user:
         return JSONResponse(status_code=401, content={"error": "Authentication required"})
     # Linker는 채팅 시작 차단
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return JSONResponse(status_code=403, content={"error": "forbidden"})
  
     user_id = current_user.get("id")
     room_id = str(uuid_utils.uuid7())
-    chat_session_key = f"chat:messages:{room_id}"
-    message_id = str(uuid_utils.uuid7())
     
     print(f"첫 채팅 시작 room_id: {room_id}")
     
     # 안정적인 대화 시작을 위해 첫 질문은 고정된 값으로 사용
     first_question = "안녕하세요! 오늘 하루는 어떠셨나요?"
     
-    send_message(room_id, user_id, first_question, "assistant")
-    
-    # Store selected model in redis for this session
-    model_key = f"chat:model:{room_id}"
+    # 방 생성 + 참여자 등록 + 선택한 model + 첫 메시지 저장 (role: 'assistant')
     selected_model = start_request.model if start_request else "solar-pro"
-    chat_sessions.set(model_key, selected_model)
-    chat_sessions.expire(model_key, 7200)
-    
-    if user_id:
-        chat_users.sadd(f"chat:participants:{room_id}", user_id)
-    chat_users.expire(f"chat:participants:{room_id}", 7200) # 2H TTL
-    # 대화 기록 초기화 및 첫 메시지 저장 (role: 'assistant'로 변경)
+    await chat_rooms.create(room_id, user_id, selected_model, first_question)
     
     return JSONResponse(content={"response": first_question, "finished": False, "room_id": room_id})
 
@@ -109,61 +101,172 @@ async def post_chat_message(request: Request, user_message: ChatMessage):
     if not current_user:
         return JSONResponse(status_code=401, content={"error": "Authentication required"})
     # Linker는 메시지 전송 차단
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return JSONResponse(status_code=403, content={"error": "forbidden"})
     
     user_id = current_user.get("id")
     room_id = user_message.room_id
-    key = f"chat:messages:{room_id}"
-
-    if chat_sessions.exists(key) == 0:
-        return JSONResponse(status_code=400, content={"error": "채팅 세션이 시작되지 않았습니다."})
-    
-    if user_id and not chat_users.sismember(f"chat:participants:{room_id}", user_id):
-        print(chat_users.smembers(f"chat:participants:{room_id}"))
-        return JSONResponse(status_code=400, content={"error": "채팅에 접근할 권한이 부족합니다."})
     
     if user_message.message == "채팅방 나가기":
+        try:
+            await chat_rooms.check_access(room_id, user_id)
+        except (RoomNotFound, RoomAccessDenied) as e:
+            return room_error_response(e)
         print(f"도중에 끊긴 대화 내역 삭제\n  room_id: {room_id}")
-        if chat_sessions.exists(key) == 1 or chat_users.exists(f"chat:participants:{room_id}"):
-            chat_sessions.delete(key)
-            chat_users.delete(f"chat:participants:{room_id}")
+        await close_room(room_id)
         return
         
 
-    # 현재 대화 기록에 사용자 메시지 추가
+    # 요청 도착 시점부터 전체 응답에 쓸 수 있는 시간
+    deadline = request_deadline(request, server_config.CHAT_REQUEST_BUDGET)
+
+    # 접근 확인 + 사용자 메시지 추가 + model 갱신(start_chat 이후 변경 허용) + 최근 대화/요약 조회 (lua script 한 번)
     print(f"redis 사용자 채팅 추가 시작 : {user_message.message}")
-    send_message(room_id, user_id, user_message.message, "user")
+    try:
+        turn = await chat_rooms.add_user_message(room_id, user_id, user_message.message, model=user_message.model)
+    except (RoomNotFound, RoomAccessDenied) as e:
+        return room_error_response(e)
+    sent_user_message, selected_model, current_conversation = turn.message, turn.model, turn.conversation
     print(f"redis 사용자 채팅 추가 완료 : {user_message.message}")
-    current_conversation = get_messages(room_id, 30)
-    
-    # AI에게 다음 질문 생성 요청 (await 추가)
-    # Retrieve model from redis or request
-    model_key = f"chat:model:{room_id}"
     
-    # Always update the model if provided in the message (allows switching after start_chat)
-    if user_message.model:
-        selected_model = user_message.model
-        chat_sessions.set(model_key, selected_model)
-        chat_sessions.expire(model_key, 7200)
-    else:
-        stored_model = chat_sessions.get(model_key)
-        selected_model = stored_model.decode('utf-8') if stored_model else "solar-pro"
-    
-    ai_message = await get_ai_question(current_conversation, model=selected_model)
+    summary_state = room_summary_state(turn.summary)
+    # 마무리 턴이면 마무리 인사와 동시에 일기 생성 시작 (END_CHAT이 없으면 버림)
+    diary_task = start_speculative_diary(current_conversation, deadline) if user_id else None
+    try:
+        ai_message = await get_ai_question(current_conversation, model=selected_model, deadline=deadline, summary_state=summary_state)
+    except BaseException:
+        discard_speculative_diary(diary_task)
+        raise
+
+    if ai_message.get("degraded"):
+        # 시간 초과: 사용자 메시지를 되돌려 다시 보내도 대화가 꼬이지 않게 함
+        discard_speculative_diary(diary_task)
+        await remove_message(room_id, sent_user_message)
+        return JSONResponse(status_code=503, content=ai_message, headers={"Retry-After": "5"})
     
     # AI 응답을 대화 기록에 추가 (role: 'assistant'로 변경)
-    send_message(room_id, user_id, ai_message, "assistant")
+    await send_message(room_id, user_id, ai_message, "assistant")
 
     # 대화 종료 시 일기 자동 생성 및 세션 정리
     if ai_message.get("finished") and user_id:
-        # 백그라운드에서 일기 생성 및 저장 실행 (응답이 사용자에게 즉시 가도록)
-        await generate_and_save_diary(user_id, current_conversation, model=selected_model)
-        if chat_sessions.exists(key) == 1 or chat_users.exists(f"chat:participants:{room_id}"):
-            chat_sessions.delete(key)
-            chat_users.delete(f"chat:participants:{room_id}")
-        
-    return JSONResponse(content=ai_message)
+        try:
+            if not await commit_speculative_diary(diary_task, user_id):
+                # 백그라운드 worker에서 일기 생성 및 저장 실행 (응답이 사용자에게 즉시 가도록)
+                diary_job_id = await start_diary_generation(user_id, current_conversation, selected_model, deadline)
+                if diary_job_id:
+                    ai_message = {**ai_message, "diary_job_id": diary_job_id}
+        finally:
+            # 대화는 끝났으므로 일기 저장이 실패해도 방은 닫음
+            await close_room(room_id)
+        return JSONResponse(content=ai_message)
+
+    discard_speculative_diary(diary_task)
+
+    # 오래된 턴 요약은 응답을 보낸 뒤에 실행
+    background = BackgroundTask(summarize_room, room_id) if server_config.CHAT_SUMMARY_ENABLED else None
+    return JSONResponse(content=ai_message, background=background)
+
+
+
+@router.get("/chat/diary-status/{job_id}")
+async def get_diary_status(request: Request, job_id: str):
+    """일기 생성 작업 상태 조회 (queued / running / retrying / done / failed)"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+
+    status = await diary_jobs.get_status(job_id)
+    if not status or status.get("user_id") != current_user.get("id"):
+        return JSONResponse(status_code=404, content={"error": "not found"})
+    return JSONResponse(content={"job_id": job_id, "status": status.get("status")})
+
+
+def _sse(data: dict, event: str = None) -> str:
+    """Server-Sent Events 프레임 생성"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/message/stream")
+async def post_chat_message_stream(request: Request, user_message: ChatMessage):
+    """/chat/message 의 스트리밍 버전. AI 응답 토큰을 SSE로 즉시 전달합니다.
+    events: (default) {"token": str} / done {"response", "finished"} / error {"error"}"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+    # Linker는 메시지 전송 차단
+    if is_linker(current_user):
+        return JSONResponse(status_code=403, content={"error": "forbidden"})
+
+    user_id = current_user.get("id")
+    room_id = user_message.room_id
+
+    deadline = request_deadline(request, server_config.CHAT_REQUEST_BUDGET)
+    try:
+        turn = await chat_rooms.add_user_message(room_id, user_id, user_message.message, model=user_message.model)
+    except (RoomNotFound, RoomAccessDenied) as e:
+        return room_error_response(e)
+    sent_user_message, selected_model, current_conversation = turn.message, turn.model, turn.conversation
+
+    summary_state = room_summary_state(turn.summary)
+
+    async def event_stream():
+        end_filter = EndChatStreamFilter()
+        parts = []
+        # 마무리 턴이면 마무리 인사와 동시에 일기 생성 시작 (END_CHAT이 없으면 버림)
+        diary_task = start_speculative_diary(current_conversation, deadline) if user_id else None
+        try:
+            try:
+                async for delta in stream_ai_question(current_conversation, model=selected_model, deadline=deadline, summary_state=summary_state):
+                    text = end_filter.feed(delta)
+                    if text:
+                        parts.append(text)
+                        yield _sse({"token": text})
+                tail = end_filter.flush()
+                if tail:
+                    parts.append(tail)
+                    yield _sse({"token": tail})
+            except Exception as e:
+                if isinstance(e, DeadlineExceeded) or (deadline.expired and not parts):
+                    print(f"deadline 초과로 스트리밍 생략: {e}")
+                    await remove_message(room_id, sent_user_message)
+                    yield _sse({"error": DEGRADED_RESPONSE["response"], "degraded": True}, event="error")
+                    return
+                print(f"AI 스트리밍 오류: {e}")
+                if parts:
+                    # 이미 보여준 토큰은 답변으로 저장 (다음 턴에 사용자 메시지가 연달아 가지 않도록)
+                    await send_message(room_id, user_id, {"response": "".join(parts).strip(), "finished": False}, "assistant")
+                else:
+                    await remove_message(room_id, sent_user_message)
+                yield _sse({"error": "죄송합니다, AI 모델과 통신하는 중 오류가 발생했어요. 잠시 후 다시 시도해주세요."}, event="error")
+                return
+
+            # 완성된 메시지는 기존 /chat/message 와 동일하게 저장
+            ai_message = {"response": "".join(parts).strip(), "finished": end_filter.finished}
+            await send_message(room_id, user_id, ai_message, "assistant")
+
+            if ai_message.get("finished") and user_id:
+                try:
+                    if not await commit_speculative_diary(diary_task, user_id):
+                        diary_job_id = await start_diary_generation(user_id, current_conversation, selected_model, deadline)
+                        if diary_job_id:
+                            ai_message["diary_job_id"] = diary_job_id
+                finally:
+                    await close_room(room_id)
+
+            yield _sse(ai_message, event="done")
+        finally:
+            # END_CHAT이 없었거나 중간에 실패/연결 종료 (이미 저장했으면 아무 일도 없음)
+            discard_speculative_diary(diary_task)
+
+    # 오래된 턴 요약은 스트림이 끝난 뒤에 실행 (종료된 방이면 요약할 것이 없어 바로 끝남)
+    background = BackgroundTask(summarize_room, room_id) if server_config.CHAT_SUMMARY_ENABLED else None
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
 
 
 
@@ -194,23 +297,22 @@ async def transcribe_audio(audio_file: UploadFile):
     }
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{GOOGLE_STT_URL}?key={api_key}",
-                json=payload,
-                timeout=60.0
-            )
-            response.raise_for_status()
-            
-            response_data = response.json()
-            # Google STT can return an empty response if no speech is detected
-            if 'results' in response_data and len(response_data['results']) > 0:
-                transcript = response_data['results'][0]['alternatives'][0]['transcript']
-            else:
-                transcript = "" # No speech detected, return empty string
-            
-            print(f"Google STT 결과: {transcript}")
-            return JSONResponse({"transcript": transcript})
+        client = upstream_clients.get("google_stt")
+        response = await client.post(
+            f"{GOOGLE_STT_URL}?key={api_key}",
+            json=payload,
+        )
+        response.raise_for_status()
+        
+        response_data = response.json()
+        # Google STT can return an empty response if no speech is detected
+        if 'results' in response_data and len(response_data['results']) > 0:
+            transcript = response_data['results'][0]['alternatives'][0]['transcript']
+        else:
+            transcript = "" # No speech detected, return empty string
+        
+        print(f"Google STT 결과: {transcript}")
+        return JSONResponse({"transcript": transcript})
 
     except httpx.HTTPStatusError as e:
         print(f"Google STT API 오류: {e.response.text}")
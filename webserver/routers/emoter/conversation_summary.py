@@ -0,0 +1,111 @@
+from ...shared import *
+from ...config import *
+import time
+from typing import List, Optional, Tuple
+
+
+# Rolling conversation summary
+# older turns are folded into a stored summary after the response is sent (off the critical path),
+# so each prompt carries "summary + last N raw messages" instead of the whole room history
+''' redis hash
+chat:summary:{room_id} =>
+{
+    "summary": text,
+    "covered_until": timestamp of the newest message folded into the summary
+}
+'''
+
+
+SUMMARY_TTL = server_config.CHAT_ROOM_TTL # refreshed together with the room on every message
+
+
+def estimate_tokens(text: str) -> int:
+    """로컬 토큰 수 추정 (한글 음절 ≈ 1토큰, 그 외 문자는 4자당 1토큰)"""
+    if not text:
+        return 0
+    hangul = sum(1 for ch in text if "가" <= ch <= "힣")
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def message_text(msg: dict) -> str:
+    """저장된 메시지 본문 (assistant 메시지는 {"response", "finished"} dict로 저장되어 있음)"""
+    text = msg.get("message", "")
+    if isinstance(text, dict):
+        return text.get("response", "")
+    return str(text)
+
+
+async def load_summary(room_id: str) -> Optional[dict]:
+    raw = await redis_client.hgetall(chat_rooms.summary_key(room_id))
+    if not raw:
+        return None
+    return {
+        "summary": raw.get(b"summary", b"").decode("utf-8"),
+        "covered_until": float(raw.get(b"covered_until", b"0")),
+    }
+
+
+def room_summary_state(stored_summary: Optional[dict]) -> Optional[dict]:
+    """요약 모드일 때 프롬프트 구성에 쓸 요약 상태 (요약 모드가 아니면 None)
+    stored_summary는 chat_rooms.add_user_message가 함께 읽어 온 값"""
+    if not server_config.CHAT_SUMMARY_ENABLED:
+        return None
+    return stored_summary or {"summary": "", "covered_until": 0.0}
+
+
+def select_prompt_history(conversation: List[dict], summary_state: Optional[dict]) -> Tuple[str, List[dict]]:
+    """프롬프트에 넣을 (요약문, 원문 메시지들)
+    요약에 포함되지 않은 메시지는 모두 원문으로 넣되, 토큰 예산을 넘으면 오래된 것부터 뺀다 (최소 2개 유지)"""
+    if not summary_state:
+        summary, covered_until = "", 0.0
+    else:
+        summary, covered_until = summary_state["summary"], summary_state["covered_until"]
+
+    recent = [msg for msg in conversation if msg.get("time", 0) > covered_until]
+    budget = server_config.CHAT_PROMPT_TOKEN_BUDGET - estimate_tokens(summary)
+    while len(recent) > 2 and sum(estimate_tokens(message_text(msg)) for msg in recent) > budget:
+        recent = recent[1:]
+    return summary, recent
+
+
+def older_than_raw_window(conversation: List[dict]) -> List[dict]:
+    """원문 창(최신 CHAT_SUMMARY_RAW_MESSAGES개)을 뺀 나머지 (설정이 0이면 전부)"""
+    # conversation[:-0] would be empty and summarization would silently never run
+    raw = max(0, server_config.CHAT_SUMMARY_RAW_MESSAGES)
+    return conversation[:len(conversation) - raw]
+
+
+def needs_summary(conversation: List[dict], summary_state: Optional[dict]) -> bool:
+    """원문 창(CHAT_SUMMARY_RAW_MESSAGES)보다 오래된, 아직 요약되지 않은 메시지가 있는지"""
+    covered_until = summary_state["covered_until"] if summary_state else 0.0
+    older = older_than_raw_window(conversation)
+    return any(msg.get("time", 0) > covered_until for msg in older)
+
+
+async def summarize_room(room_id: str):
+    """원문 창보다 오래된 메시지를 기존 요약에 접어 넣는다 (응답 전송 후 background에서 실행)"""
+    from .ai_processing import summarize_turns
+
+    lock_key = f"chat:summary_lock:{room_id}"
+    if not await redis_client.set(lock_key, "1", nx=True, ex=60):
+        return # another request is already summarizing this room
+    try:
+        conversation = await chat_rooms.all_messages(room_id)
+        summary_state = await load_summary(room_id)
+        if not needs_summary(conversation, summary_state):
+            return
+        covered_until = summary_state["covered_until"] if summary_state else 0.0
+        older = older_than_raw_window(conversation)
+        to_fold = [msg for msg in older if msg.get("time", 0) > covered_until]
+
+        started = time.monotonic()
+        summary = await summarize_turns(summary_state["summary"] if summary_state else "", to_fold)
+        key = chat_rooms.summary_key(room_id)
+        await redis_client.hset(key, mapping={"summary": summary, "covered_until": to_fold[-1]["time"]})
+        await redis_client.expire(key, SUMMARY_TTL)
+        print(f"대화 요약 갱신 room_id: {room_id} (+{len(to_fold)} messages, {time.monotonic() - started:.2f}s)")
+    except Exception as e:
+        # a failed summary only means the next prompt carries more raw turns
+        print(f"대화 요약 실패 room_id: {room_id}: {e}")
+    finally:
+        await redis_client.delete(lock_key)
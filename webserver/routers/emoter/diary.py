@@ -1,36 +1,178 @@
 from fastapi import Request
 from ...shared import *
 from ...config import *
+import asyncio
+import base64
 import datetime
+import json
+import math
+from typing import Optional, Tuple
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
 from fastapi import Request, APIRouter
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi import Form
 
-from ..auth.auth import get_current_user
+from ..auth.auth import get_current_user, is_linker
+from .emotion_stats import (
+    begin_diary_writes, end_diary_writes, get_user_stats, rebuild_user_aggregates, record_diary_stats,
+    stats_from_document,
+)
+from .emotion_trend import record_diary_rollups
+from ...search_index import candidate_pipeline, normalize, query_grams, rank_candidates, search_grams
 
 
-def load_diary_entries(request, max_limit = 0) -> list:
-    """load user diaries"""
-    current_user = get_current_user(request)
-    if current_user is None:
-        return []
-    user_id = current_user["id"]
-    user_diaries: list = list(diaries.find({"author_id" : user_id}, limit = max_limit))
-    if user_diaries is None:
-        user_diaries = []
-    return user_diaries
-    
-def load_diary_entries_for_user(user_id: str, max_limit = 0) -> list:
+async def load_diary_entries_for_user(user_id: str, max_limit = 0) -> list:
     """load diaries for specific user"""
     if not user_id:
         return []
-    user_diaries: list = list(diaries.find({"author_id" : user_id}, limit = max_limit))
+    user_diaries: list = await diaries.find({"author_id" : user_id}, {"search_grams": 0}, limit = max_limit).to_list()
     if user_diaries is None:
         user_diaries = []
     return user_diaries
     
 
-def save_diary_entry(title, content, emotion, author, date, depression=0, isolation=0, frustration=0):
+# diary feed (keyset pagination over (created_at, _id), newest first)
+DIARY_PAGE_SIZE = 20
+DIARY_PAGE_MAX = 50
+DIARY_PREVIEW_CHARS = 300
+DIARY_SUMMARY_PROJECTION = {
+    "title": 1,
+    "emotion": 1,
+    "created_at": 1,
+    "preview": {"$substrCP": ["$content", 0, DIARY_PREVIEW_CHARS]},
+    "content_length": {"$strLenCP": {"$ifNull": ["$content", ""]}},
+}
+
+
+def _utc_iso(value) -> Optional[str]:
+    # pymongo returns naive datetimes that are UTC
+    if not isinstance(value, datetime.datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.isoformat()
+
+
+def encode_diary_cursor(entry: dict) -> str:
+    """다음 페이지 cursor (마지막 항목의 created_at, _id를 담은 opaque 문자열)"""
+    raw = json.dumps({"t": _utc_iso(entry["created_at"]), "id": str(entry["_id"])})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_diary_cursor(cursor: str) -> Tuple[datetime.datetime, ObjectId]:
+    """잘못된 cursor면 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        created_at = datetime.datetime.fromisoformat(data["t"]).astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return created_at, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+
+def diary_summary(entry: dict) -> dict:
+    return {
+        "id": str(entry["_id"]),
+        "title": entry.get("title", ""),
+        "emotion": entry.get("emotion", "😊"),
+        "created_at": _utc_iso(entry.get("created_at")),
+        "preview": entry.get("preview", ""),
+        "truncated": entry.get("content_length", 0) > DIARY_PREVIEW_CHARS,
+    }
+
+
+async def load_diary_page(user_id: str, cursor: Optional[str] = None, limit: int = DIARY_PAGE_SIZE) -> Tuple[list, Optional[str]]:
+    """최신순 일기 요약 한 페이지와 다음 페이지 cursor (마지막 페이지면 None)
+    author_id_created_at_id index를 따라 읽으므로 전체 일기 수와 관계없이 일정한 비용"""
+    query = {"author_id": user_id}
+    if cursor:
+        created_at, last_id = decode_diary_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}},
+        ]
+    limit = max(1, min(limit, DIARY_PAGE_MAX))
+    entries = await diaries.find(query, DIARY_SUMMARY_PROJECTION) \
+        .sort([("created_at", -1), ("_id", -1)]).limit(limit + 1).to_list()
+    next_cursor = encode_diary_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return [diary_summary(entry) for entry in entries[:limit]], next_cursor
+
+
+# diary search (bigram terms in diaries.search_grams, see search_index.py)
+# diaries written before search_grams existed are filled in by backfill_search_grams (background task at
+# startup, or scripts/maintenance/backfill_search_grams.py); until then search computes their terms per query
+SEARCH_MIN_COVERAGE = 0.6 # a diary must contain at least this share of the query terms
+SEARCH_MAX_QUERY_CHARS = 100
+SEARCH_MAX_CANDIDATES = 500 # ranked in python (phrase bonus), later pages beyond this are not returned
+SEARCH_BACKFILL_BATCH = 500
+SEARCH_BACKFILL_LOCK = "search_grams:backfill:lock"
+SEARCH_BACKFILL_LOCK_SECONDS = 600
+
+
+async def search_diary_entries(user_id: str, query: str, page: int = 1, limit: int = DIARY_PAGE_SIZE) -> Tuple[list, bool]:
+    """검색어와 겹치는 term이 많은 순(같으면 최신순)으로 일기 요약 한 페이지와 다음 페이지 여부
+    점수는 search_index.rank_candidates, 일치 수 상위 SEARCH_MAX_CANDIDATES개 안에서만 순위를 매김"""
+    phrase = normalize(query)[:SEARCH_MAX_QUERY_CHARS].strip()
+    grams = query_grams(phrase)
+    if not grams:
+        return [], False
+    limit = max(1, min(limit, DIARY_PAGE_MAX))
+    page = max(1, page)
+    min_matched = max(1, math.ceil(len(grams) * SEARCH_MIN_COVERAGE))
+
+    pipeline = candidate_pipeline({"author_id": user_id}, grams, min_matched, SEARCH_MAX_CANDIDATES)
+    candidates = await (await diaries.aggregate(pipeline)).to_list()
+    ranked = rank_candidates(candidates, phrase, grams, min_matched)
+    first = (page - 1) * limit
+    results = []
+    for score, entry in ranked[first:first + limit]:
+        content = entry.get("content") or ""
+        summary = diary_summary({**entry, "preview": content[:DIARY_PREVIEW_CHARS], "content_length": len(content)})
+        results.append({**summary, "score": round(score, 3)})
+    return results, len(ranked) > first + limit
+
+
+async def backfill_search_grams(pause: float = 0.0) -> int:
+    """search_grams가 없는 일기를 SEARCH_BACKFILL_BATCH개씩 채움 => 채운 일기 수
+    pause: batch 사이 쉬는 시간 (서버 안에서 돌 때 db 부하를 나눔)"""
+    filled = 0
+    batch = []
+    missing = diaries.find({"search_grams": {"$exists": False}}, {"title": 1, "content": 1}).batch_size(SEARCH_BACKFILL_BATCH)
+    async for doc in missing:
+        batch.append(UpdateOne(
+            {"_id": doc["_id"], "search_grams": {"$exists": False}},
+            {"$set": {"search_grams": search_grams(doc.get("title", ""), doc.get("content", ""))}},
+        ))
+        if len(batch) >= SEARCH_BACKFILL_BATCH:
+            await diaries.bulk_write(batch, ordered=False)
+            filled += len(batch)
+            batch = []
+            if pause:
+                await asyncio.sleep(pause)
+    if batch:
+        await diaries.bulk_write(batch, ordered=False)
+        filled += len(batch)
+    return filled
+
+
+async def ensure_search_grams():
+    """startup (main.py lifespan): 한 worker만 background backfill, 실패해도 검색은 phrase로 동작"""
+    try:
+        if not await redis_client.set(SEARCH_BACKFILL_LOCK, 1, nx=True, ex=SEARCH_BACKFILL_LOCK_SECONDS):
+            return
+        try:
+            filled = await backfill_search_grams(pause=0.05)
+            if filled:
+                print(f"search_grams backfill: {filled}개 일기")
+        finally:
+            await redis_client.delete(SEARCH_BACKFILL_LOCK)
+    except Exception as e:
+        print(f"search_grams backfill 실패: {e}")
+
+
+async def save_diary_entry(title, content, emotion, author, date, depression=0, isolation=0, frustration=0):
     """save new diary in db"""
     new_entry = {
         "title": title,
@@ -41,148 +183,33 @@ def save_diary_entry(title, content, emotion, author, date, depression=0, isolat
         "last_modified" : datetime.datetime.now(datetime.timezone.utc),
         "depression": depression,
         "isolation": isolation,
-        "frustration": frustration
+        "frustration": frustration,
+        "search_grams": search_grams(title, content),
     }
-    diaries.insert_one(new_entry)
-    return new_entry
-
-def _get_last_two_entries_for_user(user_id: str) -> list:
-    """최근 두 개의 일기 엔트리를 최신순으로 반환 (없으면 빈 리스트)"""
-    if not user_id:
-        return []
+    # tell a concurrent rebuild that this diary is on its way (see emotion_stats.py)
+    created = await begin_diary_writes({author: 1})
     try:
-        cursor = diaries.find({"author_id": user_id}).sort("created_at", -1).limit(2)
-        return list(cursor)
-    except Exception:
-        return []
-
-def get_health_indicator_for_user(user_id: str) -> dict:
-    """최근 일기 2개의 (depression,isolation,frustration) 평균 변화량으로 건강 인디케이터 계산
-    규칙:
-      - avgDelta >= 30  => red
-      - avgDelta >= 15 또는 avgDelta <= -30 => orange
-      - 그 외 => green
-    엔트리가 1개 이하이면 green
-    반환: { color: str, delta: float }
-    """
-    entries = _get_last_two_entries_for_user(user_id)
-    if len(entries) < 2:
-        return {"color": "green", "delta": 0.0}
-
-    last = entries[0]
-    prev = entries[1]
-
-    # 세 지표의 합 또는 평균 중 스펙 상 "평균" 기준으로 계산
-    last_avg = (
-        float(last.get("depression", 0)) +
-        float(last.get("isolation", 0)) +
-        float(last.get("frustration", 0))
-    ) / 3.0
-    prev_avg = (
-        float(prev.get("depression", 0)) +
-        float(prev.get("isolation", 0)) +
-        float(prev.get("frustration", 0))
-    ) / 3.0
-
-    avg_delta = round(last_avg - prev_avg, 1)
-
-    color = "green"
-    if avg_delta >= 30:
-        color = "red"
-    elif avg_delta >= 15 or avg_delta <= -30:
-        color = "orange"
-
-    return {"color": color, "delta": avg_delta}
-
-def get_emotion_stats(request: Request):
-    """감정 통계 데이터 생성"""
-    diary_entries = list(load_diary_entries(request))
-    total_entries = len(diary_entries)
-    
-    if total_entries == 0:
-        return {
-            "emotion_counts": {},
-            "total_entries": 0,
-            "average_score": 0,
-            "total_score": 0,
-            "avg_depression": 0,
-            "avg_isolation": 0,
-            "avg_frustration": 0,
-        }
-
-    emotion_counts = {}
-    total_depression = 0
-    total_isolation = 0
-    total_frustration = 0
-
-    for entry in diary_entries:
-        emotion = entry.get('emotion', '😊')
-        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        total_depression += entry.get('depression', 0)
-        total_isolation += entry.get('isolation', 0)
-        total_frustration += entry.get('frustration', 0)
-
-    # 기존 감정 스코어 계산 (예시)
-    emotion_scores = {
-        '😊': 5, '😄': 5, '😌': 4, '🙏': 4, 
-        '😟': 2, '😰': 2, 
-        '😢': 1, '😠': 1, '😔': 1
-    }
-    
-    total_score = sum(emotion_scores.get(emotion, 3) * count for emotion, count in emotion_counts.items())
-    average_score = total_score / total_entries
+        await diaries.insert_one(new_entry)
+    except BaseException:
+        await end_diary_writes({author: 1})
+        raise
+    await record_diary_rollups(new_entry)
+    await record_diary_stats(new_entry)
+    if created:
+        # first counted diary of the author: earlier diaries go into user_stats + rollups too
+        await rebuild_user_aggregates(author)
+    return new_entry
 
-    return {
-        "emotion_counts": emotion_counts,
-        "total_entries": total_entries,
-        "average_score": round(average_score, 2),
-        "total_score": total_score,
-        "avg_depression": round(total_depression / total_entries, 1),
-        "avg_isolation": round(total_isolation / total_entries, 1),
-        "avg_frustration": round(total_frustration / total_entries, 1),
-    }
+async def get_emotion_stats(request: Request):
+    """감정 통계 데이터 생성 (user_stats 한 건 조회)"""
+    current_user = get_current_user(request)
+    if current_user is None:
+        return stats_from_document(None)
+    return await get_user_stats(current_user["id"])
 
-def get_emotion_stats_for_user(user_id: str):
+async def get_emotion_stats_for_user(user_id: str):
     """감정 통계 데이터 (특정 사용자)"""
-    diary_entries = list(load_diary_entries_for_user(user_id))
-    total_entries = len(diary_entries)
-    if total_entries == 0:
-        return {
-            "emotion_counts": {},
-            "total_entries": 0,
-            "average_score": 0,
-            "total_score": 0,
-            "avg_depression": 0,
-            "avg_isolation": 0,
-            "avg_frustration": 0,
-        }
-    emotion_counts = {}
-    total_depression = 0
-    total_isolation = 0
-    total_frustration = 0
-    for entry in diary_entries:
-        emotion = entry.get('emotion', '😊')
-        emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        total_depression += entry.get('depression', 0)
-        total_isolation += entry.get('isolation', 0)
-        total_frustration += entry.get('frustration', 0)
-    emotion_scores = {
-        '😊': 5, '😄': 5, '😌': 4, '🙏': 4,
-        '😟': 2, '😰': 2,
-        '😢': 1, '😠': 1, '😔': 1
-    }
-    total_score = sum(emotion_scores.get(emotion, 3) * count for emotion, count in emotion_counts.items())
-    average_score = total_score / total_entries
-    return {
-        "emotion_counts": emotion_counts,
-        "total_entries": total_entries,
-        "average_score": round(average_score, 2),
-        "total_score": total_score,
-        "avg_depression": round(total_depression / total_entries, 1),
-        "avg_isolation": round(total_isolation / total_entries, 1),
-        "avg_frustration": round(total_frustration / total_entries, 1),
-    }
+    return await get_user_stats(user_id)
     
     
     
@@ -200,7 +227,7 @@ async def write_diary_page(request: Request):
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
     # Linker는 접근 차단
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return RedirectResponse(url="/emoters", status_code=303)
         
     return templates.TemplateResponse("write.html", {
@@ -215,16 +242,18 @@ async def view_diary_page(request: Request):
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
     # Linker는 /view 접근 차단 -> /emoters로 이동
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return RedirectResponse(url="/emoters", status_code=303)
 
-    all_entries = load_diary_entries(request)
-    all_entries.reverse()  # 최신순
+    # 첫 페이지만 렌더링, 이후는 /api/diary-entries?cursor= 로 스크롤 시 로드
+    entries, next_cursor = await load_diary_page(current_user["id"])
+    stats = await get_user_stats(current_user["id"])
     
     return templates.TemplateResponse("view.html", {
         "request": request,
-        "all_entries": all_entries,
-        "total_entries": len(all_entries),
+        "all_entries": entries,
+        "next_cursor": next_cursor,
+        "total_entries": stats["total_entries"],
         "current_user": current_user, # 사용자 정보 전달
     })
 
@@ -243,14 +272,46 @@ async def save_diary(
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
     # Linker는 저장 차단
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return RedirectResponse(url="/emoters", status_code=303)
 
-    save_diary_entry(title, content, emotion, current_user.get("id"), today)
+    await save_diary_entry(title, content, emotion, current_user.get("id"), today)
     return RedirectResponse(url="/view", status_code=303)
 
 @router.get("/api/diary-entries")
-async def get_diary_entries(request: Request):
-    """공개 일기 게시판 API (JSON)"""
-    entries = load_diary_entries(request)
-    return {"entries": entries, "total": len(list(entries))}
\ No newline at end of file
+async def get_diary_entries(request: Request, cursor: Optional[str] = None, limit: int = DIARY_PAGE_SIZE):
+    """일기 게시판 API (JSON), 최신순 요약 한 페이지 + 다음 페이지 cursor"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+    try:
+        entries, next_cursor = await load_diary_page(current_user["id"], cursor=cursor, limit=limit)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "invalid cursor"})
+    stats = await get_user_stats(current_user["id"])
+    return {"entries": entries, "next_cursor": next_cursor, "total": stats["total_entries"]}
+
+
+@router.get("/api/diary-search")
+async def search_diaries(request: Request, q: str = "", page: int = 1, limit: int = DIARY_PAGE_SIZE):
+    """내 일기 검색 API (JSON), 관련도 순 요약 한 페이지"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+    entries, has_more = await search_diary_entries(current_user["id"], q, page=page, limit=limit)
+    return {"query": q, "entries": entries, "page": max(1, page), "has_more": has_more}
+
+
+@router.get("/api/diary-entries/{entry_id}")
+async def get_diary_entry(request: Request, entry_id: str):
+    """일기 한 건 전체 내용 (feed에는 요약만 내려가므로 '더 보기'에서 사용)"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+    try:
+        entry = await diaries.find_one({"_id": ObjectId(entry_id), "author_id": current_user["id"]})
+    except InvalidId:
+        entry = None
+    if not entry:
+        return JSONResponse(status_code=404, content={"error": "not found"})
+    return {**diary_summary(entry), "content": entry.get("content", ""), "truncated": False}
\ No newline at end of file
@@ -0,0 +1,251 @@
+from ...shared import *
+import asyncio
+import datetime
+from typing import Awaitable, Callable, Optional
+from pymongo import UpdateOne
+
+
+# Materialized per-user emotion statistics
+# save_diary_entry $inc's the author's user_stats document, so stats pages read one document
+# instead of every diary the user has written. rebuild_user_stats recomputes it from the diaries.
+#
+# backfill: a user who wrote diaries before user_stats existed gets the document on first use,
+# either when the first write creates it (begin_diary_writes upserted => rebuild_user_aggregates) or
+# when a read finds it missing or never rebuilt (ensure_user_aggregates, no "rebuilt_at").
+# emotion_rollups (emotion_trend.py) are rebuilt together.
+#
+# rebuild vs concurrent writes (no multi-document transactions on a standalone mongodb):
+#   writer   begin_diary_writes  $inc pending + version (upsert)   before the diary is inserted
+#            insert the diary, $inc rollups
+#            record_diary_stats  $inc stats, pending - 1, version
+#   rebuild  guarded_rebuild: read (version, pending), wait while pending > 0, aggregate the diaries,
+#            read again and only write if nothing changed; each document is replaced with a version
+#            check (guarded_replace). a diary is then either in the aggregate (its writer began before
+#            the first read and finished) or its $inc lands on top of the rebuilt value, never both.
+#   a writer that dies between begin and end leaves pending set; after PENDING_STALE_SECONDS a
+#   rebuild ignores it and resets it (a writer slower than that can still be counted twice)
+
+EMOTION_SCORES = {
+    '😊': 5, '😄': 5, '😌': 4, '🙏': 4,
+    '😟': 2, '😰': 2,
+    '😢': 1, '😠': 1, '😔': 1
+}
+DEFAULT_EMOTION = '😊'
+REBUILD_ATTEMPTS = 5 # recounts when $inc's keep landing during a rebuild
+REBUILD_WAIT = 0.2 # seconds between attempts while diaries are being written
+PENDING_STALE_SECONDS = 60
+
+
+def _emotion_key(emotion: str) -> str:
+    # emotions come from user input; "." and a leading "$" are not allowed in mongo field names
+    return emotion.replace(".", "．").replace("$", "＄")
+
+
+def _emotion_from_key(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
+
+
+def stats_increment(entry: dict) -> dict:
+    """일기 하나가 user_stats에 더하는 값 ($inc 문서)"""
+    emotion = entry.get("emotion") or DEFAULT_EMOTION
+    return {
+        "entries": 1,
+        f"emotion_counts.{_emotion_key(emotion)}": 1,
+        "sum_depression": entry.get("depression", 0),
+        "sum_isolation": entry.get("isolation", 0),
+        "sum_frustration": entry.get("frustration", 0),
+        "score_total": EMOTION_SCORES.get(emotion, 3),
+    }
+
+
+async def begin_diary_writes(counts: dict) -> set:
+    """일기를 insert 하기 전에 호출 ({author_id: 일기 수}), rebuild가 진행 중인 write를 알 수 있게 함
+    user_stats 문서를 새로 만든 작성자 집합 반환 (이전 일기가 있을 수 있으므로 끝난 뒤 backfill)"""
+    if not counts:
+        return set()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    result = await user_stats.bulk_write([
+        UpdateOne({"_id": author}, {"$inc": {"pending": count, "version": 1}, "$set": {"pending_at": now}}, upsert=True)
+        for author, count in counts.items()
+    ], ordered=False)
+    authors = list(counts)
+    return {authors[i] for i in result.upserted_ids}
+
+
+async def end_diary_writes(counts: dict):
+    """insert가 실패해 통계에 반영할 일기가 없을 때 begin_diary_writes를 되돌림"""
+    if counts:
+        await user_stats.bulk_write([
+            UpdateOne({"_id": author}, {"$inc": {"pending": -count, "version": 1}})
+            for author, count in counts.items()
+        ], ordered=False)
+
+
+async def record_diary_stats(entry: dict):
+    """저장된 일기를 작성자의 user_stats에 원자적으로 반영 (begin_diary_writes의 pending도 해제)"""
+    await user_stats.update_one(
+        {"_id": entry["author_id"]},
+        {"$inc": {**stats_increment(entry), "pending": -1, "version": 1},
+         "$set": {"updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+        upsert=True,
+    )
+
+
+async def guarded_replace(collection, key: dict, doc: dict, current: Optional[dict]) -> bool:
+    """rebuild 결과 저장, current(읽어 둔 문서의 version)와 달라졌으면 쓰지 않고 False
+    current가 None이면 문서가 아직 없을 때만 삽입"""
+    body = {k: v for k, v in doc.items() if k != "_id"}
+    if current is None:
+        result = await collection.update_one(key, {"$setOnInsert": {**body, "version": 0}}, upsert=True)
+        return result.upserted_id is not None
+    version = current.get("version")
+    guard = {**key, "version": version if version is not None else {"$exists": False}}
+    result = await collection.replace_one(guard, {**body, "version": (version or 0) + 1})
+    return result.matched_count == 1
+
+
+def _write_state(marker: Optional[dict]):
+    return None if marker is None else (marker.get("version"), marker.get("pending", 0))
+
+
+def _writes_in_flight(marker: Optional[dict]) -> bool:
+    if marker is None or marker.get("pending", 0) <= 0:
+        return False
+    pending_at = marker.get("pending_at")
+    if pending_at is None:
+        return False
+    if pending_at.tzinfo is None:
+        pending_at = pending_at.replace(tzinfo=datetime.timezone.utc)
+    age = datetime.datetime.now(datetime.timezone.utc) - pending_at
+    return age.total_seconds() < PENDING_STALE_SECONDS
+
+
+async def guarded_rebuild(user_id: str, aggregate: Callable[[], Awaitable[object]],
+                          write: Callable[[object, Optional[dict]], Awaitable[bool]]) -> bool:
+    """aggregate()로 다시 계산하고 그 사이 작성자의 일기 write가 없었을 때만 write(결과, marker)
+    (marker = 읽어 둔 user_stats 문서의 version / pending), 실패하면 REBUILD_ATTEMPTS번까지 다시"""
+    for _ in range(REBUILD_ATTEMPTS):
+        marker = await user_stats.find_one({"_id": user_id}, {"version": 1, "pending": 1, "pending_at": 1})
+        if _writes_in_flight(marker):
+            await asyncio.sleep(REBUILD_WAIT)
+            continue
+        result = await aggregate()
+        after = await user_stats.find_one({"_id": user_id}, {"version": 1, "pending": 1})
+        if _write_state(after) != _write_state(marker):
+            continue # a diary write began (or ended) while aggregating: it may be counted by both
+        if await write(result, marker):
+            return True
+    return False
+
+
+def stats_from_document(doc: Optional[dict]) -> dict:
+    """user_stats 문서를 통계 페이지/API 형식으로 변환"""
+    total_entries = (doc or {}).get("entries", 0)
+    if total_entries == 0:
+        return {
+            "emotion_counts": {},
+            "total_entries": 0,
+            "average_score": 0,
+            "total_score": 0,
+            "avg_depression": 0,
+            "avg_isolation": 0,
+            "avg_frustration": 0,
+        }
+    total_score = doc.get("score_total", 0)
+    return {
+        "emotion_counts": {_emotion_from_key(k): v for k, v in doc.get("emotion_counts", {}).items() if v},
+        "total_entries": total_entries,
+        "average_score": round(total_score / total_entries, 2),
+        "total_score": total_score,
+        "avg_depression": round(doc.get("sum_depression", 0) / total_entries, 1),
+        "avg_isolation": round(doc.get("sum_isolation", 0) / total_entries, 1),
+        "avg_frustration": round(doc.get("sum_frustration", 0) / total_entries, 1),
+    }
+
+
+async def get_user_stats(user_id: str) -> dict:
+    """감정 통계 (user_stats 한 건 조회, 없으면 일기에서 만들어 저장)"""
+    if not user_id:
+        return stats_from_document(None)
+    doc = await user_stats.find_one({"_id": user_id})
+    if needs_backfill(doc):
+        await rebuild_user_aggregates(user_id)
+        doc = await user_stats.find_one({"_id": user_id})
+    return stats_from_document(doc)
+
+
+def needs_backfill(doc: Optional[dict]) -> bool:
+    # no document, or one created by a write whose backfill never ran (e.g. the process died)
+    return doc is None or "rebuilt_at" not in doc
+
+
+async def ensure_user_aggregates(user_id: str):
+    """user_stats가 아직 없거나 한 번도 다시 계산되지 않은 사용자면 user_stats + emotion_rollups backfill"""
+    if user_id and needs_backfill(await user_stats.find_one({"_id": user_id}, {"rebuilt_at": 1})):
+        await rebuild_user_aggregates(user_id)
+
+
+async def rebuild_user_aggregates(user_id: str):
+    """한 사용자의 user_stats와 emotion_rollups를 일기에서 다시 계산"""
+    from .emotion_trend import rebuild_emotion_rollups # emotion_trend imports this module
+    await rebuild_emotion_rollups(user_id)
+    await rebuild_user_stats(user_id)
+
+
+def empty_stats(**fields) -> dict:
+    """일기가 없는 통계 문서 (user_stats / emotion_rollups 공통 필드)"""
+    return {"entries": 0, "emotion_counts": {}, "sum_depression": 0, "sum_isolation": 0,
+            "sum_frustration": 0, "score_total": 0, **fields}
+
+
+def add_group(doc: dict, emotion: str, group: dict):
+    """$group 결과(작성자/bucket별 emotion 하나)를 통계 문서에 합산"""
+    doc["entries"] += group["count"]
+    doc["emotion_counts"][_emotion_key(emotion)] = group["count"]
+    doc["sum_depression"] += group["depression"]
+    doc["sum_isolation"] += group["isolation"]
+    doc["sum_frustration"] += group["frustration"]
+    doc["score_total"] += EMOTION_SCORES.get(emotion, 3) * group["count"]
+
+
+# per (author, emotion) sums, shared by the user_stats and emotion_rollups rebuilds
+GROUP_SUMS = {
+    "count": {"$sum": 1},
+    "depression": {"$sum": {"$ifNull": ["$depression", 0]}},
+    "isolation": {"$sum": {"$ifNull": ["$isolation", 0]}},
+    "frustration": {"$sum": {"$ifNull": ["$frustration", 0]}},
+}
+
+
+async def _rebuild_one(user_id: str) -> bool:
+    pipeline = [
+        {"$match": {"author_id": user_id}},
+        {"$group": {"_id": {"$ifNull": ["$emotion", DEFAULT_EMOTION]}, **GROUP_SUMS}},
+    ]
+
+    async def aggregate():
+        # a user without diaries still gets a (zero) document so reads stay a single lookup
+        now = datetime.datetime.now(datetime.timezone.utc)
+        doc = empty_stats(_id=user_id, updated_at=now, rebuilt_at=now)
+        async for group in await diaries.aggregate(pipeline):
+            add_group(doc, group["_id"], group)
+        return doc
+
+    async def write(doc, marker):
+        # replaces pending too: the marker had none in flight (or only stale ones)
+        return await guarded_replace(user_stats, {"_id": user_id}, doc, marker)
+
+    if await guarded_rebuild(user_id, aggregate, write):
+        return True
+    print(f"user_stats 재계산 실패 (동시 갱신 계속됨): {user_id}")
+    return False
+
+
+async def rebuild_user_stats(user_id: Optional[str] = None) -> int:
+    """일기 전체에서 user_stats를 다시 계산해 덮어씀 (user_id가 없으면 일기를 쓴 모든 사용자)
+    갱신한 문서 수 반환"""
+    user_ids = [user_id] if user_id else [a for a in await diaries.distinct("author_id") if a is not None]
+    rebuilt = 0
+    for uid in user_ids:
+        rebuilt += await _rebuild_one(uid)
+    return rebuilt
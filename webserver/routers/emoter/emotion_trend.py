@@ -0,0 +1,146 @@
+from ...shared import *
+from ...config import *
+import datetime
+from typing import Optional
+from zoneinfo import ZoneInfo
+from pymongo import UpdateOne
+from .emotion_stats import (
+    DEFAULT_EMOTION, GROUP_SUMS, _emotion_from_key, add_group, empty_stats, ensure_user_aggregates,
+    guarded_rebuild, guarded_replace, stats_increment,
+)
+
+
+# Time-bucketed emotion rollups (daily / weekly / monthly) per user
+# save_diary_entry $inc's the day, week and month bucket of the new diary in emotion_rollups,
+# so a trend chart reads one document per bucket instead of rescanning years of diaries.
+# buckets are calendar periods in STATS_TIMEZONE; weeks start on monday.
+# rebuild_emotion_rollups recomputes them from the diaries (backfill / repair) under the same
+# pending/version protocol as user_stats (emotion_stats.guarded_rebuild: the author's user_stats
+# document marks diary writes in flight); users who wrote before rollups existed are backfilled
+# together with their user_stats document (emotion_stats.rebuild_user_aggregates)
+
+
+GRANULARITIES = ("day", "week", "month")
+TREND_DEFAULT_BUCKETS = {"day": 30, "week": 26, "month": 24}
+TREND_MAX_BUCKETS = 366
+
+
+def _local_date(created_at: datetime.datetime) -> datetime.date:
+    # pymongo returns naive datetimes that are UTC
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+    return created_at.astimezone(ZoneInfo(server_config.STATS_TIMEZONE)).date()
+
+
+def bucket_start(created_at: datetime.datetime, granularity: str) -> str:
+    """일기 작성 시각이 속한 bucket의 시작 날짜 (YYYY-MM-DD, 문자열 정렬 = 시간 순서)"""
+    day = _local_date(created_at)
+    if granularity == "week":
+        day -= datetime.timedelta(days=day.weekday())
+    elif granularity == "month":
+        day = day.replace(day=1)
+    return day.isoformat()
+
+
+async def record_diary_rollups(entry: dict):
+    """저장된 일기를 day/week/month bucket에 반영 (bulk_write 한 번)
+    record_diary_stats보다 먼저 호출: 그쪽이 pending을 해제한 뒤에 이 $inc가 오면 rebuild가 두 번 셀 수 있음"""
+    created_at = entry.get("created_at") or datetime.datetime.now(datetime.timezone.utc)
+    increment = {**stats_increment(entry), "version": 1}
+    now = datetime.datetime.now(datetime.timezone.utc)
+    await emotion_rollups.bulk_write([
+        UpdateOne(
+            {"user_id": entry["author_id"], "granularity": granularity, "bucket": bucket_start(created_at, granularity)},
+            {"$inc": increment, "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for granularity in GRANULARITIES
+    ], ordered=False)
+
+
+def trend_point(doc: dict) -> dict:
+    """rollup 문서를 trend API 형식으로 변환"""
+    entries = doc.get("entries", 0) or 1
+    return {
+        "bucket": doc["bucket"],
+        "entries": doc.get("entries", 0),
+        "avg_depression": round(doc.get("sum_depression", 0) / entries, 1),
+        "avg_isolation": round(doc.get("sum_isolation", 0) / entries, 1),
+        "avg_frustration": round(doc.get("sum_frustration", 0) / entries, 1),
+        "average_score": round(doc.get("score_total", 0) / entries, 2),
+        "emotion_counts": {_emotion_from_key(k): v for k, v in doc.get("emotion_counts", {}).items() if v},
+    }
+
+
+async def get_emotion_trend(user_id: str, granularity: str = "day", limit: Optional[int] = None) -> list:
+    """최근 limit개 bucket의 추이 (오래된 것부터), 일기가 없는 bucket은 포함하지 않음
+    granularity가 잘못되면 ValueError"""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    limit = max(1, min(limit or TREND_DEFAULT_BUCKETS[granularity], TREND_MAX_BUCKETS))
+    await ensure_user_aggregates(user_id)
+    docs = await emotion_rollups.find({"user_id": user_id, "granularity": granularity}) \
+        .sort("bucket", -1).limit(limit).to_list()
+    docs.reverse()
+    return [trend_point(doc) for doc in docs]
+
+
+def _rollup_pipeline(granularity: str, user_id: str) -> list:
+    # same buckets as bucket_start, computed by the server ($dateTrunc needs mongodb 5.0+)
+    tz = server_config.STATS_TIMEZONE
+    truncated = {"$dateTrunc": {"date": "$created_at", "unit": granularity, "timezone": tz, "startOfWeek": "monday"}}
+    return [
+        {"$match": {"author_id": user_id, "created_at": {"$type": "date"}}},
+        {"$group": {
+            "_id": {
+                "bucket": {"$dateToString": {"date": truncated, "format": "%Y-%m-%d", "timezone": tz}},
+                "emotion": {"$ifNull": ["$emotion", DEFAULT_EMOTION]},
+            },
+            **GROUP_SUMS,
+        }},
+    ]
+
+
+async def _rebuild_granularity(user_id: str, granularity: str) -> int:
+    """한 사용자의 granularity 하나를 다시 계산 => bucket 수
+    새 bucket을 먼저 쓰고 일기가 없어진 bucket만 나중에 삭제 (읽는 쪽이 빈 추이를 보지 않음)"""
+    key = {"user_id": user_id, "granularity": granularity}
+    docs = {}
+
+    async def aggregate():
+        current = {doc["bucket"]: doc async for doc in emotion_rollups.find(key, {"bucket": 1, "version": 1})}
+        now = datetime.datetime.now(datetime.timezone.utc)
+        docs.clear()
+        async for group in await diaries.aggregate(_rollup_pipeline(granularity, user_id)):
+            bucket = group["_id"]["bucket"]
+            doc = docs.setdefault(bucket, empty_stats(**key, bucket=bucket, updated_at=now))
+            add_group(doc, group["_id"]["emotion"], group)
+        return current
+
+    async def write(current, marker):
+        written = True
+        for bucket, doc in docs.items():
+            if not await guarded_replace(emotion_rollups, {**key, "bucket": bucket}, doc, current.get(bucket)):
+                written = False
+        for bucket in current.keys() - docs.keys():
+            # buckets that no longer have diaries, unless a new $inc reached them meanwhile
+            version = current[bucket].get("version")
+            await emotion_rollups.delete_one({
+                **key, "bucket": bucket, "version": version if version is not None else {"$exists": False},
+            })
+        return written
+
+    if not await guarded_rebuild(user_id, aggregate, write):
+        print(f"emotion_rollups 재계산 실패 (동시 갱신 계속됨): {user_id} {granularity}")
+    return len(docs)
+
+
+async def rebuild_emotion_rollups(user_id: Optional[str] = None) -> int:
+    """일기 전체에서 rollup을 다시 계산해 덮어씀 (user_id가 없으면 일기를 쓴 모든 사용자)
+    갱신한 bucket 문서 수 반환"""
+    user_ids = [user_id] if user_id else [a for a in await diaries.distinct("author_id") if a is not None]
+    rebuilt = 0
+    for uid in user_ids:
+        for granularity in GRANULARITIES:
+            rebuilt += await _rebuild_granularity(uid, granularity)
+    return rebuilt
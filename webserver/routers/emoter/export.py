@@ -0,0 +1,117 @@
+from fastapi import Request, APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+from ...shared import *
+from ..auth.auth import get_current_user
+from typing import AsyncIterator
+import csv
+import datetime
+import io
+import json
+import zlib
+
+
+# Streaming diary export (NDJSON / CSV, optionally gzip)
+# the cursor is read in batches and every row is written out as soon as it is formatted,
+# so memory stays constant whatever the size of the history
+
+
+router = APIRouter()
+
+EXPORT_FIELDS = ("id", "created_at", "title", "emotion", "depression", "isolation", "frustration", "content")
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS if field != "id"}
+EXPORT_BATCH_SIZE = 200 # documents per cursor batch
+EXPORT_CHUNK_BYTES = 64 * 1024 # rows are grouped into chunks of about this size before being sent
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def export_row(doc: dict) -> dict:
+    created_at = doc.get("created_at")
+    if isinstance(created_at, datetime.datetime):
+        # pymongo returns naive datetimes that are UTC
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=datetime.timezone.utc)
+        created_at = created_at.isoformat()
+    return {
+        "id": str(doc["_id"]),
+        "created_at": created_at,
+        "title": doc.get("title", ""),
+        "emotion": doc.get("emotion", ""),
+        "depression": doc.get("depression", 0),
+        "isolation": doc.get("isolation", 0),
+        "frustration": doc.get("frustration", 0),
+        "content": doc.get("content", ""),
+    }
+
+
+async def export_rows(user_id: str) -> AsyncIterator[dict]:
+    """사용자의 일기를 오래된 것부터 하나씩 (cursor batch 단위로 읽음)"""
+    cursor = diaries.find({"author_id": user_id}, EXPORT_PROJECTION) \
+        .sort([("created_at", 1), ("_id", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        yield export_row(doc)
+
+
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+async def csv_lines(rows: AsyncIterator[dict]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    buffer.write("\ufeff") # BOM so spreadsheet apps read the korean text as utf-8
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def encode_chunks(lines: AsyncIterator[str], compress: bool = False) -> AsyncIterator[bytes]:
+    """줄들을 EXPORT_CHUNK_BYTES 단위로 묶어 utf-8 (compress면 gzip 스트림)으로 보냄"""
+    gzip = zlib.compressobj(wbits=31) if compress else None # wbits=31: gzip header/trailer
+    pending, size = [], 0
+    async for line in lines:
+        data = line.encode("utf-8")
+        pending.append(data)
+        size += len(data)
+        if size >= EXPORT_CHUNK_BYTES:
+            chunk = b"".join(pending)
+            pending, size = [], 0
+            chunk = gzip.compress(chunk) if gzip else chunk
+            if chunk:
+                yield chunk
+    chunk = b"".join(pending)
+    if gzip:
+        chunk = gzip.compress(chunk) + gzip.flush()
+    if chunk:
+        yield chunk
+
+
+@router.get("/api/diary-export")
+async def export_diaries(request: Request, format: str = "ndjson", gzip: bool = False):
+    """내 일기 전체 내보내기 (format = ndjson | csv, gzip=true면 .gz 파일)"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "Authentication required"})
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"})
+
+    media_type, extension = EXPORT_FORMATS[format]
+    rows = export_rows(current_user["id"])
+    lines = ndjson_lines(rows) if format == "ndjson" else csv_lines(rows)
+    filename = f"emotlink-diaries-{datetime.date.today().isoformat()}.{extension}"
+    if gzip:
+        media_type, filename = "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        encode_chunks(lines, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
@@ -0,0 +1,69 @@
+from ...shared import *
+from typing import Dict, Iterable, List
+
+
+# Health indicator (change of the last two diaries) for many emoters at once
+# the linker dashboard used to run one find().sort().limit(2) per emoter; get_health_indicators
+# runs a single aggregation that keeps the two newest entries of every requested author
+
+
+DEFAULT_HEALTH = {"color": "green", "delta": 0.0}
+HEALTH_FIELDS = ("depression", "isolation", "frustration")
+
+
+def health_from_entries(entries: List[dict]) -> dict:
+    """최근 일기 2개(최신순)의 (depression,isolation,frustration) 평균 변화량으로 건강 인디케이터 계산
+    규칙:
+      - avgDelta >= 30  => red
+      - avgDelta >= 15 또는 avgDelta <= -30 => orange
+      - 그 외 => green
+    엔트리가 1개 이하이면 green
+    반환: { color: str, delta: float }
+    """
+    if len(entries) < 2:
+        return dict(DEFAULT_HEALTH)
+
+    last, prev = entries[0], entries[1]
+    # 세 지표의 합 또는 평균 중 스펙 상 "평균" 기준으로 계산
+    last_avg = sum(float(last.get(field) or 0) for field in HEALTH_FIELDS) / 3.0
+    prev_avg = sum(float(prev.get(field) or 0) for field in HEALTH_FIELDS) / 3.0
+    avg_delta = round(last_avg - prev_avg, 1)
+
+    color = "green"
+    if avg_delta >= 30:
+        color = "red"
+    elif avg_delta >= 15 or avg_delta <= -30:
+        color = "orange"
+
+    return {"color": color, "delta": avg_delta}
+
+
+def health_pipeline(user_ids: List[str]) -> list:
+    # $match + $sort walk the (author_id, created_at, _id) index; $topN keeps the two newest per author
+    return [
+        {"$match": {"author_id": {"$in": user_ids}}},
+        {"$sort": {"author_id": 1, "created_at": -1, "_id": -1}},
+        {"$group": {
+            "_id": "$author_id",
+            "last_two": {"$topN": {
+                "n": 2,
+                "sortBy": {"created_at": -1, "_id": -1},
+                "output": {field: f"${field}" for field in HEALTH_FIELDS},
+            }},
+        }},
+    ]
+
+
+async def get_health_indicators(user_ids: Iterable[str]) -> Dict[str, dict]:
+    """emoter id 목록의 건강 인디케이터를 aggregation 한 번으로 계산
+    반환: { user_id: { color, delta } }, 일기가 없거나 조회에 실패하면 green"""
+    ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+    result = {uid: dict(DEFAULT_HEALTH) for uid in ids}
+    if not ids:
+        return result
+    try:
+        async for group in await diaries.aggregate(health_pipeline(ids)):
+            result[group["_id"]] = health_from_entries(group["last_two"])
+    except Exception as e:
+        print(f"건강 인디케이터 계산 실패: {e}")
+    return result
@@ -1,45 +1,37 @@
 from fastapi import Request, APIRouter
 from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from ...shared import templates, users, links
-from ..auth.auth import get_current_user
-from .diary import get_emotion_stats_for_user, get_health_indicator_for_user
+from ...shared import templates, links
+from ..auth.auth import get_current_user, is_emoter, is_linker
+from ..lookups import find_user, get_link, get_links_for_emoter, get_links_for_linker, get_user, get_users, invalidate_link
+from .diary import get_emotion_stats_for_user
+from .health import get_health_indicators
+from .analytics import get_emotion_analytics
 import datetime
 
 router = APIRouter()
 
 
-def require_linker(current_user):
-    return current_user and (current_user.get("role") == "linker" or current_user.get("account_type") == 1)
-
-
 @router.get("/emoters", response_class=HTMLResponse)
 async def emoters_page(request: Request):
     """Linker가 연결한 Emoter 목록 + 추가 폼"""
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if not require_linker(current_user):
+    if not is_linker(current_user):
         return RedirectResponse(url="/", status_code=303)
 
     linker_id = current_user.get("id")
-    # find linked emoters
-    linked = list(links.find({"linker_id": linker_id}))
+    # find linked emoters (links / profiles from the read cache)
+    linked = await get_links_for_linker(linker_id)
     emoter_ids = [l.get("emoter_id") for l in linked]
     status_map = {l.get("emoter_id"): l.get("status", "pending") for l in linked}
     emoter_list = []
     health_map = {}
     if emoter_ids:
-        cursor = users.find({"id": {"$in": emoter_ids}}, {"password": 0})
-        emoter_list = list(cursor)
-        # 각 emoter의 건강 인디케이터 계산
-        for u in emoter_list:
-            uid = u.get("id")
-            if not uid:
-                continue
-            try:
-                health_map[uid] = get_health_indicator_for_user(uid)
-            except Exception:
-                health_map[uid] = {"color": "green", "delta": 0.0}
+        emoter_map = await get_users(emoter_ids)
+        emoter_list = [emoter_map[eid] for eid in dict.fromkeys(emoter_ids) if eid in emoter_map]
+        # 모든 emoter의 건강 인디케이터를 aggregation 한 번으로 계산
+        health_map = await get_health_indicators(u.get("id") for u in emoter_list)
 
     return templates.TemplateResponse("emoters.html", {
         "request": request,
@@ -58,7 +50,7 @@ async def add_emoter_link(request: Request):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if not require_linker(current_user):
+    if not is_linker(current_user):
         return RedirectResponse(url="/", status_code=303)
 
     form = await request.form()
@@ -68,20 +60,20 @@ async def add_emoter_link(request: Request):
         return RedirectResponse(url="/emoters", status_code=303)
 
     # find emoter by id or email
-    emoter = users.find_one({"$or": [{"id": target}, {"email": target}]})
+    emoter = await find_user(target)
     if not emoter:
         return RedirectResponse(url="/emoters", status_code=303)
-    if emoter.get("account_type", 0) != 0:
+    if not is_emoter(emoter):
         return RedirectResponse(url="/emoters", status_code=303)
 
     linker_id = current_user.get("id")
     emoter_id = emoter.get("id")
     # create pending link or keep accepted
-    existing = links.find_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    existing = await get_link(linker_id, emoter_id)
     if existing and existing.get("status") == "accepted":
         pass  # already accepted, do nothing
     else:
-        links.update_one(
+        await links.update_one(
             {"linker_id": linker_id, "emoter_id": emoter_id},
             {"$set": {
                 "linker_id": linker_id,
@@ -92,6 +84,7 @@ async def add_emoter_link(request: Request):
             }},
             upsert=True
         )
+        await invalidate_link(linker_id, emoter_id)
 
     return RedirectResponse(url="/emoters", status_code=303)
 
@@ -102,27 +95,29 @@ async def view_linked_emoter_stats(request: Request, emoter_id: str):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if not require_linker(current_user):
+    if not is_linker(current_user):
         return RedirectResponse(url="/", status_code=303)
 
     # check link exists
     linker_id = current_user.get("id")
-    link = links.find_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    link = await get_link(linker_id, emoter_id)
     if not link or link.get("status") != "accepted":
         return RedirectResponse(url="/emoters", status_code=303)
 
     # fetch emoter user info
-    emoter = users.find_one({"id": emoter_id}, {"password": 0})
+    emoter = await get_user(emoter_id)
     if not emoter:
         return RedirectResponse(url="/emoters", status_code=303)
 
-    stats = get_emotion_stats_for_user(emoter_id)
+    stats = await get_emotion_stats_for_user(emoter_id)
+    analytics = await get_emotion_analytics(emoter_id)
 
     return templates.TemplateResponse("stats_linker.html", {
         "request": request,
         "current_user": current_user,
         "emoter": emoter,
         "stats": stats,
+        "analytics": analytics,
     })
 
 
@@ -133,23 +128,16 @@ async def requests_page(request: Request):
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
     # only emoter
-    if current_user.get("account_type", 0) != 0:
+    if not is_emoter(current_user):
         return RedirectResponse(url="/", status_code=303)
 
     emoter_id = current_user.get("id")
-    pending = list(links.find({"emoter_id": emoter_id, "status": "pending"}))
-    accepted = list(links.find({"emoter_id": emoter_id, "status": "accepted"}))
+    # one cached list of all links, split by status
+    emoter_links = await get_links_for_emoter(emoter_id)
+    pending = [l for l in emoter_links if l.get("status") == "pending"]
+    accepted = [l for l in emoter_links if l.get("status") == "accepted"]
     # fetch linker user info for both lists
-    linker_map = {}
-    linker_ids = []
-    if pending:
-        linker_ids.extend([p.get("linker_id") for p in pending])
-    if accepted:
-        linker_ids.extend([a.get("linker_id") for a in accepted])
-    if linker_ids:
-        unique_ids = list(set(linker_ids))
-        for u in users.find({"id": {"$in": unique_ids}}, {"password": 0}):
-            linker_map[u["id"]] = u
+    linker_map = await get_users(l.get("linker_id") for l in pending + accepted)
 
     return templates.TemplateResponse("requests.html", {
         "request": request,
@@ -165,13 +153,14 @@ async def accept_request(request: Request, linker_id: str):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if current_user.get("account_type", 0) != 0:
+    if not is_emoter(current_user):
         return RedirectResponse(url="/", status_code=303)
     emoter_id = current_user.get("id")
-    links.update_one(
+    await links.update_one(
         {"linker_id": linker_id, "emoter_id": emoter_id},
         {"$set": {"status": "accepted", "updated_at": datetime.datetime.now(datetime.timezone.utc)}}
     )
+    await invalidate_link(linker_id, emoter_id)
     return RedirectResponse(url="/links/requests", status_code=303)
 
 
@@ -180,14 +169,15 @@ async def decline_request(request: Request, linker_id: str):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if current_user.get("account_type", 0) != 0:
+    if not is_emoter(current_user):
         return RedirectResponse(url="/", status_code=303)
     emoter_id = current_user.get("id")
     # either delete or set declined
-    links.update_one(
+    await links.update_one(
         {"linker_id": linker_id, "emoter_id": emoter_id},
         {"$set": {"status": "declined", "updated_at": datetime.datetime.now(datetime.timezone.utc)}}
     )
+    await invalidate_link(linker_id, emoter_id)
     return RedirectResponse(url="/links/requests", status_code=303)
 
 
@@ -200,10 +190,11 @@ async def remove_link_as_emoter(request: Request, linker_id: str):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if current_user.get("account_type", 0) != 0:
+    if not is_emoter(current_user):
         return RedirectResponse(url="/", status_code=303)
     emoter_id = current_user.get("id")
-    links.delete_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    await links.delete_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    await invalidate_link(linker_id, emoter_id)
     return RedirectResponse(url="/links/requests", status_code=303)
 
 
@@ -216,8 +207,9 @@ async def remove_link_as_linker(request: Request, emoter_id: str):
     current_user = get_current_user(request)
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
-    if not require_linker(current_user):
+    if not is_linker(current_user):
         return RedirectResponse(url="/", status_code=303)
     linker_id = current_user.get("id")
-    links.delete_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    await links.delete_one({"linker_id": linker_id, "emoter_id": emoter_id})
+    await invalidate_link(linker_id, emoter_id)
     return RedirectResponse(url="/emoters", status_code=303)
@@ -1,8 +1,11 @@
+from typing import Optional
 from fastapi import Request, APIRouter
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from .diary import get_emotion_stats
-from ..auth.auth import get_current_user
+from .emotion_trend import get_emotion_trend
+from ..auth.auth import get_current_user, is_emoter, is_linker
 from ...shared import templates
+from ..lookups import is_link_accepted
 
 router = APIRouter()
 
@@ -13,13 +16,13 @@ async def emotion_stats_page(request: Request):
     if not current_user:
         return RedirectResponse(url="/login", status_code=303)
     # Emoter는 친구 요청 페이지로 이동 (요청 수락/거절)
-    if current_user.get("account_type", 0) == 0:
+    if is_emoter(current_user):
         return RedirectResponse(url="/links/requests", status_code=303)
     # Linker는 접근 차단 -> /emoters로 이동
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return RedirectResponse(url="/emoters", status_code=303)
         
-    stats = get_emotion_stats(request)
+    stats = await get_emotion_stats(request)
     
     return templates.TemplateResponse("stats.html", {
         "request": request,
@@ -34,6 +37,26 @@ async def get_stats(request: Request):
     current_user = get_current_user(request)
     if not current_user:
         return {"error": "unauthorized"}
-    if current_user.get("role") == "linker" or current_user.get("account_type") == 1:
+    if is_linker(current_user):
         return {"error": "forbidden"}
-    return get_emotion_stats(request)
\ No newline at end of file
+    return await get_emotion_stats(request)
+
+
+@router.get("/api/stats/trend")
+async def get_stats_trend(request: Request, granularity: str = "day", limit: Optional[int] = None, emoter_id: Optional[str] = None):
+    """감정 추이 API (JSON), granularity = day | week | month
+    Emoter는 자신의 추이, Linker는 연결이 승인된 emoter_id의 추이"""
+    current_user = get_current_user(request)
+    if not current_user:
+        return JSONResponse(status_code=401, content={"error": "unauthorized"})
+    if is_linker(current_user):
+        if not await is_link_accepted(current_user.get("id"), emoter_id):
+            return JSONResponse(status_code=403, content={"error": "forbidden"})
+        user_id = emoter_id
+    else:
+        user_id = current_user.get("id")
+    try:
+        points = await get_emotion_trend(user_id, granularity, limit)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"granularity": granularity, "points": points}
@@ -0,0 +1,193 @@
+import asyncio
+import datetime
+from typing import Iterable, Optional
+from ..shared import users, links, user_cache, link_cache, user_filter
+
+
+# This file contains the cached user / link lookups (two-tier read cache, webserver/read_cache.py)
+#
+# user_cache keys                             link_cache keys
+#   id:{id}         profile, no password        pair:{linker_id}:{emoter_id}   one link document
+#   email:{email}   profile, no password        linker:{linker_id}             all links of a linker
+#   ref:{id|email}  profile by id or email      emoter:{emoter_id}             all links of an emoter
+#
+# password hashes are never cached: login reads the user straight from mongodb (find_user_for_login)
+#
+# every write to users / links must call invalidate_user / invalidate_link afterwards
+#
+# id / email availability (id_taken / email_taken) asks the user_filter bloom filter first:
+# "definitely absent" returns without any lookup, "maybe" is confirmed with the cached lookups above.
+# new users are added on signup (remember_user), deletions are counted (forget_user) and the filter is
+# rebuilt from mongodb at startup (ensure_user_filter) or once too many of its items are stale
+
+
+PROFILE_PROJECTION = {"password": 0}
+USER_FILTER_BATCH = 1000
+USER_FILTER_CATCHUP = datetime.timedelta(minutes=1) # users created this long before a rebuild are re-added
+
+_background_tasks = set()
+
+
+# ==================== users ====================
+
+async def get_user(user_id: str) -> Optional[dict]:
+    """id로 사용자 조회 (password 제외)"""
+    return await user_cache.get(f"id:{user_id}", lambda: users.find_one({"id": user_id}, PROFILE_PROJECTION))
+
+
+async def get_user_by_email(email: str) -> Optional[dict]:
+    """email로 사용자 조회 (password 제외)"""
+    return await user_cache.get(f"email:{email}", lambda: users.find_one({"email": email}, PROFILE_PROJECTION))
+
+
+async def find_user(identifier: str) -> Optional[dict]:
+    """id 또는 email로 사용자 조회 (password 제외)"""
+    return await user_cache.get(
+        f"ref:{identifier}",
+        lambda: users.find_one({"$or": [{"id": identifier}, {"email": identifier}]}, PROFILE_PROJECTION),
+    )
+
+
+async def find_user_for_login(identifier: str) -> Optional[dict]:
+    """로그인용 id 또는 email 조회 (password hash 포함, 로그인 외에는 사용하지 않음)
+    cache를 거치지 않음: hash를 redis에 두지 않고, 임의의 identifier마다 key가 생기지 않도록"""
+    return await users.find_one({"$or": [{"id": identifier}, {"email": identifier}]})
+
+
+async def get_users(user_ids: Iterable[str]) -> dict:
+    """여러 사용자를 한 번에 조회 => {id: user} (없는 id는 제외, password 제외)"""
+    keys = {f"id:{uid}": uid for uid in user_ids if uid}
+    if not keys:
+        return {}
+
+    async def load(missing):
+        found = users.find({"id": {"$in": [keys[k] for k in missing]}}, PROFILE_PROJECTION)
+        return {f"id:{u['id']}": u async for u in found}
+
+    cached = await user_cache.get_many(keys, load)
+    return {keys[k]: u for k, u in cached.items() if u is not None}
+
+
+async def invalidate_user(user_id: Optional[str], email: Optional[str] = None):
+    """users 문서를 바꾼 뒤 호출 (가입/이름 변경/탈퇴)"""
+    keys = []
+    for identifier in (user_id, email):
+        if identifier:
+            keys.append(f"ref:{identifier}")
+    if user_id:
+        keys.append(f"id:{user_id}")
+    if email:
+        keys.append(f"email:{email}")
+    await user_cache.invalidate(*keys)
+
+
+# ==================== id / email availability ====================
+
+async def id_taken(user_id: str) -> bool:
+    """아이디 사용 여부 (bloom filter가 "없음"이면 db 조회 없이 False)"""
+    maybe = await user_filter.might_contain(f"id:{user_id}")
+    if maybe is False:
+        return False
+    taken = await get_user(user_id) is not None
+    if maybe and not taken:
+        user_filter.note_false_positive()
+    return taken
+
+
+async def email_taken(email: str) -> bool:
+    """이메일 가입 여부 (bloom filter가 "없음"이면 db 조회 없이 False)"""
+    maybe = await user_filter.might_contain(f"email:{email}")
+    if maybe is False:
+        return False
+    taken = await get_user_by_email(email) is not None
+    if maybe and not taken:
+        user_filter.note_false_positive()
+    return taken
+
+
+async def remember_user(user_id: str, email: str):
+    """가입 직후 호출 (filter에 id / email 추가)"""
+    await user_filter.add(f"id:{user_id}", f"email:{email}")
+
+
+async def forget_user():
+    """탈퇴 직후 호출, 삭제된 item이 많아졌으면 background에서 filter 재구성"""
+    if await user_filter.note_removed(2):
+        task = asyncio.create_task(rebuild_user_filter())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+
+async def _user_filter_items(query: dict):
+    batch = []
+    async for u in users.find(query, {"_id": 0, "id": 1, "email": 1}).batch_size(USER_FILTER_BATCH):
+        if u.get("id"):
+            batch.append(f"id:{u['id']}")
+        if u.get("email"):
+            batch.append(f"email:{u['email']}")
+        if len(batch) >= USER_FILTER_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def rebuild_user_filter() -> Optional[int]:
+    """users 전체로 filter 재구성 => item 수 (다른 worker가 재구성 중이면 None)"""
+    started = datetime.datetime.now(datetime.timezone.utc) - USER_FILTER_CATCHUP
+    count = await user_filter.rebuild(_user_filter_items({}))
+    if count is not None:
+        # signups that landed in the old filter while the new one was being built
+        async for batch in _user_filter_items({"created_at": {"$gte": started}}):
+            await user_filter.add(*batch)
+    return count
+
+
+async def ensure_user_filter():
+    """startup (main.py lifespan): filter가 없거나 stale이면 재구성, 실패해도 db 조회로 동작"""
+    try:
+        if await user_filter.needs_rebuild():
+            await rebuild_user_filter()
+    except Exception as e:
+        print(f"user bloom filter 재구성 실패: {e}")
+
+
+# ==================== links ====================
+
+async def get_link(linker_id: str, emoter_id: str) -> Optional[dict]:
+    """linker-emoter 연결 문서 (없으면 None)"""
+    return await link_cache.get(
+        f"pair:{linker_id}:{emoter_id}",
+        lambda: links.find_one({"linker_id": linker_id, "emoter_id": emoter_id}),
+    )
+
+
+async def is_link_accepted(linker_id: str, emoter_id: Optional[str]) -> bool:
+    if not linker_id or not emoter_id:
+        return False
+    link = await get_link(linker_id, emoter_id)
+    return bool(link) and link.get("status") == "accepted"
+
+
+async def get_links_for_linker(linker_id: str) -> list:
+    """linker가 건 모든 연결 (모든 상태)"""
+    return await link_cache.get(f"linker:{linker_id}", lambda: links.find({"linker_id": linker_id}).to_list())
+
+
+async def get_links_for_emoter(emoter_id: str) -> list:
+    """emoter가 받은 모든 연결 (모든 상태)"""
+    return await link_cache.get(f"emoter:{emoter_id}", lambda: links.find({"emoter_id": emoter_id}).to_list())
+
+
+async def invalidate_link(linker_id: str, emoter_id: str):
+    """links 문서를 바꾼 뒤 호출 (요청/수락/거절/삭제)"""
+    await link_cache.invalidate(f"pair:{linker_id}:{emoter_id}", f"linker:{linker_id}", f"emoter:{emoter_id}")
+
+
+async def invalidate_links_of_user(user_id: str, user_links: Iterable[dict]):
+    """탈퇴 시: user_id가 포함된 연결들과 상대방의 목록까지 삭제"""
+    keys = [f"linker:{user_id}", f"emoter:{user_id}"]
+    for link in user_links:
+        linker_id, emoter_id = link.get("linker_id"), link.get("emoter_id")
+        keys.extend([f"pair:{linker_id}:{emoter_id}", f"linker:{linker_id}", f"emoter:{emoter_id}"])
+    await link_cache.invalidate(*keys)
@@ -0,0 +1,95 @@
+import datetime
+import re
+import unicodedata
+from typing import Iterable, List, Tuple
+
+
+# n-gram terms for diary search (Korean has no spaces between a word and its particles, so
+# "학교에서" must match "학교"; character bigrams do that without a morphological analyzer)
+# every diary stores the terms of its title + content in search_grams (multikey index);
+# a query is split the same way and diaries are ranked by how many of its terms they contain.
+# mongodb narrows the candidates by term count (candidate_pipeline); the exact-phrase bonus is
+# computed here (rank_candidates) so the phrase and the diary text get the same normalize() as the terms
+''' diaries.search_grams
+["학교", "교에", "에서", "학", "교", "에", "서", ...]  # unique unigrams + bigrams of each word
+'''
+
+
+WORD_PATTERN = re.compile(r"[^\W_]+") # letters and digits
+TITLE_BONUS = 0.5 # the query appears as is in the title
+CONTENT_BONUS = 0.25 # ... in the content
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").casefold()
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(normalize(text))
+
+
+def search_grams(*texts: str) -> List[str]:
+    """저장용 term: 각 단어의 글자(unigram)와 bigram, 중복 제거"""
+    grams = set()
+    for text in texts:
+        for word in _words(text):
+            grams.update(word)
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return sorted(grams)
+
+
+def query_grams(query: str) -> List[str]:
+    """검색어 term: 두 글자 이상 단어는 bigram만, 한 글자 단어는 그 글자"""
+    grams = set()
+    for word in _words(query):
+        if len(word) == 1:
+            grams.add(word)
+        else:
+            grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return sorted(grams)
+
+
+def candidate_pipeline(match: dict, grams: List[str], min_matched: int, limit: int) -> List[dict]:
+    """term이 min_matched개 이상 겹치는 일기를 일치 수가 많은 순으로 limit개 (점수는 rank_candidates)
+    search_grams가 아직 없는 일기(backfill 전)는 matched = None으로 넘겨 rank_candidates가 계산"""
+    return [
+        # search_grams: null uses the same (author_id, search_grams) index, no collection scan
+        {"$match": {**match, "$or": [{"search_grams": {"$in": grams}}, {"search_grams": None}]}},
+        {"$project": {
+            "title": 1,
+            "content": 1,
+            "emotion": 1,
+            "created_at": 1,
+            "matched": {"$cond": [
+                {"$isArray": "$search_grams"},
+                {"$size": {"$setIntersection": ["$search_grams", grams]}},
+                None,
+            ]},
+        }},
+        {"$match": {"$or": [{"matched": {"$gte": min_matched}}, {"matched": None}]}},
+        {"$sort": {"matched": -1, "created_at": -1, "_id": -1}},
+        {"$limit": limit},
+    ]
+
+
+def rank_candidates(candidates: Iterable[dict], phrase: str, grams: List[str], min_matched: int) -> List[Tuple[float, dict]]:
+    """(점수, 일기) 목록, 점수 높은 순 (같으면 최신순)
+    점수 = 일치한 term 비율 + 제목에 검색어가 그대로 있으면 TITLE_BONUS + 본문에 있으면 CONTENT_BONUS
+    phrase는 normalize()된 검색어"""
+    wanted = set(grams)
+    ranked = []
+    for entry in candidates:
+        title, content = entry.get("title") or "", entry.get("content") or ""
+        matched = entry.get("matched")
+        if matched is None:
+            matched = len(wanted.intersection(search_grams(title, content)))
+            if matched < min_matched:
+                continue
+        score = matched / len(wanted)
+        if phrase in normalize(title):
+            score += TITLE_BONUS
+        if phrase in normalize(content):
+            score += CONTENT_BONUS
+        ranked.append((score, entry))
+    ranked.sort(key=lambda item: (item[0], item[1].get("created_at") or datetime.datetime.min, item[1]["_id"]), reverse=True)
+    return ranked
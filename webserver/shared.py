@@ -1,83 +1,102 @@
 from .config import *
-from fastapi_mail import FastMail, ConnectionConfig
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
 from fastapi.templating import Jinja2Templates
-import redis
-import os
+from .upstream import UpstreamClients
+from .metrics import register_metrics
+from .jobs import JobQueue
+from .chat_store import ChatRoomStore
+from .provider_routing import ProviderRouter
+from .password_hasher import PasswordHasher
+from .token_cache import VerifiedTokenCache
+from .read_cache import CacheInvalidationBus, TwoTierCache
+from .bloom_filter import RedisBloomFilter
+from .mailer import Mailer
+import redis.asyncio
 
 
 
 # This file contains global variables and instances
-# such as redis, mongodb, fastmail, jinja2 templates, etc
+# such as redis, mongodb, mailer, jinja2 templates, etc
 # that are used throughout the server
 
 
 
-# SMTP
-MAIL_USERNAME = server_config.MAIL_USERNAME
-MAIL_PASSWORD = server_config.MAIL_PASSWORD
-MAIL_FROM = server_config.MAIL_FROM
-MAIL_SERVER = server_config.MAIL_SERVER
-MAIL_PORT = server_config.MAIL_PORT
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=MAIL_USERNAME,
-    MAIL_PASSWORD=MAIL_PASSWORD,
-    MAIL_FROM=MAIL_FROM,
-    MAIL_FROM_NAME="EmotLink",
-    MAIL_PORT=MAIL_PORT,
-    MAIL_SERVER=MAIL_SERVER,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True
+# MongoDB (async, closed in the app lifespan, main.py)
+client = AsyncMongoClient(
+    server_config.MONGO_URL,
+    maxPoolSize=server_config.MONGO_MAX_POOL_SIZE,
+    minPoolSize=server_config.MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=server_config.MONGO_MAX_IDLE_TIME_MS,
+    waitQueueTimeoutMS=server_config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=server_config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
 )
-fastmail = FastMail(mail_config)
-
-
-
-# MongoDB
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URL)
 db = client.emotlink_db
 users = db.users
 diaries = db.diaries
 links = db.links
+user_stats = db.user_stats
+''' materialized per-user emotion statistics (routers/emoter/emotion_stats.py)
+{
+    "_id": user_id,
+    "entries": int,
+    "emotion_counts": {"😊": int, ...},
+    "sum_depression": int, "sum_isolation": int, "sum_frustration": int,
+    "score_total": int,
+    "updated_at": datetime,
+}
+'''
+emotion_rollups = db.emotion_rollups
+''' time-bucketed emotion trend per user (routers/emoter/emotion_trend.py)
+{
+    "user_id": str,
+    "granularity": "day" | "week" | "month",
+    "bucket": "YYYY-MM-DD", # first day of the bucket in STATS_TIMEZONE
+    "entries": int,
+    "emotion_counts": {"😊": int, ...},
+    "sum_depression": int, "sum_isolation": int, "sum_frustration": int,
+    "score_total": int,
+    "updated_at": datetime,
+}
+'''
 
 
-# Redis connection settings
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", "21101"))
+# Redis: a single async connection pool (opened/closed in the app lifespan, main.py)
+# everything lives in db REDIS_DB under distinct key prefixes
+redis_pool = redis.asyncio.BlockingConnectionPool(
+    host=server_config.REDIS_HOST,
+    port=server_config.REDIS_PORT,
+    db=server_config.REDIS_DB,
+    max_connections=server_config.REDIS_MAX_CONNECTIONS,
+    timeout=server_config.REDIS_POOL_TIMEOUT,
+    socket_timeout=server_config.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=server_config.REDIS_CONNECT_TIMEOUT,
+    health_check_interval=server_config.REDIS_HEALTH_CHECK_INTERVAL,
+)
+redis_client = redis.asyncio.Redis.from_pool(redis_pool) # aclose() also closes the pool
 
 
-# Temporal chat sessions
-chat_sessions = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=0)
-''' redis sorted set
-chat:messages:{room_id} => json
-{
-    "messsage_id": message_id,
-    "time": timestamp,
-    "role": role,
-    "user_id": user_id,
-    "message": text,
-}
-'''
+def redis_pool_stats() -> dict:
+    return {
+        "max": redis_pool.max_connections,
+        "in_use": len(redis_pool._in_use_connections),
+        "idle": len(redis_pool._available_connections),
+    }
 
 
+register_metrics("redis_pool", redis_pool_stats)
 
-# chat participants
-chat_users = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=1)
-''' redis set
-chat:{room_id} => json
-{
-    "relink",
-    "goranipie"
-}
-'''
+
+
+# chat rooms (room hash + messages sorted set + per-user room sets, key layout in chat_store.py)
+chat_rooms = ChatRoomStore(
+    redis_client,
+    ttl=server_config.CHAT_ROOM_TTL,
+    max_messages=server_config.CHAT_ROOM_MAX_MESSAGES,
+)
 
 
 
-# email verification status
-email_verification_cache = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=2)
+# email verification status (redis_client)
 ''' redis string
 email_verified:{email} => json
 {
@@ -89,5 +108,86 @@ email_verified:{email} => json
 
 
 
+# background job queues (redis streams under the "jobs:" prefix)
+diary_jobs = JobQueue(
+    redis_client, "diary",
+    max_attempts=server_config.DIARY_JOB_MAX_ATTEMPTS,
+    backoff_base=server_config.JOB_BACKOFF_BASE,
+)
+register_metrics("diary_jobs", diary_jobs.stats)
+mail_jobs = JobQueue(
+    redis_client, "mail",
+    max_attempts=server_config.MAIL_JOB_MAX_ATTEMPTS,
+    backoff_base=server_config.JOB_BACKOFF_BASE,
+)
+register_metrics("mail_jobs", mail_jobs.stats)
+
+
+
+# outbound mail: precompiled templates/email/* + pooled smtp sessions + shared rate limit
+# sends happen in the worker ("mail" queue), or inline when MAIL_QUEUE_ENABLED is false
+# smtp sessions are closed by the app lifespan (main.py) / worker shutdown
+mailer = Mailer(server_config, redis_client)
+register_metrics("mailer", mailer.stats)
+
+
+
+# pooled outbound http clients (solar, self-hosted model, google stt)
+# opened/closed in the app lifespan (main.py)
+upstream_clients = UpstreamClients(server_config)
+register_metrics("http_pools", upstream_clients.stats)
+
+
+
+# llm provider routing (circuit breaker / hedged requests)
+provider_router = ProviderRouter(server_config)
+register_metrics("llm_routing", provider_router.stats)
+
+
+
+# bcrypt hashing off the event loop (bounded thread pool, shut down in the app lifespan)
+password_hasher = PasswordHasher(server_config)
+register_metrics("password_hasher", password_hasher.stats)
+
+
+
+# verified login token LRU (routers/auth/auth.py decode_login_token)
+login_token_cache = VerifiedTokenCache(server_config.TOKEN_CACHE_SIZE)
+register_metrics("login_token_cache", login_token_cache.stats)
+
+
+
+# read-through caches for users / links (helpers in routers/lookups.py)
+# local LRU -> redis "cache:{namespace}:{key}" -> mongodb, invalidations on "cache:invalidate" pub/sub
+# the subscriber task is started/stopped in the app lifespan (main.py)
+cache_bus = CacheInvalidationBus(redis_client)
+user_cache = TwoTierCache(
+    redis_client, "user", cache_bus,
+    local_size=server_config.CACHE_LOCAL_SIZE,
+    local_ttl=server_config.CACHE_LOCAL_TTL,
+    redis_ttl=server_config.CACHE_REDIS_TTL,
+)
+link_cache = TwoTierCache(
+    redis_client, "link", cache_bus,
+    local_size=server_config.CACHE_LOCAL_SIZE,
+    local_ttl=server_config.CACHE_LOCAL_TTL,
+    redis_ttl=server_config.CACHE_REDIS_TTL,
+)
+register_metrics("read_cache", cache_bus.stats)
+
+
+
+# "id:{id}" / "email:{email}" of every user, answers "definitely available" without mongodb
+# (helpers in routers/lookups.py, rebuilt from mongodb at startup when missing or stale)
+user_filter = RedisBloomFilter(
+    redis_client, "users",
+    capacity=server_config.USER_BLOOM_CAPACITY,
+    error_rate=server_config.USER_BLOOM_ERROR_RATE,
+    stale_ratio=server_config.USER_BLOOM_STALE_RATIO,
+)
+register_metrics("user_filter", user_filter.stats)
+
+
+
 # jinja2 templates
 templates = Jinja2Templates(directory="templates")
\ No newline at end of file
@@ -0,0 +1,55 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+# This file contains the verified login token cache
+# a bounded LRU of already verified JWT payloads keyed by the sha256 of the token, so a repeat
+# request with the same cookie skips the HMAC check and json decode. an entry is only served
+# until the token's own "expire" claim, so caching never extends a session.
+
+
+class VerifiedTokenCache:
+    """검증된 JWT payload를 token hash로 보관하는 bounded LRU (token 만료 시각까지만 유효)"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._counters["misses"] += 1
+            return None
+        payload, expire = entry
+        if expire <= (now or time.time()):
+            del self._entries[key]
+            self._counters["expired"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._counters["hits"] += 1
+        return payload
+
+    def put(self, key: str, payload: dict, expire: float):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (payload, expire)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._counters["evicted"] += 1
+
+    def stats(self) -> dict:
+        lookups = self._counters["hits"] + self._counters["misses"] + self._counters["expired"]
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            **self._counters,
+            "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+        }
@@ -0,0 +1,112 @@
+import httpx
+from typing import Dict, Optional
+
+
+# This file contains the long-lived outbound HTTP clients
+# one pooled httpx.AsyncClient per upstream (solar, self-hosted model, google stt)
+# clients are opened/closed by the FastAPI lifespan hook in main.py
+
+
+UPSTREAMS = ("solar", "self_hosted", "google_stt")
+
+
+def _http2_available() -> bool:
+    # http2 needs the optional "h2" package (pip install httpx[http2])
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamClients:
+    """Upstream별 keep-alive 커넥션 풀을 공유하는 httpx 클라이언트 모음"""
+
+    def __init__(self, config):
+        self.config = config
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, httpx.AsyncHTTPTransport] = {}
+        self._counters: Dict[str, dict] = {
+            name: {"requests": 0, "responses": 0, "errors_5xx": 0, "errors_4xx": 0}
+            for name in UPSTREAMS
+        }
+        self.http2 = bool(config.HTTP2_ENABLED) and _http2_available()
+        if config.HTTP2_ENABLED and not self.http2:
+            print("HTTP2_ENABLED=true 이지만 h2 패키지가 없어 HTTP/1.1로 동작합니다.")
+
+    def _timeout_for(self, name: str) -> float:
+        return {
+            "solar": self.config.SOLAR_TIMEOUT,
+            "self_hosted": self.config.SELF_HOSTED_TIMEOUT,
+            "google_stt": self.config.GOOGLE_STT_TIMEOUT,
+        }[name]
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.config.HTTP_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=self.config.HTTP_POOL_MAX_KEEPALIVE,
+            keepalive_expiry=self.config.HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = httpx.AsyncHTTPTransport(limits=limits, http2=self.http2, retries=1)
+        counters = self._counters[name]
+
+        async def on_request(request: httpx.Request):
+            counters["requests"] += 1
+
+        async def on_response(response: httpx.Response):
+            counters["responses"] += 1
+            if response.status_code >= 500:
+                counters["errors_5xx"] += 1
+            elif response.status_code >= 400:
+                counters["errors_4xx"] += 1
+
+        self._transports[name] = transport
+        return httpx.AsyncClient(
+            transport=transport,
+            timeout=httpx.Timeout(self._timeout_for(name), connect=self.config.HTTP_CONNECT_TIMEOUT),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    async def start(self):
+        """lifespan 시작 시 모든 upstream 클라이언트 생성"""
+        for name in UPSTREAMS:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """upstream 클라이언트 반환 (lifespan 밖에서 호출되면 지연 생성)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build(name)
+            self._clients[name] = client
+        return client
+
+    async def aclose(self):
+        """lifespan 종료 시 커넥션 풀 정리"""
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                print(f"{name} http client 종료 중 오류: {e}")
+        self._clients.clear()
+        self._transports.clear()
+
+    def _pool_usage(self, name: str) -> Optional[dict]:
+        transport = self._transports.get(name)
+        pool = getattr(transport, "_pool", None) if transport else None
+        if pool is None:
+            return None
+        connections = list(pool.connections)
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def stats(self) -> dict:
+        """upstream별 요청 수와 풀 사용량"""
+        result = {}
+        for name in UPSTREAMS:
+            counters = self._counters[name]
+            result[name] = {
+                **counters,
+                "pool": self._pool_usage(name),
+                "http2": self.http2,
+            }
+        return result
@@ -1,4 +1,5 @@
 from starlette.types import ASGIApp, Receive, Scope, Send
+import time
 
 
 # ========== custom exceptions ==========
@@ -36,4 +37,16 @@ class SizeLimitMiddleware:
         if content_length > self.max_size:
              raise FilesSizeTooLargeError(size=content_length, max_size=self.max_size)
 
-        await self.app(scope, receive, send)
\ No newline at end of file
+        await self.app(scope, receive, send)
+
+
+
+# record when the request arrived (request.state.started_at) for deadline budgets
+class RequestStartMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            scope.setdefault("state", {})["started_at"] = time.monotonic()
+        await self.app(scope, receive, send)
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+from .config import server_config
+from .shared import client, diary_jobs, mail_jobs, mailer, redis_client, upstream_clients
+from .routers.emoter.ai_processing import run_diary_job
+
+
+# Background worker entry point
+#   python -m webserver.worker                      consume jobs
+#   python -m webserver.worker --requeue-dead diary re-run dead-lettered jobs
+
+
+# queue name => (queue, handler)
+HANDLERS = {
+    "diary": (diary_jobs, run_diary_job),
+    "mail": (mail_jobs, mailer.run_job),
+}
+
+
+async def process_entry(queue, handler, entry_id: str, job: dict):
+    job_id = job["job_id"]
+    status = await queue.get_status(job_id)
+    if status and status.get("status") == "done":
+        # already handled (e.g. reclaimed after the worker died before ack)
+        await queue.ack(entry_id)
+        return
+
+    await queue.set_status(job_id, "running", attempt=job.get("attempt", 0))
+    try:
+        result = await handler(job["payload"])
+    except Exception as e:
+        retried = await queue.retry_or_dead_letter(entry_id, job, f"{type(e).__name__}: {e}")
+        print(f"❌ [{queue.name}] job {job_id} 실패 ({'재시도 예약' if retried else 'dead-letter 이동'}): {e}")
+        return
+
+    await queue.set_status(job_id, "done", result=result or {})
+    await queue.ack(entry_id)
+    print(f"✅ [{queue.name}] job {job_id} 완료")
+
+
+async def consume(queue, handler, consumer: str, stop: asyncio.Event):
+    """작업 하나씩 처리하는 consumer 루프 (동시성 = consumer 수)"""
+    while not stop.is_set():
+        try:
+            await queue.promote_delayed()
+            entries = await queue.read(consumer, count=1, block_ms=2000)
+            for entry_id, job in entries:
+                await process_entry(queue, handler, entry_id, job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[{queue.name}] consumer {consumer} 오류: {e}")
+            await asyncio.sleep(1)
+
+
+async def reclaim(queue, handler, consumer: str, stop: asyncio.Event):
+    """죽은 worker가 ack 하지 못한 작업을 주기적으로 회수해 처리"""
+    idle_ms = server_config.WORKER_RECLAIM_IDLE_MS
+    while not stop.is_set():
+        try:
+            for entry_id, job in await queue.reclaim_stale(consumer, idle_ms):
+                await process_entry(queue, handler, entry_id, job)
+        except Exception as e:
+            print(f"[{queue.name}] reclaim 오류: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=idle_ms / 1000 / 2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_worker(queue_names, concurrency: int):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass # windows
+
+    await upstream_clients.start()
+    base_name = f"{socket.gethostname()}-{os.getpid()}"
+    tasks = []
+    for name in queue_names:
+        queue, handler = HANDLERS[name]
+        await queue.ensure_group()
+        for i in range(concurrency):
+            tasks.append(asyncio.create_task(consume(queue, handler, f"{base_name}-{i}", stop)))
+        tasks.append(asyncio.create_task(reclaim(queue, handler, f"{base_name}-reclaim", stop)))
+    print(f"worker 시작: queues={list(queue_names)} concurrency={concurrency}")
+
+    await stop.wait()
+    print("worker 종료 중... 처리 중인 작업을 마무리합니다.")
+    # consumers exit after their current job (block timeout is short)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await upstream_clients.aclose()
+    await mailer.aclose()
+    await redis_client.aclose()
+    await client.close()
+
+
+async def requeue_dead(queue_names):
+    for name in queue_names:
+        queue, _ = HANDLERS[name]
+        moved = await queue.requeue_dead(limit=10000)
+        print(f"[{name}] dead-letter {moved}건 재등록")
+    await redis_client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EmotLink background worker")
+    parser.add_argument("--queues", nargs="+", default=list(HANDLERS), choices=list(HANDLERS))
+    parser.add_argument("--concurrency", type=int, default=server_config.WORKER_CONCURRENCY)
+    parser.add_argument("--requeue-dead", nargs="+", choices=list(HANDLERS), metavar="QUEUE")
+    args = parser.parse_args()
+
+    if args.requeue_dead:
+        asyncio.run(requeue_dead(args.requeue_dead))
+    else:
+        asyncio.run(run_worker(args.queues, max(1, args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()